@@ -0,0 +1,248 @@
+"""
+Benchmarks of the compilation of the examples, one for each subcommand.
+Run with: python3 benchmarks/bench.py {BENCHMARK} [N]
+e.g. python3 benchmarks/bench.py fact-fast-path 2000, see python3 benchmarks/bench.py --help for the list.
+"""
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+import timeit
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from lark import Lark
+
+from CNLWizard import substitution as substitution_module
+from CNLWizard.cnl import Cnl, CompiledRule, SupportRule
+from CNLWizard.cnl_wizard_compiler import CnlParser, CnlWizardCompiler, CompilationContext, Signatures
+from CNLWizard.grammar_pruner import GrammarPruner
+from CNLWizard.libs import asp
+from CNLWizard.reader import pyReader
+from CNLWizard.substitution import Substitution, Bound
+from CNLWizard.writer import LarkGrammarWriter, PythonFunctionWriter
+
+try:
+    import clingo
+except ImportError:
+    clingo = None
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+EMPLOYEES = 'A employee has a name and a salary.\n'
+
+
+def load_example(name: str, fast_path: bool = True) -> tuple[CnlParser, dict]:
+    """
+    The parser of the ASP grammar of the example and its python functions.
+    The conflicts of the grammar are logged at the INFO level.
+    """
+    example = os.path.join(ROOT, 'examples', name)
+    with open(os.path.join(example, 'grammar_asp.lark')) as grammar:
+        lark = CnlParser(grammar.read(), fast_path=fast_path, quiet=True)
+    with CompilationContext():
+        functions = pyReader().get_functions(os.path.join(example, 'implemented_py_asp.py'))
+    return lark, functions
+
+
+def compile_program(lark: CnlParser, functions: dict, text: str, data_dir: str | None = None) -> tuple[str, float]:
+    start = time.perf_counter()
+    with CompilationContext():
+        compiler = CnlWizardCompiler()
+        compiler.data_dir = data_dir
+        program = compiler.compile_text(lark, functions, text)
+    return program, time.perf_counter() - start
+
+
+def employee_facts(employees: int, names: bool = False) -> str:
+    return EMPLOYEES + ''.join(f'There is an employee with name equal to {f"e{idx}" if names else idx}, '
+                               f'with salary equal to {1000 + idx % 7 * 500}.\n' for idx in range(employees))
+
+
+def fact_fast_path(employees: int = 2000):
+    """
+    Time spent compiling the facts of the employee scheduling problem with N employees,
+    with the full parser and with the fast path of the facts, whose numbers (or names) are all different.
+    """
+    parsers = [('full parser', load_example('employee_scheduling', fast_path=False)),
+               ('fast path', load_example('employee_scheduling'))]
+    for values, names in [('numbers', False), ('names', True)]:
+        text = employee_facts(employees, names)
+        programs = []
+        for name, (lark, functions) in parsers:
+            program, compile_time = compile_program(lark, functions, text)
+            programs.append(program)
+            print(f'{values}, {name}: {employees} facts in {compile_time:.3f}s')
+        print(f'{values}, same program: {programs[0] == programs[1]}')
+
+
+def csv_facts(employees: int = 2000):
+    """
+    Throughput of the facts of the employee scheduling problem with N employees (rows per second),
+    written as sentences parsed by the grammar and loaded from a CSV file with a facts directive.
+    """
+    lark, functions = load_example('employee_scheduling')
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'employees.csv'), 'w') as csv:
+            csv.write('name,salary\n')
+            csv.writelines(f'{idx},{1000 + idx % 7 * 500}\n' for idx in range(employees))
+        directive = EMPLOYEES + 'There are employees from "employees.csv".\n'
+        programs = []
+        for name, text, facts in [('sentences', employee_facts(employees), {}),
+                                  ('directive', directive, {'facts': asp.facts})]:
+            program, compile_time = compile_program(lark, functions | facts, text, tmp)
+            programs.append(program)
+            print(f'{name}: {employees} rows in {compile_time:.3f}s, {employees / compile_time:.0f} rows/s')
+        print(f'same program: {programs[0] == programs[1]}')
+
+
+def symbolic_where(pigeons: int = 200):
+    """
+    Size of the ASP program of the pigeon hole problem with N pigeons, and time spent compiling and grounding it,
+    with the where-clauses expanded into a rule for each clone and with their domains stated in a single rule.
+    The grounding is measured only if clingo is installed.
+    """
+    lark, functions = load_example('pigeon_hole')
+    text = f'''\
+A pigeon is a boolean concept, and it is identified by number.
+A assignment is a boolean concept, and it is identified by pigeon_number, holeNumber.
+There is a pigeon with number equal to X, where X is between 1 and {pigeons}.
+a pigeon with number equal to X has an assignment with holeNumber equal to 1 or pigeon with number equal to X \
+has an assignment with holeNumber equal to 2, where X is between 1 and {pigeons}.
+a pigeon with number equal to X does not have an assignment with holeNumber equal to 1, \
+when pigeon with number equal to Y has an assignment with holeNumber equal to 1, \
+where X is between 1 and {pigeons}, where Y is between 1 and {pigeons}, where X and Y are distinct.
+'''
+    for name, substitution in [('expanded', {}), ('symbolic', {'symbolic_substitution': asp.symbolic_substitution})]:
+        program, compile_time = compile_program(lark, functions | substitution, text)
+        res = f'{name}: {program.count(chr(10))} rules, {len(program)} bytes, compiled in {compile_time:.3f}s'
+        if clingo is not None:
+            start = time.perf_counter()
+            control = clingo.Control(['--warn=none'])
+            # the last line is the translation of the graph
+            control.add('base', [], '\n'.join(line for line in program.splitlines() if not line.startswith('[')))
+            control.ground([('base', [])])
+            res += f', grounded in {time.perf_counter() - start:.3f}s'
+        print(res)
+
+
+def where_filters(number: int = 5):
+    """
+    Cost of the evaluation of the where-clause filters on a 365x365 grid of candidate assignments,
+    with the NumPy blocks and with the clone by clone evaluation (N times).
+    """
+    # where D2 is between 1 and 365, where D is between 1 and 365,
+    # where D is greater than or equal to D2, where D is at most D2+13, where D2 is less than 353
+    substitution = Substitution()
+    substitution.product('D2', range(1, 366))
+    substitution.product('D', range(1, 366))
+    substitution.compare('D', 'greater than or equal to', Bound('D2'))
+    substitution.compare('D', 'at most', Bound('D2', 13))
+    substitution.compare('D2', 'less than', Bound(offset=353))
+    count = sum(1 for _ in substitution)
+    blocks = timeit.timeit(lambda: sum(size for size, _ in substitution._blocks()), number=number) / number
+    clones = timeit.timeit(lambda: sum(1 for _ in substitution), number=number) / number
+    with mock.patch.object(substitution_module, 'numpy', None):
+        python = timeit.timeit(lambda: sum(1 for _ in substitution), number=number) / number
+    print(f'{365 * 365} candidates, {count} clones')
+    print(f'python: {python * 1e3:.1f} ms')
+    print(f'numpy: {blocks * 1e3:.1f} ms filtering, {clones * 1e3:.1f} ms generating the clones '
+          f'({python / clones:.1f}x faster)')
+
+
+def signatures_lookup(number: int = 200000):
+    """
+    Cost of the instantiation of a signature (i.e. Signatures.__getitem__),
+    compared with the deepcopy of the signature that was used before (N times).
+    """
+    signatures = Signatures()
+    signatures['employee'] = 'employee', ['id', 'name', 'hours', 'skill'], ['id'], None
+    signature = signatures.signatures['employee']
+    deepcopy = timeit.timeit(lambda: copy.deepcopy(signature), number=number) / number
+    lookup = timeit.timeit(lambda: signatures['employee'], number=number) / number
+    print(f'deepcopy: {deepcopy * 1e6:.2f} us per lookup')
+    print(f'Signatures lookup: {lookup * 1e6:.2f} us per lookup ({deepcopy / lookup:.1f}x faster)')
+
+
+def grammar_assembly(rules: int = 500):
+    """
+    Time spent printing the grammar and the python functions of a specification with N rules for each of 4 targets,
+    the first time (tokenizing the syntax of the rules and computing the rules reachable from start)
+    and the next times (reusing the rules of the grammar of each target).
+    """
+    targets = ['asp', 'cp', 'sat', 'smt']
+
+    def suffix(idx: int) -> str:
+        # the names of the rules are made of letters, e.g. proposition_ba
+        return ''.join(chr(ord('a') + int(digit)) for digit in str(idx))
+
+    cnl = Cnl()
+    cnl.add_rule('_all', CompiledRule('start', [f'(proposition_{suffix(0)} ".")+']))
+    for idx in range(rules):
+        # a chain of propositions, each one with a clause for each target
+        name = suffix(idx)
+        cnl.add_rule('_all', CompiledRule(f'proposition_{name}',
+                                          [f'"there is" entity clause_{name} proposition_{suffix(idx + 1)}',
+                                           f'"it is" [negation] string clause_{name}']))
+        for target in targets:
+            cnl.add_rule(target, CompiledRule(f'clause_{name}', ['"with" ("a" | "an")? string "equal to" number']))
+    cnl.add_rule('_all', CompiledRule(f'proposition_{suffix(rules)}', ['entity']))
+    cnl.add_rule('_all', CompiledRule('entity', ['("A" | "An" | "a" | "an")? string']))
+    cnl.add_rule('_all', SupportRule('negation', ['"not"']))
+    times = []
+    for _ in range(2):
+        start = time.perf_counter()
+        for target in targets:
+            cnl.print(target, LarkGrammarWriter())
+            cnl.print(target, PythonFunctionWriter())
+        times.append(time.perf_counter() - start)
+    print(f'{rules} rules: printed in {times[0]:.3f}s the first time, {times[1]:.3f}s the next times')
+
+
+def grammar_pruning(repeat: int = 5):
+    """
+    Time spent by Earley parsing the inputs of the comparison with cnl2asp with the grammar of all the problems
+    and with the grammar pruned to each input (N times), and the size of the grammars.
+    """
+    comparison = os.path.join(ROOT, 'cnl2asp_comparison')
+
+    def parse_time(grammar: str, propositions: list[str]) -> float:
+        lark = Lark(grammar, parser='earley')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for proposition in propositions:
+                lark.parse(proposition)
+        return (time.perf_counter() - start) / repeat
+
+    with open(os.path.join(comparison, 'all', 'wizard', 'grammar_asp.lark')) as grammar:
+        grammar = grammar.read()
+    for problem in ['graph_coloring', 'nsp', 'robot', 'cts']:
+        pruner = GrammarPruner(grammar)
+        pruner.profile_file(os.path.join(comparison, 'inputs', f'{problem}.cnl'))
+        pruned = pruner.prune()
+        propositions = [proposition.text for proposition in pruner.profiler.propositions if not proposition.error]
+        print(f'{problem}: {len(propositions)} propositions, '
+              f'{len(grammar)} -> {len(pruned)} characters, '
+              f'parsed in {parse_time(grammar, propositions):.3f}s -> {parse_time(pruned, propositions):.3f}s')
+
+
+BENCHMARKS = [fact_fast_path, csv_facts, symbolic_where, where_filters, signatures_lookup, grammar_assembly,
+              grammar_pruning]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of CNLWizard')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    for benchmark in BENCHMARKS:
+        doc = ' '.join(benchmark.__doc__.split())
+        subparser = subparsers.add_parser(benchmark.__name__.replace('_', '-'), help=doc, description=doc)
+        subparser.add_argument('n', nargs='?', type=int, help='size of the benchmark (see above)')
+        subparser.set_defaults(run=benchmark)
+    args = parser.parse_args()
+    args.run(*([] if args.n is None else [args.n]))
+
+
+if __name__ == '__main__':
+    main()
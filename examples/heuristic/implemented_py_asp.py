@@ -1,4 +1,4 @@
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, impure
 from graphlib import TopologicalSorter
 import re
 
@@ -457,6 +457,7 @@ def heuristic(clause):
     return clause
 
 
+@impure
 def sign_heuristic_clause(if_clause, then, preferred_that, entity, sign, heur_priority):
     if if_clause and not isinstance(if_clause, list):
         if_clause = [if_clause]
@@ -483,6 +484,7 @@ def true_false_heuristic_clause(if_clause, then, preferred_that, entity, sign, w
     return TrueFalseHeuristic(entity, if_clause, sign, heur_level, heur_priority)
 
 
+@impure
 def level_heuristic_clause_second_syntax(*entity_cond_conj_list):
     if entity_cond_conj_list and not isinstance(entity_cond_conj_list, list):
         entity_cond_conj_list = list(entity_cond_conj_list)
@@ -17,5 +17,6 @@ setup(
         'console_scripts': ['CNLWizard = CNLWizard.cnl_wizard:main'],
     },
     install_requires=['lark'],
+    extras_require={'fast': ['numpy']},
     python_requires=">=3.10"
 )
\ No newline at end of file
@@ -1,18 +1,78 @@
 import copy
+import re
 from abc import abstractmethod
 from collections import defaultdict
 
 from CNLWizard.writer import RuleVisitor
 
 
+_TOKENS = re.compile(r'"[^"]*"?|[A-Za-z_]\w*|\S')
+_TAIL = re.compile(r'[^\w"]*([A-Za-z_]\w*)[^\w"]*')
+
+
+class RuleSyntax:
+    """
+    The symbols of the syntax of a rule (and of its concat), each string is tokenized only once
+    into quoted terminals, names and operators.
+    """
+
+    def __init__(self, syntax: list[str], concat: str | None = None):
+        self.key = (tuple(syntax), concat)
+        self.tokens: list[list[str]] = []
+        self.non_terminal_symbols: list[str] = []
+        for string in syntax + ([concat] if concat else []):
+            tokens = _TOKENS.findall(string)
+            self.tokens.append(tokens)
+            self.non_terminal_symbols += [token for token in tokens if self.is_name(token) and not token.isupper()]
+            # the named terminal ending a string (e.g. CNAME in string: CNAME) is a symbol of the rule as well
+            tail = _TAIL.fullmatch(re.split(r'[\s"]', string)[-1])
+            if tail and tail.group(1).isupper():
+                self.non_terminal_symbols.append(tail.group(1))
+        self.names = {token for tokens in self.tokens for token in tokens if self.is_name(token)}
+        tokens = self.tokens[:len(syntax)]
+        self.symbols = [token for tokens in tokens for token in tokens if self.is_name(token) or token[0] == '"']
+        self.rule_function_args = self._rule_function_args(tokens[0] if tokens else [])
+
+    @staticmethod
+    def is_name(token: str) -> bool:
+        return token[0].isalpha() or token[0] == '_'
+
+    def _rule_function_args(self, tokens: list[str]) -> list[str]:
+        res = []
+        for idx, token in enumerate(tokens):
+            if token in ('+', '*'):
+                # args with undefined length
+                names = [token for token in tokens[:idx] if self.is_name(token)]
+                lower = [name for name in names if not name.isupper()]
+                return [f'*{lower[0] if lower else names[-1] if names else ""}']
+            if self.is_name(token) and not token.isupper():
+                res.append(token)
+        return res
+
+
 class Rule:
+    root = False  # the rule is kept even if it is not reachable from start, e.g. the imports
+
     def __init__(self, name: str, syntax: list[str], concat: str | None = None):
         if not name.isupper():
             name = name.lower()
         self.name = name
         self.syntax: list[str] = syntax
-        self.non_terminal_symbols = []
         self.concat: str | None = concat
+        self._syntax: RuleSyntax | None = None
+
+    @property
+    def parsed_syntax(self) -> RuleSyntax:
+        """
+        The tokenized syntax, parsed again only if the syntax or the concat have been changed.
+        """
+        if self._syntax is None or self._syntax.key != (tuple(self.syntax), self.concat):
+            self._syntax = RuleSyntax(self.syntax, self.concat)
+        return self._syntax
+
+    @property
+    def non_terminal_symbols(self) -> list[str]:
+        return self.get_non_terminal_symbols()
 
     def get_to_import(self):
         return [self.name]
@@ -22,75 +82,24 @@ class Rule:
         pass
 
     def get_non_terminal_symbols(self) -> list[str]:
-        if self.non_terminal_symbols:
-            # non-terminal symbols have been already computed
-            # or syntax is empty
-            return self.non_terminal_symbols
-        curr = ''
-        open_quotes = False
-        for rule in self.syntax:
-            for c in rule:
-                if c == '"':
-                    open_quotes = not open_quotes
-                    curr = ''
-                elif c == ' ' and not open_quotes:
-                    if curr and not curr.isupper():
-                        self.non_terminal_symbols.append(curr)
-                    curr = ''
-                else:
-                    if not open_quotes and (c.isalpha() or c == '_'):
-                        curr += c
-            if curr:
-                self.non_terminal_symbols.append(curr)
-                curr = ''
-        if self.concat:
-            self.non_terminal_symbols.extend(Rule("", [self.concat]).get_non_terminal_symbols())
-        return self.non_terminal_symbols
+        return self.parsed_syntax.non_terminal_symbols
+
+    def get_dependencies(self) -> set[str]:
+        """
+        The names of the rules (and terminals) the rule refers to.
+        """
+        return self.parsed_syntax.names
 
     def get_symbols(self):
-        res = []
-        curr = ''
-        open_quotes = False
-        for rule in self.syntax:
-            for c in rule:
-                if c in ['(', ')', '|', '*', '+']:
-                    continue
-                curr += c
-                if c == '"':
-                    open_quotes = not open_quotes
-                elif c == ' ' and not open_quotes:
-                    if curr.strip():
-                        res.append(curr.strip())
-                    curr = ''
-            if curr:
-                res.append(curr)
-        return res
+        return self.parsed_syntax.symbols
 
     def get_rule_function_args(self) -> list[str]:
-        curr = ''
-        res = []
-        open_quotes = False
-        for c in self.syntax[0]:
-            if c == '"':
-                open_quotes = not open_quotes
-                curr = ''
-            elif c == ' ' and not open_quotes:
-                if curr and not curr.isupper():
-                    res.append(curr)
-                curr = ''
-            elif c == '+' or c == '*':
-                # Return args with undefined length
-                arg = res[0] if res else curr
-                return [f'*{arg}']
-            else:
-                if not open_quotes and (c.isalpha() or c == '_'):
-                    curr += c
-        if curr and not curr.isupper():
-            res.append(curr)
-        return res
+        return self.parsed_syntax.rule_function_args
 
 
 class GrammarConfigRule(Rule):
+    root = True
+
     def __init__(self, name: str, syntax: list[str]):
         super().__init__(name, syntax, None)
         self.name = name
@@ -163,6 +172,8 @@ class ListRule(Rule):
 
 
 class PureFunction(Rule):
+    root = True
+
     def __init__(self, name: str, args: list[str], body: str = None):
         super().__init__(name, args)
         if body is None:
@@ -180,6 +191,8 @@ class PureFunction(Rule):
 
 
 class PreprocessConfigRule(Rule):
+    root = True
+
     def __init__(self, config_name: str):
         super().__init__(config_name, [])
 
@@ -204,26 +217,47 @@ class ImportedRule(Rule):
 class Grammar:
     def __init__(self):
         self.rules: dict[str, dict] = defaultdict(dict)  # dictionary target language - rule
+        # dictionary target language - rules of the target with their syntax, and the rules of its grammar
+        self._grammars: dict[str, tuple[list, list[Rule]]] = {}
 
     def get_rules(self, target: str) -> list[Rule]:
-        visited = {}
-        non_terminal_symbols: set = set()
-        non_terminal_symbols.add('start')
-        for rule in list(self.rules['_all'].values()) + list(self.rules[target].values()):
-            non_terminal_symbols.update(rule.get_non_terminal_symbols())
-        for rule in list(self.rules['_all'].values()) + list(self.rules[target].values()):
-            if rule.name not in non_terminal_symbols:
-                # do not include unused rules
-                # they can be initialized in rules because of composite rules
+        """
+        The rules of the target reachable from start (and the rules kept anyway, e.g. imports), start first.
+        The grammar of each target is computed again only when its rules (or their syntax) change.
+        """
+        rules = list(self.rules['_all'].values()) + list(self.rules[target].values())
+        key = [(rule, rule.parsed_syntax) for rule in rules]
+        if target not in self._grammars or self._grammars[target][0] != key:
+            self._grammars[target] = key, self._get_rules(rules)
+        return list(self._grammars[target][1])
+
+    @staticmethod
+    def _get_rules(rules: list[Rule]) -> list[Rule]:
+        by_name: dict[str, list[Rule]] = defaultdict(list)
+        dependencies: dict[str, set[str]] = defaultdict(set)
+        for rule in rules:
+            by_name[rule.name].append(rule)
+            if not rule.root:
+                dependencies[rule.name] |= rule.get_dependencies()
+        # do not include unused rules
+        # they can be initialized in rules because of composite rules
+        reachable = {'start'} | {rule.name for rule in rules if rule.root}
+        pending = list(reachable)
+        while pending:
+            new = dependencies[pending.pop()] - reachable
+            reachable |= new
+            pending += new
+        grammar = {}
+        for name, same_name in by_name.items():
+            if name not in reachable:
                 continue
-            if rule.name in visited:
+            grammar[name] = same_name[0]
+            if len(same_name) > 1:
                 # merge rules with same name
-                visited[rule.name].syntax += rule.syntax
-            else:
-                visited[rule.name] = copy.deepcopy(rule)
-        start_rule = visited['start']
-        del visited['start']
-        return [start_rule] + list(visited.values())
+                grammar[name] = copy.copy(same_name[0])
+                grammar[name].syntax = [syntax for rule in same_name for syntax in rule.syntax]
+        start_rule = grammar.pop('start')
+        return [start_rule] + list(grammar.values())
 
     def keys(self) -> list:
         return list(self.rules.keys())
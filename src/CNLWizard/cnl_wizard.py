@@ -1,20 +1,99 @@
 import argparse
+import contextlib
+import glob
 import os
+import sys
+import time
 
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, CnlParser, CompilationResult
 from CNLWizard.cnl_wizard_generator import CnlWizardGenerator
+from CNLWizard.grammar_profiler import GrammarProfiler
+from CNLWizard.grammar_pruner import GrammarPruner
+from CNLWizard.parser_cache import ParserCache
+from CNLWizard.profiler import RuleProfiler
+from CNLWizard.sentence_cache import SentenceCache
+from CNLWizard.stats import CompilationStats
 
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('-g', '--generate', nargs='+')
-    parser.add_argument('-c', '--compile', nargs=3, help='grammar py_functions cnl_text_file')
+    parser.add_argument('-c', '--compile', nargs='+', help='grammar py_functions cnl_text_file [cnl_text_file ...], '
+                                                          'several files, folders or glob patterns compile in batch mode')
+    parser.add_argument('-a', '--analyze', nargs='+',
+                        help='grammar cnl_text_file [cnl_text_file ...], report the usage of the rules of the grammar '
+                             'by the cnl texts (files, folders or glob patterns), the ambiguous propositions '
+                             'and the parse time outliers')
+    parser.add_argument('--outlier-factor', type=float, default=GrammarProfiler.OUTLIER,
+                        help='propositions parsed in more than this many times the median are outliers')
+    parser.add_argument('--prune', nargs='+',
+                        help='grammar cnl_text_file [cnl_text_file ...], write the grammar with only the rules '
+                             'and alternatives used by the cnl texts (files, folders or glob patterns)')
+    parser.add_argument('--pruned-grammar', default=None,
+                        help='file of the pruned grammar (default: the grammar file with the .pruned.lark extension)')
+    parser.add_argument('-o', '--out-dir', default=None, help='folder of the compiled files in batch mode '
+                                                              '(default: the folder of each cnl text file)')
+    parser.add_argument('--seed', type=int, default=0, help='initial value of the counter of the fresh variables')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of processes compiling in batch mode, or the propositions of a single cnl text '
+                             'with --parallel-propositions')
+    parser.add_argument('--parallel-propositions', action='store_true',
+                        help='compile the propositions of a single cnl text with the processes of -j, '
+                             'the functions keeping a state other than the declarations must be marked @impure')
     parser.add_argument('-i', '--to-import', nargs='+', default=[], help='folder containing the files to import')
     parser.add_argument('-l', '--lang', default=None, help='language of the cnl')
+    parser.add_argument('-p', '--parser', choices=CnlParser.MODES, default=CnlParser.AUTO,
+                        help='parser used to compile the cnl, auto uses lalr whenever possible and earley otherwise')
+    parser.add_argument('--inline', action='store_true',
+                        help='compile the cnl while parsing, without building the parse tree '
+                             '(only for grammars without lalr conflicts)')
+    parser.add_argument('--stream', action='store_true',
+                        help='compile the cnl proposition by proposition, printing each translation as soon as '
+                             'it is ready (only for languages whose start function concatenates the propositions, '
+                             'a warning is printed otherwise)')
+    parser.add_argument('--no-fast-path', action='store_true',
+                        help='parse the facts (there is ...) with the full parser, e.g. to verify the fast path')
+    parser.add_argument('--debug', action='store_true', help='log the parse tree of the cnl')
+    parser.add_argument('--no-cache', action='store_true', help='do not use the on-disk cache of the built parsers')
+    parser.add_argument('--sentence-cache', action='store_true',
+                        help='reuse the translations of the unchanged propositions of the previous runs')
+    parser.add_argument('--prelude', default=None,
+                        help='cnl text compiled once before each cnl text, e.g. the shared declarations')
+    parser.add_argument('--stats', action='store_true',
+                        help='print the time and memory of each stage of the compilation, and the sizes of the cnl')
+    parser.add_argument('--stats-json', default=None, help='file where the stats are written in json format')
+    parser.add_argument('--profile', nargs='?', const='self', choices=RuleProfiler.SORT_KEYS, default=None,
+                        help='print the calls and times of the python function of each rule, sorted by the given key '
+                             '(default: self time), the texts are compiled by a single process')
+    parser.add_argument('--profile-stacks', default=None,
+                        help='file where the self times of the functions are written as collapsed stacks '
+                             '(e.g. for flamegraph.pl)')
+    parser.add_argument('--cache-dir', default=ParserCache.DEFAULT_DIR, help='folder of the on-disk parser cache')
     args = parser.parse_args()
     if args.generate and args.compile:
         print("Impossible to run CNLWizard both in generate and compile mode")
         return
+    if args.analyze:
+        if len(args.analyze) < 2:
+            raise argparse.ArgumentTypeError(f'Argument analyze requires grammar and cnl text files')
+        with open(args.analyze[0], 'r') as grammar:
+            profiler = GrammarProfiler(grammar.read())
+        for cnl_text_file in cnl_text_files(args.analyze[1:]):
+            profiler.profile_file(cnl_text_file)
+        print(profiler.report(args.outlier_factor))
+    if args.prune:
+        if len(args.prune) < 2:
+            raise argparse.ArgumentTypeError(f'Argument prune requires grammar and cnl text files')
+        with open(args.prune[0], 'r') as grammar:
+            pruner = GrammarPruner(grammar.read())
+        for cnl_text_file in cnl_text_files(args.prune[1:]):
+            pruner.profile_file(cnl_text_file)
+        pruned = pruner.prune()
+        out_file = args.pruned_grammar or f'{os.path.splitext(args.prune[0])[0]}.pruned.lark'
+        with open(out_file, 'w') as out:
+            out.write(pruned)
+        print(pruner.report(pruned))
+        print(f'pruned grammar: {out_file}')
     if args.generate:
         if not 1 <= len(args.generate) <= 2:
             raise argparse.ArgumentTypeError(f'Argument generate requires yaml file and optionally a target folder')
@@ -23,7 +102,84 @@ def main():
         import_dirs = args.to_import if args.to_import else []
         CnlWizardGenerator(yaml_specification, import_dirs, out_dir, args.lang).generate()
     if args.compile:
+        if len(args.compile) < 3:
+            raise argparse.ArgumentTypeError(f'Argument compile requires grammar, py_functions and cnl text files')
+        cache = None if args.no_cache else ParserCache(args.cache_dir)
+        sentence_cache = SentenceCache(args.cache_dir) if args.sentence_cache else None
+        stats = CompilationStats() if args.stats or args.stats_json else None
+        profiler = RuleProfiler(memory=True) if args.profile or args.profile_stacks else None
+        compiler = CnlWizardCompiler(args.parser, cache, args.seed, args.inline, args.debug, sentence_cache,
+                                     args.prelude, not args.no_fast_path, stats, profiler)
+        with profiler.profiling() if profiler else contextlib.nullcontext():
+            files = compile_files(args, compiler)
+        if args.stats_json:
+            stats.dump(args.stats_json, files)
+        if sentence_cache:
+            print(sentence_cache.report(), file=sys.stderr)
+            if cache:
+                # the database of the sentence cache is bounded with the parsers
+                cache.evict()
+        if args.stats:
+            print(stats.report(), file=sys.stderr)
+        if args.profile:
+            print(profiler.report(args.profile), file=sys.stderr)
+        if args.profile_stacks:
+            profiler.write_stacks(args.profile_stacks)
+    return
+
+
+def compile_files(args: argparse.Namespace, compiler: CnlWizardCompiler) -> dict | None:
+    """
+    Compile the cnl text files of the arguments, returning the stats of each one in batch mode.
+    """
+    files = None
+    if args.jobs > 1 and len(args.compile) == 3 and os.path.isfile(args.compile[2]) \
+            and not args.parallel_propositions:
+        print('A single cnl text is compiled by one process, unless --parallel-propositions is given', file=sys.stderr)
+    if args.stream:
+        if len(args.compile) != 3:
+            raise argparse.ArgumentTypeError(f'Argument stream requires a single cnl text file')
+        compiler.compile_stream(args.compile[0], args.compile[1], args.compile[2], sys.stdout)
+    elif len(args.compile) == 3 and os.path.isfile(args.compile[2]):
         print("---- INIT_COMPILE -------------------------------------------------------------------------------------")
-        print(CnlWizardCompiler().compile(args.compile[0], args.compile[1], args.compile[2]))
+        jobs = args.jobs if args.parallel_propositions else 1
+        print(compiler.render(compiler.compile(args.compile[0], args.compile[1], args.compile[2], jobs)))
         print("---- FINE_COMPILE -------------------------------------------------------------------------------------")
-    return
+    else:
+        start = time.perf_counter()
+        results = compiler.compile_batch(args.compile[0], args.compile[1], cnl_text_files(args.compile[2:]),
+                                         args.out_dir, args.jobs)
+        print_summary(results, time.perf_counter() - start)
+        files = {result.cnl_text_file: result.stats for result in results}
+    return files
+
+
+def cnl_text_files(paths: list[str]) -> list[str]:
+    """
+    Expand folders and glob patterns into the list of cnl text files,
+    skipping the hidden files and the results of the compilations (see CnlWizardCompiler.OUT_EXTENSION).
+    """
+    def is_cnl_text(file: str) -> bool:
+        return os.path.isfile(file) and not os.path.basename(file).startswith('.') \
+            and not file.endswith(CnlWizardCompiler.OUT_EXTENSION)
+
+    res = []
+    for path in paths:
+        if os.path.isdir(path):
+            res += sorted(file for file in (os.path.join(path, file) for file in os.listdir(path)) if is_cnl_text(file))
+        elif os.path.isfile(path):
+            res.append(path)
+        else:
+            matches = sorted(file for file in glob.glob(path) if is_cnl_text(file))
+            if not matches:
+                raise FileNotFoundError(f'No cnl text file matches {path}')
+            res += matches
+    return res
+
+
+def print_summary(results: list[CompilationResult], wall_time: float):
+    print("---- SUMMARY ------------------------------------------------------------------------------------------")
+    for result in results:
+        print(result)
+    failed = len([result for result in results if result.error])
+    print(f'{len(results) - failed} compiled, {failed} failed in {wall_time:.3f}s')
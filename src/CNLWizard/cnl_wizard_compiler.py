@@ -1,15 +1,36 @@
+import contextlib
 import copy
+import hashlib
+import itertools
 import logging
 import os
+import re
 import sys
-from typing import Callable
-import uuid
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, TextIO
 import lark
 
-from lark import Lark, UnexpectedInput, Transformer, Tree
+from lark import Lark, UnexpectedInput, Transformer, Tree, Token, Discard
+from lark.exceptions import GrammarError, LarkError
+from lark.grammar import Rule
+from lark.lexer import TerminalDef
 
-from CNLWizard.process_cnl import process_cnl_specification
-from CNLWizard.reader import pyReader
+from CNLWizard import parallel
+from CNLWizard.exception.exception import NotStreamableError
+from CNLWizard.fact_path import FactPath
+from CNLWizard.parser_cache import ParserCache
+from CNLWizard.prelude import Prelude
+from CNLWizard.profiler import RuleProfiler
+from CNLWizard.process_cnl import process_propositions, split_propositions, preprocessing_grammar, \
+    PropositionTemplate, SymbolicProposition, FactsDirective
+from CNLWizard.reader import pyReader, pyModule
+from CNLWizard.sentence_cache import SentenceCache
+from CNLWizard.stats import CompilationStats
+from CNLWizard.template_expansion import TemplateExpansion
 
 
 class Signature:
@@ -24,6 +45,25 @@ class Signature:
     def __str__(self):
         return f'{self.name}({",".join(map(str, self.fields.values()))})'
 
+    def copy(self):
+        """
+        Instance of the signature.
+        Immutable attributes (name, type and bounds) are shared with the signature,
+        while containers (e.g. fields and keys) are copied, thus the instance can be modified
+        without affecting the signature.
+        Custom signature types holding nested mutable values should override this method.
+        """
+        instance = object.__new__(type(self))
+        attributes = self.__dict__.copy()
+        for name, value in attributes.items():
+            if type(value) in _MUTABLE_CONTAINERS:
+                attributes[name] = value.copy()
+        instance.__dict__ = attributes
+        return instance
+
+
+_MUTABLE_CONTAINERS = {dict, list, set, defaultdict}
+
 
 class Signatures:
     def __init__(self, signature_type: type = Signature, signature_field_null_value: any = '_'):
@@ -32,7 +72,11 @@ class Signatures:
         self.signature_field_null_value = signature_field_null_value
 
     def __getitem__(self, item) -> Signature:
-        return copy.deepcopy(self.signatures[item])
+        signature = self.signatures[item]
+        if isinstance(signature, Signature):
+            return signature.copy()
+        # custom signature types not extending Signature
+        return copy.deepcopy(signature)
 
     def __contains__(self, key):
         return key in self.signatures
@@ -65,21 +109,215 @@ class Signatures:
                 self.signatures[key].ub = None
 
 
+class VariableAllocator:
+    """
+    Allocator of the fresh variables V1, V2, ...
+    The names used in the CNL text are reserved, thus fresh variables never collide with the user variables.
+    The same seed and the same CNL text always produce the same sequence of variables.
+    """
+
+    def __init__(self, prefix: str = 'V', seed: int = 0):
+        self.prefix = prefix
+        self.counter = seed
+        self.reserved: set[str] = set()
+        self.allocated = 0  # number of variables allocated
+
+    def reset(self, seed: int = 0):
+        self.counter = seed
+
+    def reserve(self, text: str):
+        self.reserved.update(re.findall(rf'\b{re.escape(self.prefix)}\d+\b', text))
+
+    def __call__(self) -> str:
+        while True:
+            self.counter += 1
+            var = f'{self.prefix}{self.counter}'
+            if var not in self.reserved:
+                self.allocated += 1
+                return var
+
+
+class CompilationContext:
+    """
+    State of a compilation: signatures, constants, lists and the objects of the target language
+    (e.g. the CP model) created by the libraries.
+    The running context is bound to the current thread (or asyncio task) and it is accessed with context().
+    """
+
+    def __init__(self):
+        self.signatures = Signatures()
+        self.config = {
+            'signatures': True,
+            'var_substitution': True,
+            'expansion_budget': None,  # maximum number of clones of a proposition
+            'expansion_budget_abort': False,  # raise an error, instead of a warning, over the budget
+            'facts_directive': FactsDirective.KEYWORDS['en']  # keywords of the directive (see FactsDirective)
+        }
+        self.vars = dict()
+        self.constants = dict()
+        self.lists = dict()
+        self.objects = dict()
+        self.variables = VariableAllocator()
+        self._tokens = []
+
+    def declarations(self) -> str:
+        """
+        Digest of the signatures, constants and lists, i.e. the declarations in scope of the next propositions.
+        """
+        signatures = [(name, getattr(signature, '__dict__', signature))
+                      for name, signature in self.signatures.signatures.items()]
+        return hashlib.sha256(repr((signatures, self.constants, self.lists)).encode()).hexdigest()
+
+    def snapshot(self) -> "CompilationContext":
+        """
+        Copy of the declarations, of the configuration and of the fresh variables, without the objects
+        of the target language, e.g. to be sent to the processes compiling the propositions.
+        """
+        res = CompilationContext()
+        res.load(self)
+        return res
+
+    def load(self, snapshot: "CompilationContext"):
+        """
+        Replace the declarations, the configuration and the fresh variables with a copy of the ones of the snapshot.
+        """
+        self.signatures = copy.deepcopy(snapshot.signatures)
+        self.config = copy.deepcopy(snapshot.config)
+        self.vars = copy.deepcopy(snapshot.vars)
+        self.constants = copy.deepcopy(snapshot.constants)
+        self.lists = copy.deepcopy(snapshot.lists)
+        self.variables = copy.deepcopy(snapshot.variables)
+
+    def get(self, name: str, factory: Callable):
+        if name not in self.objects:
+            self.objects[name] = factory()
+        return self.objects[name]
+
+    def __enter__(self):
+        self._tokens.append(_context.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _context.reset(self._tokens.pop())
+
+
+_context: ContextVar[CompilationContext] = ContextVar('cnl_wizard_context')
+
+
+def context() -> CompilationContext:
+    """
+    The context of the running compilation.
+    Outside a compilation, each thread uses a default context.
+    """
+    try:
+        return _context.get()
+    except LookupError:
+        default = CompilationContext()
+        _context.set(default)
+        return default
+
+
+class ContextObject:
+    """
+    Module level object of a library bound to the running compilation context.
+    Each context has its own instance, created by factory on first access,
+    while the library keeps using the object as a global variable.
+    """
+
+    def __init__(self, name: str, factory: Callable):
+        self._name = name
+        self._factory = factory
+
+    def get(self):
+        return context().get(self._name, self._factory)
+
+    def __getattr__(self, item):
+        return getattr(self.get(), item)
+
+    def __getitem__(self, item):
+        return self.get()[item]
+
+    def __setitem__(self, key, value):
+        self.get()[key] = value
+
+    def __delitem__(self, key):
+        del self.get()[key]
+
+    def __contains__(self, item):
+        return item in self.get()
+
+    def __iter__(self):
+        return iter(self.get())
+
+    def __len__(self):
+        return len(self.get())
+
+    def __bool__(self):
+        return bool(self.get())
+
+    def __str__(self):
+        return str(self.get())
+
+    def __repr__(self):
+        return repr(self.get())
+
+
+class _ContextAttribute:
+    """
+    Attribute of CnlWizardCompiler stored in the running compilation context.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        return getattr(context(), self.name)
+
+    def __set__(self, instance, value):
+        setattr(context(), self.name, value)
+
+
+class _CnlWizardCompilerMeta(type):
+    def __setattr__(cls, name, value):
+        # CnlWizardCompiler.signatures = ... sets the signatures of the running context
+        attribute = cls.__dict__.get(name)
+        if isinstance(attribute, _ContextAttribute):
+            attribute.__set__(None, value)
+        else:
+            super().__setattr__(name, value)
+
+
 class CNLTransformer(Transformer):
     """
     Compiling the CNL specification.
     The default function call the corresponding defined function.
     """
 
-    def __init__(self, functions: dict):
+    def __init__(self, functions: dict, root: str = 'start', graph: bool = True):
         super().__init__()
         self._functions = functions
+        self._root = root
+        self._graph = graph
+        self.impure_calls = 0
 
     def __default__(self, data, children, meta):
+        if data == FactsDirective.RULE:
+            # the facts are propositions of the root
+            return _Facts(self.facts(children[0]))
+        if data == self._root:
+            children = _flatten(children)
+            if self._graph:
+                # the graph node is the last child of the root, it is compiled by the heuristics functions
+                graph = self.__default__('graph', [None], meta)
+                if graph is not lark.Discard:
+                    children = children + [graph]
         if data in self._functions:
             if not children:
                 return lark.Discard
-            call_res = self._functions[data](*children)
+            function = self._functions[data]
+            if getattr(function, 'impure', False):
+                self.impure_calls += 1
+            call_res = function(*children)
             if call_res is None:
                 return lark.Discard
             return call_res
@@ -88,68 +326,864 @@ class CNLTransformer(Transformer):
     def __default_token__(self, token):
         return token.value
 
+    def facts(self, directive: FactsDirective) -> Iterator:
+        """
+        Translations of the rows of the directive, compiled one at a time by the facts function.
+        """
+        facts = self.__default__('facts', [directive.name, directive.rows()], None)
+        return iter([]) if facts is lark.Discard else (fact for fact in facts if fact is not None)
+
+    def transform_children(self, tree: Tree) -> list:
+        """
+        Compile the children of the root, i.e. the propositions of the text, without calling the root function.
+        """
+        return _flatten(self._transform_children(tree.children))
+
+
+class _ProfilingTransformer(CNLTransformer):
+    """
+    CNLTransformer calling the functions through the profiler (see RuleProfiler).
+    """
 
-class CnlWizardCompiler:
-    signatures = Signatures()
-    config = {
-        'signatures': True,
-        'var_substitution': True
-    }
-    vars = dict()
-    constants = dict()
+    def __init__(self, profiler: RuleProfiler, functions: dict, root: str = 'start', graph: bool = True):
+        super().__init__(profiler.wrap(functions), root, graph)
+        self._profiler = profiler
+
+    def _transform_tree(self, tree: Tree):
+        with self._profiler.rule(tree.data):
+            return super()._transform_tree(tree)
+
+
+class _Facts(list):
+    """
+    Translations of the facts of a FactsDirective.
+    """
+
+
+def _flatten(children: Iterable) -> list:
+    res = []
+    for child in children:
+        if isinstance(child, _Facts):
+            res += child
+        else:
+            res.append(child)
+    return res
+
+
+class _InlineCallbacks:
+    """
+    Callbacks of the LALR parser, each rule is compiled as soon as it is reduced,
+    so that the parse tree is never built.
+    The transformer is set before each parse, thus the parser is built only once.
+    """
 
     def __init__(self):
-        self.vars = dict()
-        self.lists = dict()
-        logging.basicConfig(format='%(levelname)s :: %(name)s :: %(message)s')
+        self.transformer: CNLTransformer | None = None
+
+    def __default__(self, data, children, meta):
+        if data.startswith('_'):
+            # inlined rules (e.g. repetitions) are expanded by the parser into their parent
+            return Tree(data, children, meta)
+        # the parser does not apply the tokens callback and does not remove the discarded children
+        children = [child.value if isinstance(child, Token) else child
+                    for child in children if child is not lark.Discard]
+        return self.transformer.__default__(data, children, meta)
+
+
+class _ConflictHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.thread = threading.get_ident()
+        self.conflicts: list[str] = []
+
+    def emit(self, record: logging.LogRecord):
+        message = record.getMessage().strip()
+        # each conflict is followed by its rule
+        if record.thread == self.thread and (message.startswith('Shift/Reduce')
+                                             or (message.startswith('*') and self.conflicts)):
+            self.conflicts.append(message)
+
+
+_lark_logger_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _shift_reduce_conflicts() -> Iterator[list[str]]:
+    """
+    The shift/reduce conflicts found while building a LALR parser, that Lark resolves as shift
+    and logs at debug level (the handlers of the Lark logger are suspended meanwhile).
+    """
+    handler = _ConflictHandler()
+    with _lark_logger_lock:
+        level, handlers, propagate = lark.logger.level, lark.logger.handlers, lark.logger.propagate
+        lark.logger.setLevel(logging.DEBUG)
+        lark.logger.handlers, lark.logger.propagate = [handler], False
+        try:
+            yield handler.conflicts
+        finally:
+            lark.logger.setLevel(level)
+            lark.logger.handlers, lark.logger.propagate = handlers, propagate
+
+
+class CnlParser:
+    """
+    Parser of the CNL text.
+    LALR is preferred since it parses in linear time, Earley is used as fallback whenever
+    the grammar has conflicts, i.e. reduce/reduce conflicts that prevent the construction of the LALR tables
+    or shift/reduce conflicts that Lark resolves as shift (thus LALR could reject or parse differently
+    the texts accepted by Earley), and from the first input rejected by the LALR parser onwards.
+    quiet reports the conflicts only at info level, e.g. in the worker processes of a parallel compilation.
+    """
+    AUTO = 'auto'
+    LALR = 'lalr'
+    EARLEY = 'earley'
+    MODES = [AUTO, LALR, EARLEY]
+
+    def __init__(self, grammar: str, mode: str = AUTO, cache: ParserCache | None = None, fast_path: bool = True,
+                 quiet: bool = False, **options):
+        if mode not in CnlParser.MODES:
+            raise ValueError(f'Unknown parser mode {mode}, expected one of: {", ".join(CnlParser.MODES)}')
+        self.grammar = grammar
+        self.mode = mode
+        self.options = options
+        self.cache = cache
+        self.fast_path = fast_path  # parse the facts with the parser of their rule alone (see FactPath)
+        self.conflicts: list[str] = []  # conflicts preventing the usage of LALR
+        self.from_cache = False
+        self.quiet = quiet
         self.logger = logging.getLogger(type(self).__name__)
+        self._lalr: Lark | None = None
+        self._rejected = False  # the LALR parser rejected an input, Earley is used from then on
+        self._earley: Lark | None = None
+        self._inline: Lark | None = None
+        self._callbacks = _InlineCallbacks()
+        self._terminals: dict[str, re.Pattern] | None = None
+        self._facts: FactPath | None | bool = None
+        start = time.perf_counter()
+        if mode != CnlParser.EARLEY:
+            self._lalr = self._build_lalr()
+        if self._lalr is None:
+            self._get_earley()
+        self.build_time = time.perf_counter() - start
 
-    def compile(self, grammar_file: str, py_file: str, cnl_text_file: str):
-        print(f"grammar_file: {grammar_file}")
-        print(f"py_file: {py_file}")
-        print(f"cnl_text_file: {cnl_text_file}")
+    def _build_lalr(self) -> Lark | None:
+        options = self.options | {'parser': 'lalr', 'lexer': 'contextual'}
+        if self.cache:
+            # the shift/reduce conflicts are stored with the parser, the forced LALR mode ignores them
+            conflicts = self.cache.load_conflicts(self.grammar, options) if self.mode == CnlParser.AUTO else None
+            parser = self.cache.load(self.grammar, options) if not conflicts else None
+            if parser is not None or conflicts:
+                self.from_cache = True
+                return parser if parser is not None else self._lalr_conflicts(conflicts)
+        with _shift_reduce_conflicts() as shift_reduce:
+            try:
+                parser = Lark(self.grammar, **options)
+            except GrammarError as e:
+                conflicts = [line.strip() for line in str(e).splitlines() if line.strip()]
+                if self.cache:
+                    self.cache.save_conflicts(self.grammar, options, conflicts)
+                return self._lalr_conflicts(conflicts)
+        if self.cache:
+            self.cache.save(self.grammar, options, parser)
+            if shift_reduce:
+                self.cache.save_conflicts(self.grammar, options, shift_reduce)
+        if shift_reduce and self.mode == CnlParser.AUTO:
+            return self._lalr_conflicts(shift_reduce)
+        return parser
 
-        with open(grammar_file, 'r') as grammar:
-            grammar = grammar.read()
-        with open(cnl_text_file, 'r') as cnl_text_file:
-            cnl_text_file = cnl_text_file.read()
-        functions = pyReader().get_functions(py_file)
+    def _lalr_conflicts(self, conflicts: list[str]) -> None:
+        if self.mode == CnlParser.LALR:
+            raise GrammarError('\n'.join(conflicts))
+        self.conflicts = conflicts
+        self.logger.log(logging.INFO if self.quiet else logging.WARNING, self.report())
+        return None
 
+    @property
+    def parser(self) -> str:
+        return CnlParser.LALR if self._lalr and not self._rejected else CnlParser.EARLEY
 
-        #print("---- INIT_GRAMMAR -------------------------------------------------------------------------------------")
-        #print(grammar)
-        #print("---- FINE_GRAMMAR -------------------------------------------------------------------------------------")
+    def report(self) -> str:
+        if not self.conflicts:
+            return 'The grammar is LALR compatible.'
+        conflicts = '\n'.join(f'    {conflict}' for conflict in self.conflicts)
+        return f'The grammar is not LALR compatible, falling back to Earley. Conflicts:\n{conflicts}'
 
-        #print("---- INIT_CNLTEXT -------------------------------------------------------------------------------------")
-        #print(cnl_text_file)
-        #print("---- FINE_CNLTEXT -------------------------------------------------------------------------------------")
+    def _get_earley(self) -> Lark:
+        if self._earley is None:
+            self._earley = Lark(self.grammar, **self.options)
+        return self._earley
 
-        #print("---- INIT_FUNCTIONS -------------------------------------------------------------------------------------")
-        #print(functions)
-        #print("---- FINE_FUNCTIONS -------------------------------------------------------------------------------------")
+    def _get_inline(self) -> Lark:
+        if self._inline is None:
+            # same tables of the LALR parser, with the callbacks in place of the tree construction
+            data, memo = self._lalr.memo_serialize([TerminalDef, Rule])
+            self._inline = Lark._load_from_dict(data, memo, transformer=self._callbacks)
+        return self._inline
 
+    def _get_facts(self) -> FactPath | None:
+        if self._facts is None:
+            self._facts = False
+            if self.fast_path and re.search(rf'^[?!]?{FactPath.RULE}\s*:', self.grammar, re.MULTILINE):
+                try:
+                    self._facts = FactPath(self)
+                except LarkError as e:
+                    self.logger.info(f'The facts cannot be parsed on their own: {e}')
+        return self._facts or None
 
-        lark = Lark(grammar)
-        processed_cnl = process_cnl_specification(self, cnl_text_file, self.config)
+    @property
+    def backend(self) -> Lark:
+        """
+        The Lark parser used to parse the texts, i.e. the LALR one whenever possible.
+        """
+        return self._lalr if self.parser == CnlParser.LALR else self._get_earley()
 
-        #print("---- INIT_PROCESSED -------------------------------------------------------------------------------------")
-        #print(processed_cnl)
-        #print("---- FINE_PROCESSED -------------------------------------------------------------------------------------")
+    @property
+    def terminals(self) -> dict[str, re.Pattern]:
+        """
+        The regular expressions of the terminals of the grammar.
+        """
+        if self._terminals is None:
+            self._terminals = {terminal.name: re.compile(terminal.pattern.to_regexp())
+                               for terminal in self.backend.terminals}
+        return self._terminals
+
+    def parse_propositions(self, propositions: list[str | PropositionTemplate]) -> Tree:
+        """
+        Parse the pre-processed propositions.
+        The clones of the templates are parsed once for each lexical shape of their values
+        (i.e. the terminals matching them) and the other ones are instantiated from the parsed trees,
+        thus the parsing time does not depend on the number of clones.
+        """
+        if propositions and (any(isinstance(proposition, FactsDirective) for proposition in propositions)
+                             or self._get_facts() is not None):
+            return self._parse_runs(propositions)
+        return self._parse_run(propositions)
+
+    def _parse_run(self, propositions: list[str | PropositionTemplate]) -> Tree:
+        if not any(isinstance(proposition, PropositionTemplate) for proposition in propositions):
+            return self.parse('\n'.join(propositions))
+        tree = TemplateExpansion(self, propositions).parse()
+        if tree is None:
+            self.logger.info('The parsed clones do not match the propositions, parsing all the clones.')
+            return self.parse('\n'.join(map(str, propositions)))
+        return tree
+
+    def _parse_runs(self, propositions: list[str | PropositionTemplate | FactsDirective]) -> Tree:
+        # the directives are left to the transformer, and the facts are parsed by the fast path (if any),
+        # the propositions between them are parsed together
+        facts = self._get_facts()
+        children = []
+        run = []
+        for proposition in propositions + [None]:
+            if isinstance(proposition, FactsDirective):
+                tree = Tree(FactsDirective.RULE, [proposition])
+            elif facts is not None and isinstance(proposition, str):
+                tree = facts.parse(proposition)
+            else:
+                tree = None
+            if proposition is not None and tree is None:
+                run.append(proposition)
+                continue
+            if run:
+                children += self._parse_run(run).children
+                run = []
+            if tree is not None:
+                children.append(tree)
+        return Tree(self.options.get('start', 'start'), children)
 
+    def transform(self, text: str, transformer: CNLTransformer):
+        """
+        Parse and compile the text.
+        Whenever the LALR parser is available the text is compiled while parsing,
+        in this case the parsing errors are raised since the functions of the parsed
+        rules have been already called, and the Earley fallback is not possible.
+        """
+        if self.parser != CnlParser.LALR:
+            return transformer.transform(self.parse(text))
+        self._callbacks.transformer = transformer
         try:
-            parse_tree = lark.parse(processed_cnl)
+            return self._get_inline().parse(text)
+        except UnexpectedInput:
+            self._rejected = self.mode == CnlParser.AUTO
+            raise
+        finally:
+            self._callbacks.transformer = None
+
+    def parse(self, text: str) -> Tree:
+        if self.parser == CnlParser.LALR:
+            try:
+                return self._lalr.parse(text)
+            except UnexpectedInput as e:
+                if self.mode == CnlParser.LALR:
+                    raise
+                self._rejected = True
+                self.logger.warning(f'LALR parser rejected the input at line {e.line}, column {e.column}, '
+                                    f'parsing with Earley from now on.')
+        return self._get_earley().parse(text)
+
+
+class CompilationResult:
+    def __init__(self, cnl_text_file: str, out_file: str | None, time: float, error: str | None = None,
+                 stats: dict | None = None):
+        self.cnl_text_file = cnl_text_file
+        self.out_file = out_file
+        self.time = time
+        self.error = error  # the error message, not the exception, so that results can be sent between processes
+        self.stats = stats  # see CompilationStats.as_dict
 
-            parse_tree.children.append(Tree("graph", [None]))
+    def __str__(self):
+        if self.error:
+            return f'{self.cnl_text_file}: failed in {self.time:.3f}s ({self.error})'
+        return f'{self.cnl_text_file}: {self.out_file} in {self.time:.3f}s'
+
+
+class CnlWizardCompiler(metaclass=_CnlWizardCompilerMeta):
+    OUT_EXTENSION = '.out'  # extension of the files written by compile_batch
+    # kept for compatibility, they are the attributes of the running compilation context
+    signatures = _ContextAttribute('signatures')
+    config = _ContextAttribute('config')
+    vars = _ContextAttribute('vars')
+    constants = _ContextAttribute('constants')
+    lists = _ContextAttribute('lists')
+
+    def __init__(self, parser: str = CnlParser.AUTO, cache: ParserCache | None = None, seed: int = 0,
+                 inline: bool = False, debug: bool = False, sentence_cache: SentenceCache | None = None,
+                 prelude: str | None = None, fast_path: bool = True, stats: CompilationStats | None = None,
+                 profiler: RuleProfiler | None = None):
+        self.parser = parser
+        self.cache = cache
+        self.seed = seed  # initial value of the fresh variables counter
+        self.inline = inline  # compile while parsing, without building the parse tree
+        self.debug = debug  # log the parse tree
+        self.sentence_cache = sentence_cache  # compile proposition by proposition, reusing the cached translations
+        self.prelude_file = prelude  # cnl text compiled once, before each compiled text
+        self.prelude: Prelude | None = None
+        self.prelude_text: str | None = None  # the prelude, whenever its state cannot be reused
+        self.data_dir: str | None = None  # folder of the files of the facts directives, the working one if None
+        self.fast_path = fast_path  # parse the facts with the parser of their rule alone
+        self.stats = stats  # times and sizes of the stages of the compilation
+        self.profiler = profiler  # times of the functions of the rules
+        self.parse_error: str | None = None  # the parsing error of the last compiled text, which is not translated
+        logging.basicConfig(format='%(levelname)s :: %(name)s :: %(message)s')
+        self.logger = logging.getLogger(type(self).__name__)
+        if debug:
+            self.logger.setLevel(logging.DEBUG)
+
+    def compile(self, grammar_file: str, py_file: str, cnl_text_file: str, jobs: int = 1):
+        self.logger.info(f"grammar_file: {grammar_file}")
+        self.logger.info(f"py_file: {py_file}")
+        self.logger.info(f"cnl_text_file: {cnl_text_file}")
 
+        self.data_dir = os.path.dirname(cnl_text_file)
+        with self.stage('read'):
+            with open(grammar_file, 'r') as grammar:
+                grammar = grammar.read()
+            with open(cnl_text_file, 'r') as cnl_text:
+                cnl_text = cnl_text.read()
+        cnl_text_file = cnl_text
+        # each compilation starts from a new context, it stays active after the compilation
+        # so that the results (and the state) of the compilation can be inspected
+        CnlWizardCompiler.reset()
+        with self.stage('functions'):
+            functions = pyReader().get_functions(py_file)
+        with self.stage('lark'):
+            lark = CnlParser(grammar, self.parser, self.cache, self.fast_path)
+        self._report_parser(lark)
+        with self.stage('prelude'):
+            self.load_prelude(lark, py_file, lambda: pyReader().get_functions(py_file))
+        if jobs > 1:
+            return self.compile_parallel(lark, py_file, functions, cnl_text_file, jobs)
+        return self.compile_text(lark, functions, cnl_text_file)
 
-            print("---- INIT_TREE -------------------------------------------------------------------------------------")
-            print(parse_tree.pretty())
-            print("---- FINE_TREE -------------------------------------------------------------------------------------")
+    def compile_parallel(self, lark: CnlParser, py_file: str, functions: dict, cnl_text: str, jobs: int):
+        """
+        Compile the CNL text in the running context in two phases: the propositions are pre-processed
+        sequentially, collecting the declarations (signatures and lists) in a snapshot of the context,
+        then they are split in consecutive chunks translated by jobs processes starting from the snapshot,
+        and the translations are merged in the order of the text.
+        The fresh variables are the same of the sequential compilation, since the chunks using them
+        are translated again from the right counter whenever it is different from the guessed one.
+        Whenever a chunk changes the declarations or the objects of the context (e.g. a constant definition
+        or the CP model), or calls an impure function, the text is compiled sequentially.
+        The state kept by the functions in their modules is not shared by the processes: the functions
+        keeping one (e.g. filling a graph rendered by the start function) must be marked @impure.
+        """
+        if preprocessing_grammar(self.config) is None or self.sentence_cache or self.inline or self.prelude_text \
+                or self.profiler:
+            return self.compile_text(lark, functions, cnl_text)
+        self._count('input_bytes', len(cnl_text.encode()))
+        prelude = self._start_context(cnl_text)
+        propositions = self._preprocess(functions, split_propositions([cnl_text]))
+        snapshot = context().snapshot()
+        chunks = parallel.split_chunks(propositions, jobs * 4)
+        try:
+            # the chunks are parsed and transformed by the workers, only the wall time is meaningful
+            with self.stage('parallel'), \
+                    ProcessPoolExecutor(max_workers=jobs, initializer=parallel.init_worker,
+                                        initargs=(lark.grammar, py_file, self.parser, self.cache, self.seed,
+                                                  False, False, None, None, None, self.fast_path)) as executor:
+                translations = parallel.translate_chunks(executor, snapshot, chunks)
+        except Exception as e:
+            translations = None
+            self.logger.info(f'{type(e).__name__}: {e}')
+        if translations is None:
+            self.logger.warning('The propositions cannot be compiled in parallel, compiling sequentially.')
+            CnlWizardCompiler.reset()
+            return self._compile_text(lark, pyReader().get_functions(py_file), cnl_text)
+        with self.stage('transform'):
+            res = self.transformer(functions).__default__('start', (prelude or []) + translations, None)
+        return None if res is Discard else res
+
+    def compile_text(self, lark: CnlParser, functions: dict, cnl_text: str):
+        """
+        Compile the CNL text in the running context.
+        """
+        self._count('input_bytes', len(cnl_text.encode()))
+        return self._compile_text(lark, functions, cnl_text)
 
+    def _compile_text(self, lark: CnlParser, functions: dict, cnl_text: str):
+        self.parse_error = None
+        if self.prelude_text:
+            cnl_text = f'{self.prelude_text}\n{cnl_text}'
+        prelude = self._start_context(cnl_text)
+        if self.sentence_cache:
+            return self._compile_cached(lark, functions, cnl_text, prelude or [])
+        if preprocessing_grammar(self.config) is None:
+            propositions = [cnl_text]
+        else:
+            propositions = self._preprocess(functions, split_propositions([cnl_text]))
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('pre-processed propositions:\n' + '\n'.join(map(str, propositions)))
+        try:
+            if self.inline and lark.parser == CnlParser.LALR and not self.debug and prelude is None \
+                    and not any(isinstance(proposition, FactsDirective) for proposition in propositions):
+                # the functions are called while parsing, a text rejected by LALR is not compiled
+                with self.stage('inline'):
+                    return lark.transform('\n'.join(map(str, propositions)), self.transformer(functions))
+            if prelude is not None and not propositions:
+                # only the prelude
+                res = self.transformer(functions).__default__('start', prelude, None)
+                return None if res is Discard else res
+            with self.stage('parse'):
+                parse_tree = lark.parse_propositions(propositions)
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug('parse tree:\n' + parse_tree.pretty())
         except UnexpectedInput as e:
             self.logger.error(e)
+            self.parse_error = f'{type(e).__name__}: {str(e).strip()}'
             return ''
-        return CNLTransformer(functions).transform(parse_tree)
+        with self.stage('transform'):
+            if prelude is None:
+                return self.transformer(functions).transform(parse_tree)
+            transformer = self.transformer(functions)
+            res = transformer.__default__(parse_tree.data, prelude + transformer.transform_children(parse_tree),
+                                          parse_tree.meta)
+        return None if res is Discard else res
+
+    def _report_parser(self, lark: CnlParser):
+        if self.inline and lark.parser != CnlParser.LALR:
+            self.logger.warning('The grammar is not LALR compatible, the cnl is compiled without --inline.')
+        # on stderr, as the reports of the sentence cache and of the stats
+        # only the LALR parsers are loaded from the cache, for Earley the cache spares the LALR construction
+        warm = lark.from_cache and lark.parser == CnlParser.LALR
+        conflicts = ', conflicts from the cache' if lark.from_cache and lark.conflicts else ''
+        print(f"parser: {lark.parser} ({'warm' if warm else 'cold'} start in {lark.build_time:.3f}s{conflicts})",
+              file=sys.stderr)
+
+    def transformer(self, functions: dict, graph: bool = True) -> CNLTransformer:
+        """
+        The transformer calling the functions, profiled by the profiler (if any).
+        """
+        if self.profiler is None:
+            return CNLTransformer(functions, graph=graph)
+        return _ProfilingTransformer(self.profiler, functions, graph=graph)
+
+    def stage(self, name: str):
+        """
+        Context recording a stage of the compilation in the stats (if any).
+        """
+        return contextlib.nullcontext() if self.stats is None else self.stats.stage(name)
+
+    def _count(self, name: str, value: int):
+        if self.stats is not None:
+            self.stats.count(name, value)
+
+    def _preprocess(self, functions: dict, sentences: Iterable[str]) -> list:
+        with self.stage('preprocess'):
+            if self.stats is not None:
+                sentences = list(sentences)
+                self.stats.count('propositions', sum(1 for sentence in sentences if sentence.strip()))
+            propositions = list(process_propositions(self, sentences, self.config, True,
+                                                     'symbolic_substitution' in functions, 'facts' in functions,
+                                                     self.data_dir))
+        if self.stats is not None:
+            # the clones of the where-clauses, a single proposition for the symbolic ones
+            self.stats.count('expanded_propositions', sum(
+                sum(1 for _ in proposition) if type(proposition) is PropositionTemplate else 1
+                for proposition in propositions))
+        return propositions
+
+    def render(self, res) -> str:
+        """
+        Text of the result of a compilation.
+        """
+        with self.stage('output'):
+            res = str(res)
+        self._count('output_bytes', len(res.encode()))
+        return res
+
+    def _start_context(self, cnl_text: str | None) -> list | None:
+        """
+        Prepare the running context for the compilation of the CNL text, i.e. the fresh variables,
+        or the state after the compilation of the prelude, whose translations are returned.
+        """
+        if self.prelude is None:
+            context().variables.reset(self.seed)
+        else:
+            context().load(self.prelude.context)
+        if cnl_text is not None:
+            context().variables.reserve(cnl_text)
+        return None if self.prelude is None else copy.deepcopy(self.prelude.translations)
+
+    def load_prelude(self, lark: CnlParser, py_file: str, load_functions: Callable[[], dict]):
+        """
+        Compile the prelude (if any), or load it from the cache of the parsers.
+        The state of the prelude cannot be reused whenever it creates objects of the target language
+        or calls impure functions, in this case its text is compiled before each CNL text.
+        """
+        if self.prelude_file is None:
+            return
+        with open(self.prelude_file, 'r') as text:
+            text = text.read()
+        path = None
+        if self.cache:
+            path = os.path.join(self.cache.cache_dir, Prelude.key(lark.grammar, py_file, text, self.seed) + Prelude.EXT)
+        self.prelude = Prelude.load(path) if path else None
+        if self.prelude is not None:
+            return
+        config = copy.deepcopy(self.config)
+        with CompilationContext() as prelude_context:
+            prelude_context.config = config
+            functions = load_functions()
+            prelude_context.variables.reset(self.seed)
+            prelude_context.variables.reserve(text)
+            transformer = self.transformer(functions, graph=False)
+            if preprocessing_grammar(self.config) is None:
+                propositions = [text]
+            else:
+                propositions = list(process_propositions(self, split_propositions([text]), self.config, True,
+                                                         'symbolic_substitution' in functions, 'facts' in functions,
+                                                         os.path.dirname(self.prelude_file)))
+            translations = transformer.transform_children(lark.parse_propositions(propositions)) \
+                if propositions else []
+            if transformer.impure_calls or prelude_context.objects:
+                self.logger.warning('The state of the prelude cannot be reused, compiling it with each text.')
+                self.prelude_text = text
+                return
+            self.prelude = Prelude(prelude_context.snapshot(), translations)
+        if path and not self.prelude.save(path):
+            self.logger.info('The prelude cannot be saved in the cache.')
+        elif path:
+            self.cache.evict()
+
+    def _compile_cached(self, lark: CnlParser, functions: dict, cnl_text: str, prelude: list):
+        transformer = self.transformer(functions, graph=False)
+        namespace = self.sentence_cache.namespace(lark.grammar, functions)
+        translations = prelude
+        try:
+            for sentence in split_propositions([cnl_text]):
+                try:
+                    for processed in self._preprocess(functions, [sentence]):
+                        translations += self._translate(lark, transformer, namespace, processed)
+                except UnexpectedInput as e:
+                    self.logger.error(f'Proposition at line {sentence.line}: {e}')
+                    self.parse_error = f'{type(e).__name__} at line {sentence.line}: {str(e).strip()}'
+                    return ''
+        finally:
+            self.sentence_cache.commit()
+        res = self.transformer(functions).__default__('start', translations, None)
+        return None if res is Discard else res
+
+    def _translate(self, lark: CnlParser, transformer: CNLTransformer, namespace: str | None,
+                   processed: str | PropositionTemplate) -> list:
+        """
+        Translations of a pre-processed proposition (several ones for the clones of variable substitutions),
+        taken from the sentence cache whenever possible.
+        """
+        if namespace is None or isinstance(processed, FactsDirective):
+            # the facts are read from a file that can change
+            return self._parse_transform(lark, transformer, processed)
+        declarations = context().declarations()
+        key = self.sentence_cache.key(namespace, declarations, str(processed))
+        translations = self.sentence_cache.get(key)
+        if translations is not None:
+            return translations
+        impure_calls = transformer.impure_calls
+        translations = self._parse_transform(lark, transformer, processed)
+        # a proposition without translation is compiled only for the side effects of its functions
+        if not translations or transformer.impure_calls != impure_calls or context().declarations() != declarations:
+            self.sentence_cache.skip()
+        else:
+            self.sentence_cache.put(key, translations)
+        return translations
+
+    def _parse_transform(self, lark: CnlParser, transformer: CNLTransformer,
+                         processed: str | PropositionTemplate | FactsDirective) -> list:
+        with self.stage('parse'):
+            parse_tree = lark.parse_propositions([processed])
+        with self.stage('transform'):
+            return transformer.transform_children(parse_tree)
+
+    def compile_stream(self, grammar_file: str, py_file: str, cnl_text_file: str, out: TextIO):
+        """
+        Compile the CNL text proposition by proposition, writing the translation of each one
+        as soon as it is ready (see stream_text).
+        """
+        with self.stage('read'):
+            with open(grammar_file, 'r') as grammar:
+                grammar = grammar.read()
+        self._count('input_bytes', os.path.getsize(cnl_text_file))
+        CnlWizardCompiler.reset()
+        with self.stage('lark'):
+            lark = CnlParser(grammar, self.parser, self.cache, self.fast_path)
+        self._report_parser(lark)
+        with self.stage('prelude'):
+            self.load_prelude(lark, py_file, lambda: pyReader().get_functions(py_file))
+        self.data_dir = os.path.dirname(cnl_text_file)
+        with self.stage('functions'):
+            functions = pyReader().get_functions(py_file)
+        try:
+            with open(cnl_text_file, 'r') as cnl_text:
+                for res in self.stream_text(lark, functions, cnl_text):
+                    out.write(res)
+                    out.flush()
+        except NotStreamableError as e:
+            self.logger.warning(f'{e}, compiling the whole text.')
+            CnlWizardCompiler.reset()
+            with open(cnl_text_file, 'r') as cnl_text:
+                out.write(self.render(self.compile_text(lark, pyReader().get_functions(py_file), cnl_text.read())))
+        out.write('\n')
+
+    def stream_text(self, lark: CnlParser, functions: dict, cnl_text: Iterable[str]) -> Iterator[str]:
+        """
+        Compile the CNL text in the running context, yielding the translation of each proposition.
+        The text is read incrementally from the chunks (e.g. the lines of a file), so that only one proposition
+        at a time is kept in memory.
+        The translation of a proposition is the result of the start function called on it, and the graph
+        is translated after the last proposition. Hence, the output is the same of compile_text
+        for the languages whose start function concatenates the translations of the propositions (e.g. ASP),
+        while it is not suitable for the ones that process all the propositions together (e.g. solving a model)
+        or that add their own text (e.g. the constants defined so far).
+        The start function is checked before each translation: NotStreamableError is raised whenever it adds
+        a text of its own before the first one, and a warning is logged if it does afterward.
+        The propositions that cannot be parsed are reported and skipped.
+        """
+        streamed = warned = False
+        with contextlib.closing(self._stream_results(lark, functions, cnl_text)) as results:
+            for res in results:
+                added = '' if warned else self._added_by_start(functions)
+                if added and not streamed:
+                    raise NotStreamableError(f'The start function adds {added!r} to the propositions')
+                if added:
+                    self.logger.warning(f'The start function adds {added!r} to the propositions, '
+                                        f'the streamed translation differs from the one of the whole text.')
+                    warned = True
+                streamed = True
+                yield self.render(res)
+
+    def _added_by_start(self, functions: dict) -> str:
+        """
+        The text of the start function called without propositions, empty whenever it only concatenates them.
+        """
+        try:
+            res = functions['start']()
+        except Exception as e:
+            return f'{type(e).__name__}: {e}'
+        return str(res).strip().splitlines()[0] if res and str(res).strip() else ''
+
+    def _stream_results(self, lark: CnlParser, functions: dict, cnl_text: Iterable[str]) -> Iterator:
+        if self.prelude_text:
+            cnl_text = itertools.chain([self.prelude_text, '\n'], cnl_text)
+        prelude = self._start_context(None)
+        transformer = self.transformer(functions, graph=False)
+        namespace = self.sentence_cache.namespace(lark.grammar, functions) if self.sentence_cache else None
+        if prelude:
+            res = transformer.__default__('start', prelude, None)
+            if res is not Discard:
+                yield res
+        try:
+            for sentence in split_propositions(cnl_text):
+                for processed in self._preprocess(functions, [sentence]):
+                    if isinstance(processed, FactsDirective):
+                        # a translation for each row, without reading all the file
+                        for fact in transformer.facts(processed):
+                            res = transformer.__default__('start', [fact], None)
+                            if res is not Discard:
+                                yield res
+                        continue
+                    context().variables.reserve(processed.text if isinstance(processed, SymbolicProposition)
+                                                else str(processed))
+                    try:
+                        translations = self._translate(lark, transformer, namespace, processed)
+                    except UnexpectedInput as e:
+                        self.logger.error(f'Proposition at line {sentence.line}: {e}')
+                        continue
+                    res = transformer.__default__('start', translations, None)
+                    if res is not Discard:
+                        yield res
+        finally:
+            if self.sentence_cache:
+                self.sentence_cache.commit()
+        res = self.transformer(functions).__default__('start', [], None)
+        if res is not Discard:
+            yield res
+
+    def compile_batch(self, grammar_file: str, py_file: str, cnl_text_files: list[str],
+                      out_dir: str = None, jobs: int = 1) -> list[CompilationResult]:
+        """
+        Compile several CNL texts with the same grammar and functions.
+        The parser is built and the functions file compiled only once (per worker process if jobs > 1),
+        while each CNL text is compiled starting from a fresh state.
+        The result of each CNL text is written in out_dir (default: the folder of the CNL text).
+        The results are returned in the same order of cnl_text_files, with the stats of each CNL text
+        (if any), which are added to the ones of the compiler.
+        The CNL texts whose result would overwrite one of the CNL texts are not compiled.
+        """
+        with open(grammar_file, 'r') as grammar:
+            grammar = grammar.read()
+        inputs = {os.path.abspath(cnl_text_file) for cnl_text_file in cnl_text_files}
+        refused = {}
+        for cnl_text_file in cnl_text_files:
+            out_file = self._out_file(cnl_text_file, out_dir)
+            if os.path.abspath(out_file) in inputs:
+                self.logger.error(f'{cnl_text_file}: the output file {out_file} is a cnl text file')
+                refused[cnl_text_file] = CompilationResult(cnl_text_file, None, 0,
+                                                           f'the output file {out_file} is a cnl text file')
+        results = self._compile_batch([cnl_text_file for cnl_text_file in cnl_text_files
+                                       if cnl_text_file not in refused], grammar, py_file, out_dir, jobs)
+        results = iter(results)
+        results = [refused[cnl_text_file] if cnl_text_file in refused else next(results)
+                   for cnl_text_file in cnl_text_files]
+        if self.stats is not None:
+            for result in results:
+                if result.stats:
+                    self.stats.merge(result.stats)
+        return results
+
+    def _compile_batch(self, cnl_text_files: list[str], grammar: str, py_file: str, out_dir: str | None,
+                       jobs: int) -> list[CompilationResult]:
+        out_files = [self._out_file(cnl_text_file, out_dir) for cnl_text_file in cnl_text_files]
+        if jobs <= 1 or self.profiler:
+            # the functions are profiled in this process
+            with self.stage('functions'):
+                module = pyModule(py_file)
+            with self.stage('lark'):
+                lark = CnlParser(grammar, self.parser, self.cache, self.fast_path)
+            self._report_parser(lark)
+            with self.stage('prelude'):
+                self.load_prelude(lark, py_file, module.instantiate)
+            return [self._compile_file(lark, module, cnl_text_file, out_file)
+                    for cnl_text_file, out_file in zip(cnl_text_files, out_files)]
+        return self._compile_batch_parallel(grammar, py_file, cnl_text_files, out_files, jobs)
+
+    def _compile_batch_parallel(self, grammar: str, py_file: str, cnl_text_files: list[str], out_files: list[str],
+                                jobs: int) -> list[CompilationResult]:
+        # built once here, reporting the conflicts of the grammar and filling the cache for the workers
+        with self.stage('lark'):
+            lark = CnlParser(grammar, self.parser, self.cache, self.fast_path)
+        self._report_parser(lark)
+        if self.prelude_file:
+            # compiled once, the workers receive its state
+            with self.stage('prelude'):
+                self.load_prelude(lark, py_file, pyModule(py_file).instantiate)
+        results = []
+        with ProcessPoolExecutor(max_workers=jobs, initializer=parallel.init_worker,
+                                 initargs=(grammar, py_file, self.parser, self.cache, self.seed,
+                                           self.inline, self.debug, self.sentence_cache,
+                                           self.prelude, self.prelude_text, self.fast_path, self.stats)) as executor:
+            futures = [executor.submit(parallel.compile_file, cnl_text_file, out_file)
+                       for cnl_text_file, out_file in zip(cnl_text_files, out_files)]
+            for cnl_text_file, future in zip(cnl_text_files, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # the worker process died
+                    self.logger.error(f'{cnl_text_file}: {e}')
+                    results.append(CompilationResult(cnl_text_file, None, 0, f'{type(e).__name__}: {e}'))
+        return results
+
+    def _out_file(self, cnl_text_file: str, out_dir: str | None) -> str:
+        return os.path.join(out_dir if out_dir else os.path.dirname(cnl_text_file),
+                            f'{os.path.splitext(os.path.basename(cnl_text_file))[0]}{self.OUT_EXTENSION}')
+
+    def _compile_file(self, lark: CnlParser, module: pyModule, cnl_text_file: str, out_file: str) -> CompilationResult:
+        start = time.perf_counter()
+        try:
+            stats = None if self.stats is None else CompilationStats(self.stats.memory)
+            with CompilationContext():
+                compiler = CnlWizardCompiler(self.parser, self.cache, self.seed, self.inline, self.debug,
+                                             self.sentence_cache, fast_path=self.fast_path, stats=stats,
+                                             profiler=self.profiler)
+                with compiler.stage('read'):
+                    with open(cnl_text_file, 'r') as cnl_text:
+                        cnl_text = cnl_text.read()
+                compiler.prelude, compiler.prelude_text = self.prelude, self.prelude_text
+                compiler.data_dir = os.path.dirname(cnl_text_file)
+                with compiler.stage('functions'):
+                    functions = module.instantiate()
+                res = compiler.compile_text(lark, functions, cnl_text)
+                if compiler.parse_error:
+                    self.logger.error(f'{cnl_text_file}: not compiled')
+                    return CompilationResult(cnl_text_file, None, time.perf_counter() - start,
+                                             compiler.parse_error.splitlines()[0])
+                res = compiler.render(res)
+                with open(out_file, 'w') as out:
+                    out.write(f'{res}\n')
+            return CompilationResult(cnl_text_file, out_file, time.perf_counter() - start,
+                                     stats=None if stats is None else stats.as_dict())
+        except Exception as e:
+            self.logger.error(f'{cnl_text_file}: {e}')
+            return CompilationResult(cnl_text_file, None, time.perf_counter() - start, f'{type(e).__name__}: {e}')
+
+    @classmethod
+    def reset(cls) -> CompilationContext:
+        """
+        Replace the running context with a new one, keeping a copy of the configuration set by the caller.
+        """
+        new_context = CompilationContext()
+        new_context.config = copy.deepcopy(context().config)
+        _context.set(new_context)
+        return new_context
+
 
 def create_var():
-    return f'X_{str(uuid.uuid4()).replace("-", "_")}'
+    return context().variables()
+
+
+def fact_entities(name: str, rows: Iterable[dict]) -> Iterator[Signature]:
+    """
+    Instances of the signature of the entity (e.g. node for nodes) with the fields of each row,
+    used by the facts functions of the libraries (see FactsDirective).
+    The name of the directive is the one of a declared signature or its regular plural (e.g. boxes, classes).
+    """
+    name = name.lower()
+    singulars = [name[:-len(suffix)] + singular for suffix, singular in [('s', ''), ('es', ''), ('ies', 'y')]
+                 if name.endswith(suffix)]
+    key = next((key for key in [name] + singulars if key in context().signatures), None)
+    if key is None:
+        raise ValueError(f'No signature named {name}')
+    for row in rows:
+        entity = context().signatures[key]
+        for field in row.keys() - entity.fields.keys():
+            raise ValueError(f'The signature {entity.name} has no field {field}')
+        entity.fields.update(row)
+        yield entity
+
+
+def impure(function: Callable) -> Callable:
+    """
+    Mark a function whose result depends on (or changes) a state other than the declarations,
+    e.g. the CP model or a global variable of the functions, thus its propositions are never cached.
+    """
+    function.impure = True
+    return function
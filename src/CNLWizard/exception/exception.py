@@ -3,3 +3,8 @@
 class SubstitutionError(Exception):
     def __init__(self, msg: str):
         super().__init__(msg)
+
+
+class NotStreamableError(Exception):
+    def __init__(self, msg: str):
+        super().__init__(msg)
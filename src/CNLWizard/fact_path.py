@@ -0,0 +1,164 @@
+from __future__ import annotations
+import re
+from typing import TYPE_CHECKING
+
+from lark import Lark, Tree, Token, UnexpectedInput
+
+if TYPE_CHECKING:
+    from CNLWizard.cnl_wizard_compiler import CnlParser
+
+
+class FactPath:
+    """
+    Fast path of the facts, i.e. the propositions matching the there_is_clause rule of the grammar
+    (e.g. There is a node with id equal to 1), parsed by a parser of that rule alone.
+    The values of the facts (numbers, strings and the words that are not in the strings of the grammar)
+    are placeholders: the facts with the same text and values matching the same terminals are copies
+    of the first parsed one, with the values replaced in the tokens.
+    The first fact of each text is checked against the full parser, and the texts parsed differently
+    (e.g. whenever the fact is ambiguous) are left to the full parser.
+    """
+    RULE = 'there_is_clause'
+    VALUES = re.compile(r'"(?:[^"\\]|\\.)*"|\d+(?:\.\d+)?|\w+')
+    MAX_TEMPLATES = 10000
+
+    def __init__(self, lark: CnlParser):
+        self.lark = lark
+        self.options = lark.options | {'start': FactPath.RULE}
+        # as the full parser, LALR is preferred and Earley is the fallback
+        self._lalr = Lark(lark.grammar, **self.options | {'parser': 'lalr', 'lexer': 'contextual'}) \
+            if lark.parser == lark.LALR else None
+        self._earley: Lark | None = None
+        self.prefixes = self._prefixes(self._lalr if self._lalr else self._get_earley())
+        # the words of the strings of the grammar, they are never placeholders
+        self.keywords = {word.lower() for terminal in lark.backend.terminals
+                         if terminal.pattern.type == 'str' for word in re.findall(r'\w+', terminal.pattern.value)}
+        # for each text with placeholders: the tree, the chain of rules from the root to the fact
+        # and the index of the value of each token (by position), None if the text is left to the full parser
+        self._templates: dict[tuple, tuple[Tree, list[str], dict[int, int]] | None] = {}
+        self._shapes: dict[str, frozenset] = {}
+
+    def _get_earley(self) -> Lark:
+        if self._earley is None:
+            self._earley = Lark(self.lark.grammar, **self.options)
+        return self._earley
+
+    @staticmethod
+    def _prefixes(parser: Lark) -> tuple[str, ...] | None:
+        # the strings starting the facts, None if a fact can start with a non-terminal or a regular expression
+        terminals = {terminal.name: terminal.pattern for terminal in parser.terminals}
+        res = []
+        for rule in parser.rules:
+            if rule.origin.name != FactPath.RULE:
+                continue
+            first = rule.expansion[0] if rule.expansion else None
+            pattern = terminals.get(first.name) if first is not None and first.is_term else None
+            if pattern is None or pattern.type != 'str' or pattern.flags:
+                return None
+            res.append(pattern.value)
+        return tuple(dict.fromkeys(res)) if res else None
+
+    def parse(self, sentence: str) -> Tree | None:
+        """
+        The tree of the sentence (from the root to the fact), None if it is not a fact.
+        """
+        text = sentence.removesuffix('.').rstrip()
+        if self.prefixes and not text.startswith(self.prefixes):
+            return None
+        spans = [match.span() for match in FactPath.VALUES.finditer(text)
+                 if match.group().lower() not in self.keywords]
+        key = (self._text(text, spans), self._shape(text, spans), sentence.endswith(' .'))
+        values = [text[start:end] for start, end in spans]
+        if key in self._templates:
+            template = self._templates[key]
+            if template is None:
+                return None
+            tree, chain, positions = template
+            tree = self._copy(tree, positions, values, [0])
+        else:
+            tree, chain, positions = self._parse(sentence, text, spans)
+            if len(self._templates) < FactPath.MAX_TEMPLATES:
+                # the facts whose values cannot be replaced are left to the full parser
+                self._templates[key] = (tree, chain, positions) if positions is not None else None
+            if tree is None:
+                return None
+        for data in reversed(chain):
+            tree = Tree(data, [tree])
+        return tree
+
+    @staticmethod
+    def _text(text: str, spans: list[tuple[int, int]]) -> str:
+        res = []
+        last = 0
+        for start, end in spans:
+            res.append(text[last:start])
+            last = end
+        res.append(text[last:])
+        return '\0'.join(res)
+
+    def _shape(self, text: str, spans: list[tuple[int, int]]) -> tuple:
+        shape = []
+        for start, end in spans:
+            value = text[start:end]
+            if value not in self._shapes:
+                self._shapes[value] = frozenset(name for name, terminal in self.lark.terminals.items()
+                                                if terminal.fullmatch(value))
+            shape.append(self._shapes[value])
+        return tuple(shape)
+
+    def _parse_fact(self, text: str) -> Tree:
+        if self._lalr:
+            try:
+                return self._lalr.parse(text)
+            except UnexpectedInput:
+                if self.lark.mode == self.lark.LALR:
+                    raise
+        return self._get_earley().parse(text)
+
+    def _parse(self, sentence: str, text: str, spans: list[tuple[int, int]]) -> tuple:
+        # the tree of the fact, the chain of rules and the values of the tokens (None if they cannot be replaced)
+        try:
+            tree = self._parse_fact(text)
+        except UnexpectedInput:
+            return None, None, None
+        chain = self._verify(sentence, tree)
+        if chain is None:
+            return None, None, None
+        positions = {}
+        for idx, token in enumerate(tree.scan_values(lambda value: isinstance(value, Token))):
+            start, end = token.start_pos, token.start_pos + len(token.value)
+            for value, (span_start, span_end) in enumerate(spans):
+                if (start, end) == (span_start, span_end) and token.type in self.lark.terminals:
+                    positions[idx] = value
+                elif start < span_end and span_start < end:
+                    # the token splits the value
+                    return tree, chain, None
+        return tree, chain, positions if len(positions) == len(spans) else None
+
+    def _verify(self, sentence: str, tree: Tree) -> list[str] | None:
+        # the chain of rules from the root of the full parse tree to the fact, None if the trees are different
+        try:
+            node = self.lark.parse(sentence)
+        except UnexpectedInput:
+            return None
+        chain = []
+        while True:
+            if len(node.children) != 1 or not isinstance(node.children[0], Tree):
+                return None
+            node = node.children[0]
+            if node.data == FactPath.RULE:
+                return chain if node == tree else None
+            chain.append(node.data)
+
+    def _copy(self, tree: Tree, positions: dict[int, int], values: list[str], counter: list[int]) -> Tree:
+        # the tokens are numbered in the order of scan_values
+        children = []
+        for child in tree.children:
+            if isinstance(child, Tree):
+                child = self._copy(child, positions, values, counter)
+            elif isinstance(child, Token):
+                if counter[0] in positions:
+                    child = Token.new_borrow_pos(child.type, values[positions[counter[0]]], child)
+                counter[0] += 1
+            children.append(child)
+        return Tree(tree.data, children, tree.meta)
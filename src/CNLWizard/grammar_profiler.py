@@ -0,0 +1,154 @@
+import statistics
+import time
+from collections import Counter
+
+from lark import Lark, Tree, UnexpectedInput
+from lark.grammar import Rule
+from lark.parsers.earley_forest import SymbolNode
+
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, CompilationContext
+from CNLWizard.process_cnl import process_propositions, split_propositions, preprocessing_grammar, \
+    PropositionTemplate, FactsDirective
+
+
+class ParsedProposition:
+    def __init__(self, file: str, line: int, text: str, time: float = 0.0):
+        self.file = file
+        self.line = line
+        self.text = text
+        self.time = time  # parse time
+        self.ambiguities: list[list[str]] = []  # the rules of the alternatives of each _ambig node of the explicit tree
+        self.error: str | None = None
+
+    def __str__(self):
+        return f'{self.file}:{self.line}: {self.text}'
+
+
+class GrammarProfiler:
+    """
+    Usage of the rules of a grammar by a corpus of CNL texts, parsed one proposition at a time by Earley:
+    the number of times each rule is matched, the rules never matched, the ambiguous propositions,
+    i.e. the ones whose parse tree with ambiguity='explicit' has _ambig nodes, and the propositions
+    whose parse time is an outlier.
+    The propositions are pre-processed as in the compilation, a single clone of each proposition
+    with where-clauses is parsed, and the facts directives are skipped.
+    The rules are counted on the parse forest, hence the inlined rules (e.g. ?rule and _rule) are counted as well,
+    and all the derivations of the ambiguous propositions are counted.
+    """
+    OUTLIER = 5.0  # parse time over OUTLIER times the median
+
+    def __init__(self, grammar: str):
+        self.grammar = grammar
+        self._forest = Lark(grammar, parser='earley', ambiguity='forest')
+        self._explicit: Lark | None = None
+        # the rules defined in the grammar (the unreachable ones are not compiled by lark)
+        self.rules = sorted({str(rule[0]) for rule in self._forest.grammar.rule_defs})
+        self.expansions: Counter[Rule] = Counter()  # matches of the expansions of the rules compiled by lark
+        self.propositions: list[ParsedProposition] = []
+
+    def profile_text(self, text: str, file: str = '<text>'):
+        with CompilationContext():
+            compiler = CnlWizardCompiler()
+            if preprocessing_grammar(compiler.config) is None:
+                sentences = [(1, text)]
+            else:
+                sentences = [(sentence.line, processed) for sentence in split_propositions([text])
+                             for processed in process_propositions(compiler, [sentence], compiler.config,
+                                                                   templates=True, facts=True)]
+        for line, processed in sentences:
+            if isinstance(processed, FactsDirective):
+                continue
+            if isinstance(processed, PropositionTemplate):
+                values = next(iter(processed.variables), None)
+                if values is None:
+                    continue
+                processed = processed.clone(values)
+            self.propositions.append(self._parse(ParsedProposition(file, line, processed)))
+
+    def profile_file(self, path: str):
+        with open(path, 'r') as text:
+            self.profile_text(text.read(), path)
+
+    def _parse(self, proposition: ParsedProposition) -> ParsedProposition:
+        start = time.perf_counter()
+        try:
+            forest = self._forest.parse(proposition.text)
+        except UnexpectedInput as e:
+            proposition.error = str(e).strip().splitlines()[0]
+            return proposition
+        proposition.time = time.perf_counter() - start
+        if self._count(forest):
+            if self._explicit is None:
+                self._explicit = Lark(self.grammar, parser='earley', ambiguity='explicit')
+            proposition.ambiguities = [[str(child.data) if isinstance(child, Tree) else repr(child)
+                                        for child in tree.children]
+                                       for tree in self._explicit.parse(proposition.text).find_data('_ambig')]
+        return proposition
+
+    def _count(self, forest: SymbolNode) -> bool:
+        """
+        Count the expansions of the complete nodes of the forest, True if the forest is ambiguous.
+        """
+        ambiguous = False
+        stack = [forest]
+        seen = set()
+        while stack:
+            node = stack.pop()
+            if not isinstance(node, SymbolNode) or id(node) in seen:
+                continue
+            seen.add(id(node))
+            children = node.children
+            ambiguous |= len(children) > 1
+            for packed in children:
+                if not node.is_intermediate:
+                    self.expansions[packed.rule] += 1
+                stack += packed.children
+        return ambiguous
+
+    def matches(self) -> Counter[str]:
+        res = Counter({rule: 0 for rule in self.rules})
+        for expansion, count in self.expansions.items():
+            if expansion.origin.name in res:
+                res[expansion.origin.name] += count
+        return res
+
+    def unused(self) -> list[str]:
+        return [rule for rule, count in self.matches().items() if not count]
+
+    def ambiguous(self) -> list[ParsedProposition]:
+        return [proposition for proposition in self.propositions if proposition.ambiguities]
+
+    def rejected(self) -> list[ParsedProposition]:
+        return [proposition for proposition in self.propositions if proposition.error]
+
+    def outliers(self, factor: float = OUTLIER) -> list[ParsedProposition]:
+        """
+        The propositions parsed in more than factor times the median parse time, the slowest first.
+        """
+        times = [proposition.time for proposition in self.propositions if not proposition.error]
+        if not times:
+            return []
+        threshold = factor * statistics.median(times)
+        return sorted((proposition for proposition in self.propositions
+                       if not proposition.error and proposition.time > threshold),
+                      key=lambda proposition: proposition.time, reverse=True)
+
+    def report(self, factor: float = OUTLIER) -> str:
+        parsed = [proposition for proposition in self.propositions if not proposition.error]
+        lines = [f'{len(self.propositions)} propositions, {len(parsed)} parsed in '
+                 f'{sum(proposition.time for proposition in parsed):.3f}s', '', 'rule matches:']
+        lines += [f'  {rule}: {count}' for rule, count in self.matches().most_common() if count]
+        lines += ['', f'unused rules: {", ".join(self.unused()) or "none"}', '',
+                  f'ambiguous propositions: {len(self.ambiguous())}']
+        for proposition in self.ambiguous():
+            lines.append(f'  {proposition}')
+            lines += [f'    _ambig: {" | ".join(alternatives)}' for alternatives in proposition.ambiguities]
+        median = statistics.median([proposition.time for proposition in parsed]) if parsed else 0
+        lines += ['', f'parse time outliers (over {factor:g} times the median, {median * 1000:.2f}ms): '
+                      f'{len(self.outliers(factor))}']
+        lines += [f'  {proposition.time * 1000:.2f}ms, {len(proposition.text)} characters, {proposition}'
+                  for proposition in self.outliers(factor)]
+        if self.rejected():
+            lines += ['', f'rejected propositions: {len(self.rejected())}']
+            lines += [f'  {proposition} ({proposition.error})' for proposition in self.rejected()]
+        return '\n'.join(lines)
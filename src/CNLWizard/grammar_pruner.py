@@ -0,0 +1,250 @@
+from lark import Lark, Token, Tree, UnexpectedInput
+from lark.load_grammar import _get_parser
+
+from CNLWizard.grammar_profiler import GrammarProfiler
+
+
+def _parse(text: str) -> Tree | None:
+    # the statements are parsed by the parser of the grammars of Lark itself
+    try:
+        statements = _get_parser().parse(text + '\n').children
+    except UnexpectedInput as e:
+        raise ValueError(f'Invalid statement {text!r}: {e}')
+    return statements[0] if statements else None
+
+
+def _symbols(tree: Tree) -> set[str]:
+    """
+    The names of the rules and terminals referenced by the expansions.
+    """
+    if tree.data in ('nonterminal', 'terminal'):
+        return {str(tree.children[0])}
+    children = tree.children[:1] if tree.data == 'alias' else tree.children
+    return set().union(*(_symbols(child) for child in children if isinstance(child, Tree)))
+
+
+def _prune(tree: Tree, removed: set[str], stubs: set[str]) -> Tree | None:
+    """
+    The expansions without the references to the removed rules, None if they cannot match without them.
+    The [...] groups are kept, since their placeholders (None when they do not match) are children
+    of the parse tree, and the removed rules they reference are added to stubs.
+    """
+    if tree.data == 'value':
+        return None if _symbols(tree) & removed else tree
+    if tree.data == 'expansions':
+        alternatives = [alternative for alternative in (_prune(child, removed, stubs) for child in tree.children)
+                        if alternative is not None]
+        return Tree('expansions', alternatives) if alternatives else None
+    if tree.data == 'alias':
+        expansion = _prune(tree.children[0], removed, stubs)
+        return None if expansion is None else Tree('alias', [expansion, tree.children[1]])
+    if tree.data == 'expansion':
+        items = [_prune(item, removed, stubs) for item in tree.children]
+        if any(item is None for item in items):
+            return None
+        # the empty expansions stand for the removed optional items
+        return Tree('expansion', [item for item in items if item.data != 'expansion'])
+    if tree.data == 'maybe':
+        stubs |= _symbols(tree) & removed
+        return tree
+    item = _prune(tree.children[0], removed, stubs)
+    if item is None:
+        # an optional item matches the empty string
+        return Tree('expansion', []) if tree.children[1] in ('?', '*') else None
+    return Tree('expr', [item] + tree.children[1:])
+
+
+def _print(tree: Tree) -> str:
+    if tree.data in ('nonterminal', 'terminal', 'literal'):
+        return str(tree.children[0])
+    if tree.data == 'value':
+        return _print(tree.children[0])
+    if tree.data == 'range':
+        return '..'.join(tree.children)
+    if tree.data == 'expansions':
+        return ' | '.join(map(_print, tree.children))
+    if tree.data == 'alias':
+        return f'{_print(tree.children[0])} -> {_print(tree.children[1])}'
+    if tree.data == 'expansion':
+        # the nested expansions are the (...) groups
+        return ' '.join(f'({_print(item)})' if item.data == 'expansions' else _print(item) for item in tree.children)
+    if tree.data == 'maybe':
+        return f'[{_print(tree.children[0])}]'
+    item, op, *repeat = tree.children
+    item = f'({_print(item)})' if item.data == 'expansions' else _print(item)
+    return f'{item}{op}' if op.type == 'OP' else f'{item} ~ {"..".join(repeat)}'
+
+
+class _Statement:
+    """
+    Statement of a grammar: a rule, a terminal, a directive (e.g. %import) or a comment.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.rule: str | None = None
+        self.terminal: str | None = None
+        self.tree = _parse(text)
+        if self.tree is None:
+            return
+        if self.tree.data in ('override', 'extend') or any(self.tree.find_data('template_usage')):
+            raise ValueError(f'Unsupported statement {text.splitlines()[0]!r}')
+        if self.tree.data == 'rule':
+            modifiers, name, params, priority, self.expansions = self.tree.children
+            if params.children:
+                raise ValueError(f'Unsupported statement {text.splitlines()[0]!r}')
+            self.flag, self.rule = ''.join(modifiers.children), str(name)
+            self.priority = f'.{priority.children[0]}' if priority.children else ''
+        elif self.tree.data == 'term':
+            self.terminal, self.expansions = str(self.tree.children[0]), self.tree.children[-1]
+
+    def alternatives(self) -> list[Tree]:
+        return self.expansions.children
+
+    def names(self) -> set[str]:
+        """
+        The names referenced by a directive, e.g. the imported or ignored terminals.
+        """
+        if self.tree.data == 'import':
+            path, *names = self.tree.children
+            if names and isinstance(names[0], Tree):
+                return set(map(str, names[0].children))
+            return {str(names[0] if names else path.children[-1])}
+        return set(map(str, self.tree.scan_values(lambda value: isinstance(value, Token))))
+
+    def is_directive(self, *names: str) -> bool:
+        return self.tree is not None and self.tree.data in names
+
+
+class GrammarPruner:
+    """
+    Specialization of a grammar to a corpus of CNL texts: the pruned grammar keeps only the rules and
+    the alternatives of the rules (i.e. the top-level expansions separated by |) used by the parse forests
+    of the propositions of the corpus, hence it accepts the same propositions of the corpus with the same
+    parse trees, while the smaller grammar is parsed faster by Earley.
+    The groups (...)? and (...)* referring to removed rules are removed, while the groups [...] are kept,
+    since they add placeholders to the parse trees, with the removed rules they refer to replaced by rules
+    that never match. The terminals and imports that are no longer referenced are removed.
+    The pruned grammar is verified on the corpus, a ValueError is raised whenever a proposition is parsed differently.
+    """
+    ALTERNATIVE = '{}__cnlwiz_alternative_{}'  # rule of an alternative in the grammar tracing the alternatives
+    NEVER = '/(?!)./'  # body of the removed rules referenced by [...] groups, it never matches
+
+    def __init__(self, grammar: str, start: str = 'start'):
+        self.grammar = grammar
+        self.start = start
+        self.statements = [_Statement(text) for text in self._split(grammar)]
+        self.profiler = GrammarProfiler(self._tracing_grammar())
+
+    @staticmethod
+    def _split(grammar: str) -> list[str]:
+        # the lines starting with a blank continue the statement
+        statements = []
+        for line in grammar.splitlines():
+            if line.strip() and line[0].isspace() and statements and not statements[-1].startswith('//'):
+                statements[-1] += '\n' + line
+            elif line.strip():
+                statements.append(line.rstrip())
+        return statements
+
+    def _tracing_grammar(self) -> str:
+        # each alternative is a rule, so that the parse forests tell the alternatives used
+        lines = []
+        for statement in self.statements:
+            if statement.rule is None:
+                lines.append(statement.text)
+                continue
+            names = [self.ALTERNATIVE.format(statement.rule, idx) for idx in range(len(statement.alternatives()))]
+            lines.append(f'{statement.flag}{statement.rule}{statement.priority}: {" | ".join(names)}')
+            lines += [f'{name}: {_print(alternative)}'
+                      for name, alternative in zip(names, statement.alternatives())]
+        return '\n'.join(lines) + '\n'
+
+    def profile_text(self, text: str, file: str = '<text>'):
+        self.profiler.profile_text(text, file)
+
+    def profile_file(self, path: str):
+        self.profiler.profile_file(path)
+
+    def used(self) -> dict[str, list[int]]:
+        """
+        The indexes of the alternatives of each rule used by the corpus.
+        """
+        matches = self.profiler.matches()
+        return {statement.rule: [idx for idx in range(len(statement.alternatives()))
+                                 if matches[self.ALTERNATIVE.format(statement.rule, idx)]]
+                for statement in self.statements if statement.rule is not None}
+
+    def prune(self) -> str:
+        used = self.used()
+        removed = {rule for rule, alternatives in used.items() if not alternatives and rule != self.start}
+        rules = {}
+        stubs = set()
+        for statement in self.statements:
+            if statement.rule is None or statement.rule in removed:
+                continue
+            alternatives = [_prune(statement.alternatives()[idx], removed, stubs)
+                            for idx in used[statement.rule]]
+            rules[statement.rule] = Tree('expansions', [alternative for alternative in alternatives
+                                                         if alternative is not None])
+        for rule in stubs:
+            rules[rule] = _parse(f'{rule}: {self.NEVER}').children[-1]
+        names = set().union(*map(_symbols, rules.values())) | {self.start}
+        names |= set().union(*(statement.names() for statement in self.statements
+                               if statement.is_directive('ignore', 'declare')))
+        terminals = {statement.terminal: statement for statement in self.statements if statement.terminal}
+        # the terminals used by the referenced terminals
+        pending = list(names)
+        while pending:
+            name = pending.pop()
+            if name in terminals:
+                new = _symbols(terminals[name].expansions) - names
+                names |= new
+                pending += new
+        lines = []
+        for statement in self.statements:
+            if statement.rule is not None:
+                if statement.rule in rules:
+                    lines.append(f'{statement.flag}{statement.rule}{statement.priority}: '
+                                 f'{_print(rules[statement.rule])}')
+            elif statement.terminal is not None:
+                if statement.terminal in names:
+                    lines.append(statement.text)
+            elif not statement.is_directive('import') or statement.names() & names:
+                lines.append(statement.text)
+        pruned = '\n'.join(lines) + '\n'
+        self.verify(pruned)
+        return pruned
+
+    def verify(self, pruned: str):
+        """
+        Check that the pruned grammar parses the propositions of the corpus accepted by the grammar
+        with the same trees.
+        """
+        grammar, pruned = Lark(self.grammar, parser='earley'), Lark(pruned, parser='earley')
+        for proposition in self.profiler.propositions:
+            if proposition.error:
+                continue
+            try:
+                same = _values(grammar.parse(proposition.text)) == _values(pruned.parse(proposition.text))
+            except UnexpectedInput:
+                same = False
+            if not same:
+                raise ValueError(f'The pruned grammar parses differently {proposition}')
+
+    def report(self, pruned: str) -> str:
+        rules = [statement for statement in self.statements if statement.rule is not None]
+        used = self.used()
+        lines = [f'{len(self.profiler.propositions)} propositions, {len(self.profiler.rejected())} rejected',
+                 f'rules: {len(rules)} -> {len([rule for rule, alternatives in used.items() if alternatives])}',
+                 f'alternatives: {sum(len(rule.alternatives()) for rule in rules)} -> '
+                 f'{sum(map(len, used.values()))}',
+                 f'size: {len(self.grammar)} -> {len(pruned)} characters']
+        lines += [f'  rejected {proposition} ({proposition.error})' for proposition in self.profiler.rejected()]
+        return '\n'.join(lines)
+
+
+def _values(tree: Tree) -> tuple:
+    # the names of the anonymous terminals depend on the rules of the grammar, the values of the tokens do not
+    return str(tree.data), [_values(child) if isinstance(child, Tree) else None if child is None else str(child)
+                            for child in tree.children]
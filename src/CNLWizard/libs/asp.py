@@ -1,4 +1,9 @@
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, Signature, create_var
+import operator
+import re
+
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, Signature, create_var, context, fact_entities
+from CNLWizard.exception.exception import SubstitutionError
+from CNLWizard.substitution import COMPARISONS
 
 
 class Atom:
@@ -11,14 +16,14 @@ class Atom:
         self.negation = 'not ' if not self.negation else ''
 
     def __str__(self):
-        values = []
-        for value in self.fields.values():
-            if value != '_' and not value.isnumeric() and value not in CnlWizardCompiler.constants and not value[0].isupper()\
-                    and not value[0] == '"' and '..' not in value and ',' not in value:
-                values.append(f'"{value}"')
-            else:
-                values.append(value)
-        return f'{self.negation}{self.name}({",".join(values)})'
+        return f'{self.negation}{self.name}({",".join(map(term, self.fields.values()))})'
+
+
+def term(value: str) -> str:
+    if value != '_' and not value.isnumeric() and value not in context().constants and not value[0].isupper() \
+            and not value[0] == '"' and '..' not in value and ',' not in value:
+        return f'"{value}"'
+    return value
 
 
 class Fact:
@@ -113,8 +118,71 @@ class WeakConstraint:
         return f':~ {", ".join(map(str, self.body))}. [{self.weight}@{", ".join(map(str, self.discriminant))}]'
 
 
+class Rule:
+    def __init__(self, head, body):
+        self.head: Atom = head
+        self.body: list = body
+
+    def __str__(self):
+        return f'{self.head} :- {", ".join(map(str, self.body))}.'
+
+
+# the ASP operator of each comparison of the where-clauses (see substitution.COMPARISONS)
+OPERATORS = {operator.eq: '=', operator.ne: '!=', operator.lt: '<', operator.gt: '>', operator.le: '<=', operator.ge: '>='}
+
+
+def domains(substitution) -> list:
+    """
+    The literals stating the domains of the variables of the where-clauses, e.g. X=1..3, X=(a;b) and X!=Y.
+    """
+    res = []
+    for step in substitution.steps:
+        if step[0] == 'product':
+            values = step[2]
+            if isinstance(values, range) and values.step == 1 and values:
+                res.append(Comparison('=', [step[1], f'{values.start}..{values.stop - 1}']))
+            else:
+                values = [str(value) if isinstance(value, int) else term(value) for value in values]
+                res.append(Comparison('=', [step[1], f'({";".join(values)})' if len(values) != 1 else values[0]]))
+        elif step[0] == 'between':
+            res.append(Comparison('=', [step[1], f'{step[2]}..{step[3]}']))
+        elif step[0] == 'distinct':
+            variables = step[1]
+            res += [Comparison('!=', [first, second])
+                    for idx, first in enumerate(variables) for second in variables[idx + 1:]]
+        elif step[0] == 'compare':
+            res.append(Comparison(OPERATORS[COMPARISONS[step[2]]], [step[1], str(step[3])]))
+    return res
+
+
+def symbolic_substitution(substitution, proposition=None):
+    """
+    A single rule for the propositions with where-clauses, i.e. the rule of the proposition
+    with the domains of the variables in the body.
+    Used by the functions files defining symbolic_substitution, e.g.:
+        def symbolic_substitution(substitution, proposition=None):
+            return asp.symbolic_substitution(substitution, proposition)
+    """
+    if proposition is None:
+        return None
+    body = domains(substitution)
+    if hasattr(proposition, 'body'):
+        proposition.body = proposition.body + body
+        return proposition
+    if hasattr(proposition, 'head'):
+        return Rule(proposition.head, body)
+    if isinstance(proposition, str) and re.sub(r'\.\.|\d\.\d', '', proposition).count('.') == 1 \
+            and proposition.rstrip().endswith('.'):
+        proposition = proposition.rstrip()[:-1]
+        if ':-' in proposition:
+            return f'{proposition}, {", ".join(map(str, body))}.'
+        return f'{proposition} :- {", ".join(map(str, body))}.'
+    raise SubstitutionError(f'The where-clauses cannot be added to the translation "{proposition}", '
+                            f'remove symbolic_substitution from the python functions to expand them')
+
+
 def entity(string, attribute):
-    entity = Atom(CnlWizardCompiler.signatures[string.lower().removesuffix('s')])
+    entity = Atom(context().signatures[string.lower().removesuffix('s')])
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
@@ -129,11 +197,22 @@ def there_is_clause(entity):
     return Fact(entity)
 
 
+def facts(name, rows):
+    """
+    A fact for each row of the file of a facts directive, e.g. There are nodes from "nodes.csv".
+    Used by the functions files defining facts, e.g.:
+        def facts(name, rows):
+            return asp.facts(name, rows)
+    """
+    for entity in fact_entities(name, rows):
+        yield Fact(Atom(entity))
+
+
 def verb(string_1, attribute, string_2):
     name = string_1.lower() + "_" + string_2
     entity = Signature(name, {})
-    if name in CnlWizardCompiler.signatures:
-        entity = Atom(CnlWizardCompiler.signatures[name])
+    if name in context().signatures:
+        entity = Atom(context().signatures[name])
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
@@ -183,11 +262,11 @@ def negated_simple_proposition(entity_1, entity_2, entity_3):
     return entity_1, entity_2, entity_3
 
 def constant_definition(name, value):
-    CnlWizardCompiler.constants[name] = value
+    context().constants[name] = value
 
 def compounded_range_clause(name, start, end):
-    CnlWizardCompiler.signatures[name] = name, ['id'], ['id'], None
-    entity = Atom(CnlWizardCompiler.signatures[name.lower()])
+    context().signatures[name] = name, ['id'], ['id'], None
+    entity = Atom(context().signatures[name.lower()])
     entity.fields['id'] = f'{start}..{end}'
     return Fact(entity)
 
@@ -216,12 +295,12 @@ def quantified_choice(subj, verb, cardinality, obj):
         for field, value in second.fields.items():
             if field in first.fields:
                 first.fields[field] = value
-    if verb.name not in CnlWizardCompiler.signatures:
+    if verb.name not in context().signatures:
         fields = list(verb.fields.keys())
-        fields += CnlWizardCompiler.signatures[subj.name].keys
-        fields += CnlWizardCompiler.signatures[obj.name].keys
-        CnlWizardCompiler.signatures[verb.name] = verb.name, fields, fields, None
-    res = CnlWizardCompiler.signatures[verb.name]
+        fields += context().signatures[subj.name].keys
+        fields += context().signatures[obj.name].keys
+        context().signatures[verb.name] = verb.name, fields, fields, None
+    res = context().signatures[verb.name]
     set_fields(res, verb)
     set_fields(res, subj)
     set_fields(res, obj)
@@ -234,12 +313,12 @@ def quantified_assignment(subj, verb, obj):
             if field in first.fields:
                 first.fields[field] = value
 
-    if verb.name not in CnlWizardCompiler.signatures:
+    if verb.name not in context().signatures:
         fields = list(verb.fields.keys())
-        fields += CnlWizardCompiler.signatures[subj.name].keys
-        fields += CnlWizardCompiler.signatures[obj.name].keys
-        CnlWizardCompiler.signatures[verb.name] = verb.name, fields, fields, None
-    res = CnlWizardCompiler.signatures[verb.name]
+        fields += context().signatures[subj.name].keys
+        fields += context().signatures[obj.name].keys
+        context().signatures[verb.name] = verb.name, fields, fields, None
+    res = context().signatures[verb.name]
     set_fields(res, verb)
     set_fields(res, subj)
     set_fields(res, obj)
@@ -272,8 +351,8 @@ def simple_aggregate(aggregate_operator, discriminant, discriminant_var, verb, l
                 first.fields[field] = value
     if not discriminant_var:
         discriminant_var = create_var()
-    if discriminant in CnlWizardCompiler.signatures:
-        discriminant = CnlWizardCompiler.signatures[discriminant].keys[0]
+    if discriminant in context().signatures:
+        discriminant = context().signatures[discriminant].keys[0]
     verb.fields[discriminant] = discriminant_var
     for entity in list_of_entities:
         set_fields(verb, entity)
@@ -289,10 +368,10 @@ def passive_aggregate(aggregate_operator, discriminant, discriminant_var, discri
     if not discriminant_var:
         discriminant_var = create_var()
     discriminant_set_var = create_var()
-    if discriminant in CnlWizardCompiler.signatures:
-        discriminant = CnlWizardCompiler.signatures[discriminant].keys[0]
-    if discriminant_set in CnlWizardCompiler.signatures:
-        discriminant_set = CnlWizardCompiler.signatures[discriminant_set].keys[0]
+    if discriminant in context().signatures:
+        discriminant = context().signatures[discriminant].keys[0]
+    if discriminant_set in context().signatures:
+        discriminant_set = context().signatures[discriminant_set].keys[0]
     if obj and discriminant in obj.fields:
         obj.fields[discriminant] = discriminant_var
     if discriminant in verb.fields:
@@ -328,12 +407,12 @@ def whenever_then_clause_choice(whenever_clauses, entity, cardinality_1, verb, c
                 first.fields[field] = value
     body = whenever_clauses
     cardinality = cardinality_1 if cardinality_1 else cardinality_2
-    if verb.name not in CnlWizardCompiler.signatures:
+    if verb.name not in context().signatures:
         fields = list(verb.fields.keys())
         if entity:
-            fields += CnlWizardCompiler.signatures[entity.name].keys
-        CnlWizardCompiler.signatures[verb.name] = verb.name, fields, fields, None
-    res = CnlWizardCompiler.signatures[verb.name]
+            fields += context().signatures[entity.name].keys
+        context().signatures[verb.name] = verb.name, fields, fields, None
+    res = context().signatures[verb.name]
     set_fields(res, verb)
     if entity:
         set_fields(res, entity)
@@ -350,12 +429,12 @@ def whenever_then_clause_assignment(whenever_clauses, entity, verb):
     body = whenever_clauses
     if list_of_entities:
         body += list_of_entities
-    if verb.name not in CnlWizardCompiler.signatures:
+    if verb.name not in context().signatures:
         fields = list(verb.fields.keys())
         if entity:
-            fields += CnlWizardCompiler.signatures[entity.name].keys
-        CnlWizardCompiler.signatures[verb.name] = verb.name, fields, fields, None
-    res = CnlWizardCompiler.signatures[verb.name]
+            fields += context().signatures[entity.name].keys
+        context().signatures[verb.name] = verb.name, fields, fields, None
+    res = context().signatures[verb.name]
     set_fields(res, verb)
     if entity:
         set_fields(res, entity)
@@ -1,4 +1,4 @@
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, ContextObject, context, impure, fact_entities
 from ortools.sat.python import cp_model
 from collections import defaultdict
 
@@ -8,7 +8,7 @@ def simple_proposition(entity_1, entity_2, entity_3):
 
 
 def entity(string, attribute):
-    entity = CnlWizardCompiler.signatures[string.lower().removesuffix('s')]
+    entity = context().signatures[string.lower().removesuffix('s')]
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
@@ -19,6 +19,7 @@ def attribute(name, attribute_value):
     return [(name, attribute_value)]
 
 
+@impure
 def there_is_clause(entity):
     for key, value in entity.fields.items():
         domain[f'{entity.name}_{key}'].append(value)
@@ -48,6 +49,7 @@ def math_operator(*args):
     return items_dict[item]
 
 
+@impure
 def comparison(*args):
     for constraint in args[0][1]:
         operation = f'model.add({constraint} {args[1]} {args[2]})'
@@ -62,13 +64,27 @@ def comparison_operator(*args):
     return items_dict[item]
 
 
+@impure
+def facts(name, rows):
+    """
+    The domains and the variables of the rows of the file of a facts directive, e.g. There are nodes from "nodes.csv".
+    Used by the functions files defining facts (marked as impure), e.g.:
+        @impure
+        def facts(name, rows):
+            return cp.facts(name, rows)
+    """
+    for entity in fact_entities(name, rows):
+        yield there_is_clause(entity)
+
+
 def verb(string_1, attribute, string_2):
-    entity = CnlWizardCompiler.signatures[string_1]
+    entity = context().signatures[string_1]
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
     return entity
 
-model = cp_model.CpModel()
-vars = {}
-domain = defaultdict(list)
+# each compilation has its own model, variables and domains
+model = ContextObject('cp.model', cp_model.CpModel)
+vars = ContextObject('cp.vars', dict)
+domain = ContextObject('cp.domain', lambda: defaultdict(list))
@@ -1,6 +1,6 @@
 from collections import defaultdict
 
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, ContextObject, context, impure, fact_entities
 
 
 def simple_proposition(entity_1, entity_2, entity_3):
@@ -12,7 +12,7 @@ def negated_simple_proposition(entity_1, verb, entity_2):
 
 
 def entity(string, attribute):
-    entity = CnlWizardCompiler.signatures[string.lower().removesuffix('s')]
+    entity = context().signatures[string.lower().removesuffix('s')]
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
@@ -23,13 +23,28 @@ def attribute(name, attribute_value):
     return [(name, attribute_value)]
 
 
+@impure
 def there_is_clause(entity):
     for key, value in entity.fields.items():
         domain[f'{entity.name}_{key}'].append(value)
 
 
+@impure
+def facts(name, rows):
+    """
+    The domains of the rows of the file of a facts directive, e.g. There are nodes from "nodes.csv".
+    Used by the functions files defining facts (marked as impure), e.g.:
+        @impure
+        def facts(name, rows):
+            return smt.facts(name, rows)
+    """
+    for entity in fact_entities(name, rows):
+        there_is_clause(entity)
+    return []
+
+
 def verb(string_1, attribute, string_2):
-    entity = CnlWizardCompiler.signatures[string_1]
+    entity = context().signatures[string_1]
     if attribute:
         for name, value in attribute:
             entity.fields[name] = value
@@ -61,5 +76,6 @@ def math(*args):
     return args[1]
 
 
-domain = defaultdict(list)
-vars = set()
\ No newline at end of file
+# each compilation has its own variables and domains
+domain = ContextObject('smt.domain', lambda: defaultdict(list))
+vars = ContextObject('smt.vars', set)
\ No newline at end of file
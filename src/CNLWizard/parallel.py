@@ -0,0 +1,100 @@
+from __future__ import annotations
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING
+
+from CNLWizard.parser_cache import ParserCache
+from CNLWizard.prelude import Prelude
+from CNLWizard.process_cnl import PropositionTemplate, SymbolicProposition
+from CNLWizard.reader import pyModule
+from CNLWizard.sentence_cache import SentenceCache
+from CNLWizard.stats import CompilationStats
+
+if TYPE_CHECKING:
+    from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, CnlParser, CompilationContext, CompilationResult
+
+"""
+Compilation in worker processes: the files of a batch, or the chunks of the propositions of a text.
+Each worker builds its compiler, parser and functions once, in init_worker.
+"""
+
+_worker: tuple[CnlWizardCompiler, CnlParser, pyModule] | None = None  # state of the worker processes
+
+
+def init_worker(grammar: str, py_file: str, parser: str, cache: ParserCache | None, seed: int,
+                inline: bool, debug: bool, sentence_cache: SentenceCache | None,
+                prelude: Prelude | None = None, prelude_text: str | None = None, fast_path: bool = True,
+                stats: CompilationStats | None = None):
+    from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, CnlParser
+    global _worker
+    compiler = CnlWizardCompiler(parser, cache, seed, inline, debug, sentence_cache, fast_path=fast_path,
+                                 stats=stats)
+    compiler.prelude, compiler.prelude_text = prelude, prelude_text
+    # the conflicts of the grammar are reported by the parent process
+    _worker = (compiler, CnlParser(grammar, parser, cache, fast_path, quiet=True), pyModule(py_file))
+
+
+def compile_file(cnl_text_file: str, out_file: str) -> CompilationResult:
+    compiler, lark, module = _worker
+    return compiler._compile_file(lark, module, cnl_text_file, out_file)
+
+
+def translate_chunk(snapshot: CompilationContext, seed: int, propositions: list) -> tuple[list, int] | None:
+    """
+    The translations of the propositions in the snapshot context and the number of fresh variables allocated,
+    None if the translation changes the context (see CnlWizardCompiler.compile_parallel).
+    """
+    from CNLWizard.cnl_wizard_compiler import CNLTransformer
+    _, lark, module = _worker
+    with snapshot:
+        snapshot.variables.reset(seed)
+        snapshot.variables.allocated = 0
+        transformer = CNLTransformer(module.instantiate(), graph=False)
+        declarations = snapshot.declarations()
+        translations = transformer.transform_children(lark.parse_propositions(propositions))
+        if transformer.impure_calls or snapshot.objects or snapshot.declarations() != declarations:
+            return None
+        return translations, snapshot.variables.allocated
+
+
+def translate_chunks(executor: Executor, snapshot: CompilationContext, chunks: list[list]) -> list | None:
+    """
+    The translations of the chunks, None if they cannot be translated independently.
+    The fresh variables are allocated in the running context.
+    """
+    from CNLWizard.cnl_wizard_compiler import context
+    seeds = [snapshot.variables.counter] * len(chunks)
+    results = list(executor.map(translate_chunk, [snapshot] * len(chunks), seeds, chunks))
+    if None in results:
+        return None
+    # the counter of the fresh variables at the start of each chunk, moved by the variables of the previous ones
+    variables = context().variables
+    rerun = []
+    for idx, (_, allocated) in enumerate(results):
+        if allocated and variables.counter != seeds[idx]:
+            rerun.append(idx)
+            seeds[idx] = variables.counter
+        for _ in range(allocated):
+            variables()
+    for idx, result in zip(rerun, executor.map(translate_chunk, [snapshot] * len(rerun),
+                                               [seeds[idx] for idx in rerun], [chunks[idx] for idx in rerun])):
+        if result is None:
+            return None
+        results[idx] = result
+    return [translation for translations, _ in results for translation in translations]
+
+
+def split_chunks(propositions: list, count: int) -> list[list]:
+    """
+    The propositions split in (at most) count chunks of consecutive propositions with about the same number of clones.
+    """
+    weights = [1 if isinstance(proposition, SymbolicProposition) or not isinstance(proposition, PropositionTemplate)
+               else max(1, proposition.variables.size()) for proposition in propositions]
+    size = sum(weights) / count
+    chunks = [[]]
+    total = 0
+    for proposition, weight in zip(propositions, weights):
+        if chunks[-1] and total >= size * len(chunks):
+            chunks.append([])
+        chunks[-1].append(proposition)
+        total += weight
+    return chunks
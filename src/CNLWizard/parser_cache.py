@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import lark
+from lark import Lark
+
+
+class ParserCache:
+    """
+    On-disk cache of the built Lark parsers.
+    Entries are keyed by the hash of the grammar text and the parser options,
+    the least recently used entries are evicted whenever the cache exceeds max_size bytes.
+    The bound includes the other entries stored in the same folder, i.e. the compiled preludes
+    and the database of the sentence cache.
+    Note that Lark can only serialize LALR parsers, for grammars that are not LALR compatible
+    the cache stores the conflicts, so that the LALR construction is not attempted again
+    (the parsers with shift/reduce conflicts are stored as well, for the forced LALR mode).
+    """
+    DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'cnl_wizard')
+    DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+    PARSER_EXT = '.lark'
+    CONFLICTS_EXT = '.conflicts'
+    PRELUDE_EXT = '.prelude'  # see Prelude
+    SENTENCES_EXT = '.sqlite'  # see SentenceCache
+    SQLITE_FILES = ('-wal', '-shm')  # files of an sqlite database next to it
+    FORMAT = 2  # version of the entries, the conflicts include the shift/reduce ones since version 2
+
+    def __init__(self, cache_dir: str = None, max_size: int = DEFAULT_MAX_SIZE):
+        if cache_dir is None:
+            cache_dir = ParserCache.DEFAULT_DIR
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, grammar: str, options: dict) -> str:
+        content = json.dumps([ParserCache.FORMAT, lark.__version__, grammar, sorted(options.items())])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _path(self, grammar: str, options: dict, ext: str) -> str:
+        return os.path.join(self.cache_dir, self.key(grammar, options) + ext)
+
+    def _hit(self, path: str):
+        # update the modification time, that is used as LRU order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path: str, mode: str, write):
+        # write to a temporary file and rename it, so that concurrent readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as out:
+                write(out)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        self.evict()
+
+    def load(self, grammar: str, options: dict) -> Lark | None:
+        path = self._path(grammar, options, ParserCache.PARSER_EXT)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as entry:
+                parser = Lark.load(entry)
+        except Exception:
+            # corrupted or incompatible entry
+            self.remove(path)
+            return None
+        self._hit(path)
+        return parser
+
+    def save(self, grammar: str, options: dict, parser: Lark):
+        self._write(self._path(grammar, options, ParserCache.PARSER_EXT), 'wb', parser.save)
+
+    def load_conflicts(self, grammar: str, options: dict) -> list[str] | None:
+        path = self._path(grammar, options, ParserCache.CONFLICTS_EXT)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as entry:
+                conflicts = json.load(entry)
+        except (OSError, ValueError):
+            self.remove(path)
+            return None
+        self._hit(path)
+        return conflicts
+
+    def save_conflicts(self, grammar: str, options: dict, conflicts: list[str]):
+        self._write(self._path(grammar, options, ParserCache.CONFLICTS_EXT), 'w',
+                    lambda out: json.dump(conflicts, out))
+
+    def remove(self, path: str):
+        paths = [path]
+        if path.endswith(ParserCache.SENTENCES_EXT):
+            paths += [path + suffix for suffix in ParserCache.SQLITE_FILES]
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def entries(self) -> list[os.DirEntry]:
+        return [entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and entry.name.endswith((ParserCache.PARSER_EXT, ParserCache.CONFLICTS_EXT,
+                                                            ParserCache.PRELUDE_EXT, ParserCache.SENTENCES_EXT))]
+
+    def _size(self, entry: os.DirEntry) -> int:
+        size = entry.stat().st_size
+        if entry.name.endswith(ParserCache.SENTENCES_EXT):
+            for suffix in ParserCache.SQLITE_FILES:
+                try:
+                    size += os.path.getsize(entry.path + suffix)
+                except OSError:
+                    pass
+        return size
+
+    def size(self) -> int:
+        return sum(map(self._size, self.entries()))
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime)
+        sizes = [self._size(entry) for entry in entries]
+        size = sum(sizes)
+        for entry, entry_size in zip(entries, sizes):
+            if size <= self.max_size:
+                break
+            size -= entry_size
+            self.remove(entry.path)
+
+    def clear(self):
+        for entry in self.entries():
+            self.remove(entry.path)
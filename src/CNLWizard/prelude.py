@@ -0,0 +1,64 @@
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import TYPE_CHECKING
+
+from CNLWizard.parser_cache import ParserCache
+
+if TYPE_CHECKING:
+    from CNLWizard.cnl_wizard_compiler import CompilationContext
+
+
+class Prelude:
+    """
+    CNL text shared by several texts, e.g. the declarations and the encoding of a problem followed
+    by the facts of each instance, compiled once: the state of the context after its compilation
+    (signatures, constants, lists and fresh variables) and the translations of its propositions.
+    The texts compiled with the prelude start from its state, and their translations follow the ones of the prelude.
+    """
+    EXT = ParserCache.PRELUDE_EXT
+
+    def __init__(self, context: CompilationContext, translations: list):
+        self.context = context
+        self.translations = translations
+
+    @staticmethod
+    def key(grammar: str, py_file: str, text: str, seed: int) -> str:
+        """
+        Digest of the grammar, of the functions file and of the prelude text.
+        """
+        with open(py_file, 'r') as functions:
+            functions = functions.read()
+        return hashlib.sha256('\0'.join([grammar, functions, text, str(seed)]).encode()).hexdigest()
+
+    @staticmethod
+    def load(path: str) -> Prelude | None:
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as entry:
+                return pickle.load(entry)
+        except Exception:
+            # corrupted entry, or the classes of the translations changed
+            return None
+
+    def save(self, path: str) -> bool:
+        """
+        Save the prelude, False if its state cannot be pickled.
+        """
+        try:
+            data = pickle.dumps(self)
+        except Exception:
+            return False
+        # write to a temporary file and rename it, so that concurrent readers never see partial entries
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return True
@@ -1,11 +1,17 @@
 from __future__ import annotations
+import csv
+import os
+import re
+from functools import lru_cache
 from textwrap import dedent
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterable, Iterator
 
 import lark
-from lark import Lark, UnexpectedEOF, Transformer, v_args
+from lark import UnexpectedInput, Transformer, v_args
+from lark.exceptions import VisitError
 
 from CNLWizard.exception.exception import SubstitutionError
+from CNLWizard.substitution import Substitution, Bound
 
 if TYPE_CHECKING:
     from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
@@ -18,11 +24,12 @@ The variables are substituted into the proposition generating clones, one for ea
 
 
 class ProcessCNLTransformer(Transformer):
-    def __init__(self, cnl: CnlWizardCompiler):
+    def __init__(self, cnl: CnlWizardCompiler, line: int = 1):
         super().__init__()
         self.cnl = cnl
-        self.variable_substitution: list[dict] = []  # a list of dict with variable-value as a key-pair
-                                                     # each dict of the list is a new proposition clone
+        self.line = line  # line of the proposition in the text
+        self.variable_substitution = Substitution()
+        self.unresolved = False  # the where-clauses depend on variables that are not substituted
 
     def start(self, args):
         return ''.join(args[-1])
@@ -78,48 +85,62 @@ class ProcessCNLTransformer(Transformer):
 
     @v_args(meta=True)
     def where_token_between(self, meta, args):
-        values = list(range(int(args[2]), int(args[3]) + 1))
-        self.where_token_one_of(meta, [args[0], args[1]] + values)
+        variable, respectively, low, high = args
+        if not (low.variables() | high.variables()) <= self.variable_substitution.variables():
+            self.unresolved = True
+        elif not low.variables() and not high.variables():
+            self._substitute(meta, variable, respectively, range(low.offset, high.offset + 1))
+        elif respectively:
+            self.unresolved = True
+        else:
+            self.variable_substitution.between(variable, low, high)
         return lark.Discard
 
     @v_args(meta=True)
     def where_token_one_of(self, meta, args):
         values = args[2:]
         if len(values) == 1 and values[0] in self.cnl.lists:
-            values = self.cnl.lists[values[0]].values()
-        if not self.variable_substitution:
-            for value in values:
-                self.variable_substitution.append({args[0]: value})
-        else:
-            if not args[1]:  # args[1] == "respectively"
-                new_array = []
-                for variable in self.variable_substitution:
-                    for value in values:
-                        curr = variable.copy()
-                        curr[args[0]] = value
-                        new_array.append(curr)
-                self.variable_substitution = new_array
-            else:
-                if len(values) != len(self.variable_substitution):
-                    raise SubstitutionError(
-                        f"Lists do not match for variable substitution in proposition {meta.line + 1}")
-                for i in range(len(values)):
-                    self.variable_substitution[i][args[0]] = values[i]
+            values = list(self.cnl.lists[values[0]].values())
+        self._substitute(meta, args[0], args[1], values)
         return lark.Discard
 
+    def _substitute(self, meta, variable: str, respectively: bool, values: list | range):
+        if respectively:
+            self.variable_substitution.respectively(variable, values, self.line + meta.line - 1)
+        else:
+            self.variable_substitution.product(variable, values)
+
     def where_distinct(self, args):
-        to_remove = []
-        for variable in self.variable_substitution:
-            values = set()
-            for distinct_var in args:
-                if variable[distinct_var] in values:
-                    to_remove.append(variable)
-                    break
-                values.add(variable[distinct_var])
-        for remove in to_remove:
-            self.variable_substitution.remove(remove)
+        self.variable_substitution.distinct(args)
         return lark.Discard
 
+    @v_args(inline=True)
+    def where_comparison(self, variable, comparison, bound):
+        if not ({variable} | bound.variables()) <= self.variable_substitution.variables():
+            self.unresolved = True
+        else:
+            self.variable_substitution.compare(variable, comparison, bound)
+        return lark.Discard
+
+    def comparison_operator(self, args):
+        return ' '.join(token.value for token in args)
+
+    @v_args(inline=True)
+    def bound_number(self, number):
+        return Bound(offset=number)
+
+    @v_args(inline=True)
+    def bound_variable(self, variable):
+        return Bound(variable)
+
+    @v_args(inline=True)
+    def bound_sum(self, variable, number):
+        return Bound(variable, number)
+
+    @v_args(inline=True)
+    def bound_difference(self, variable, number):
+        return Bound(variable, -number)
+
     def respectively(self, args):
         return True
 
@@ -147,7 +168,240 @@ def substitute_variable(proposition, variables):
     return '\n'.join(res)
 
 
-def process_cnl_specification(cnl: CnlWizardCompiler, cnl_specification: str, config: dict):
+class Variable(str):
+    """
+    Variable of a proposition template.
+    """
+
+
+class PropositionTemplate:
+    """
+    Proposition with variable substitutions, i.e. the template of its clones.
+    The text is split into literal parts and the variables to substitute,
+    so that the clones can be instantiated without searching the variables again.
+    """
+
+    def __init__(self, proposition: str, variables: Iterable[dict]):
+        self.proposition = proposition
+        self.variables = variables
+        self.keys = list(next(iter(variables), {}))
+        self.segments: list[str | Variable] = [proposition]
+        for key in self.keys:
+            segments = []
+            for segment in self.segments:
+                if isinstance(segment, Variable):
+                    segments.append(segment)
+                    continue
+                for idx, part in enumerate(segment.split(key)):
+                    if idx:
+                        segments.append(Variable(key))
+                    segments.append(part)
+            self.segments = [segment for segment in segments if segment != '']
+
+    def clone(self, values: dict) -> str:
+        """
+        Text of a clone, the same of substitute_variable.
+        """
+        return substitute_variable(self.proposition, [values])
+
+    def render(self, values: dict) -> str:
+        """
+        Text of a clone built from the segments (see instantiable).
+        """
+        curr = ''.join(str(values[segment]) if isinstance(segment, Variable) else segment
+                       for segment in self.segments)
+        if curr[-1].isnumeric():
+            curr += ' '
+        return f'{curr}.'
+
+    def instantiable(self, values: dict) -> bool:
+        """
+        Whether the clone is the template with the variables replaced by its values.
+        Since the variables are substituted one after the other, a value containing a variable is substituted again.
+        """
+        return list(values) == self.keys and self.render(values) == self.clone(values)
+
+    def __iter__(self) -> Iterator[dict]:
+        return iter(self.variables)
+
+    def __str__(self):
+        return substitute_variable(self.proposition, self.variables)
+
+
+class SymbolicProposition(PropositionTemplate):
+    """
+    Proposition whose variables are left in the text, the target language receives the substitution
+    and states the domains of the variables (e.g. as intervals and pools in ASP) instead of the clones.
+    As a template, it is expanded whenever the text with the variables cannot be compiled.
+    """
+
+    @property
+    def text(self) -> str:
+        if self.proposition[-1].isnumeric():
+            return f'{self.proposition} .'
+        return f'{self.proposition}.'
+
+
+class FactsDirective:
+    """
+    Directive loading the facts of an entity from a CSV (or TSV) file, e.g. There are nodes from "nodes.csv".
+    The header of the file names the fields of the signature, and each row is a fact.
+    The directive is not parsed by the grammar: the rows are read one at a time and compiled
+    by the facts function of the python functions file.
+    The keywords of the directive are the ones of the configuration (facts_directive), KEYWORDS has
+    the ones of the supported languages.
+    """
+    RULE = 'facts_directive'  # rule of the directive in the parse tree
+    KEYWORDS = {'en': ('There are', 'from'), 'it': ('Ci sono', 'da')}
+
+    @staticmethod
+    @lru_cache
+    def pattern(keywords: tuple[str, str]) -> re.Pattern:
+        """
+        Regular expression of the directive with the given keywords, the first letter in any case.
+        """
+        first, second = (r'\s+'.join(map(re.escape, keyword.split())) for keyword in keywords)
+        first = f'[{first[0].upper()}{first[0].lower()}]{first[1:]}'
+        return re.compile(rf'\s*{first}\s+(\w+)\s+{second}\s+"([^"]*)"\s*')
+
+    def __init__(self, text: str, name: str, path: str, line: int = 1):
+        self.text = text
+        self.name = name
+        self.path = path
+        self.line = line
+
+    def rows(self) -> Iterator[dict[str, str]]:
+        """
+        The fields of each row, the empty values are omitted.
+        """
+        with open(self.path, newline='') as file:
+            reader = csv.reader(file, delimiter='\t' if self.path.lower().endswith('.tsv') else ',')
+            header = [column.strip() for column in next(reader, [])]
+            for row in reader:
+                if not row:
+                    continue
+                if len(row) > len(header):
+                    raise ValueError(f'{self.path}, line {reader.line_num}: {len(row)} values '
+                                     f'for {len(header)} columns')
+                yield {column: value.strip() for column, value in zip(header, row) if value.strip()}
+
+    def __str__(self):
+        return f'{self.text}.'
+
+
+class Sentence(str):
+    """
+    Proposition of a text, i.e. the text up to the next dot without the comments.
+    start and end are the byte offsets of the proposition in the text (the dot excluded),
+    and line is the line of its first character that is not a space.
+    """
+    start: int
+    end: int
+    line: int
+
+
+# the next token that changes the state of the splitter: outside of strings and comments,
+# inside a string ('"'), a line comment ('//') and a block comment ('/*'),
+# and the characters at the end of a chunk whose meaning depends on the next chunk
+_SPLITTER_TOKENS = {
+    None: re.compile(r'"|//|/\*|\.|/\Z'),
+    '"': re.compile(r'\\.|"|\\\Z'),
+    '//': re.compile(r'\n'),
+    '/*': re.compile(r'\*/|\*\Z'),
+}
+
+
+def split_propositions(cnl_text: Iterable[str]) -> Iterator[Sentence]:
+    """
+    Split the text into propositions, i.e. the text between the dots that are not inside strings and comments,
+    nor between two digits (decimal numbers). The comments are removed, since the grammars ignore them.
+    The text is read incrementally from the chunks (e.g. the lines of a file) in a single pass,
+    thus only the proposition being read is kept in memory.
+    """
+    splitter = _Splitter()
+    carry = ''  # end of the previous chunk, whenever its meaning depends on the next one
+    for chunk in cnl_text:
+        carry = yield from splitter.split(carry + chunk)
+    yield from splitter.split(carry, final=True)
+    yield splitter.sentence()
+
+
+class _Splitter:
+    """
+    State of split_propositions between the chunks of the text.
+    """
+
+    def __init__(self):
+        self.parts: list[str] = []  # text of the proposition being read
+        self.start = 0  # byte offset of the proposition
+        self.offset = 0  # byte offset of the text read so far
+        self.line = 1  # line of the text read so far
+        self.first_line: int | None = None
+        self.start_line = 1
+        self.state: str | None = None  # '"' inside a string, '//' and '/*' inside a comment
+        self.previous = ''  # last character read
+
+    def split(self, text: str, final: bool = False) -> Iterator[Sentence]:
+        """
+        Read the text, yielding the propositions ending in it, and return the end of the text
+        that is read with the next chunk.
+        """
+        position = 0  # start of the text not read yet
+        search = 0
+        carry = ''
+        while (match := _SPLITTER_TOKENS[self.state].search(text, search)) is not None:
+            token, search = match.group(), match.end()
+            if not final and match.end() == len(text) and token in ('.', '/', '*', '\\'):
+                text, carry = text[:match.start()], text[match.start():]
+                break
+            if self.state is None and token == '.':
+                before = text[match.start() - 1] if match.start() else self.previous
+                if before.isdigit() and match.end() < len(text) and text[match.end()].isdigit():
+                    continue
+                self._read(text[position:match.start()])
+                yield self.sentence()
+                self._skip('.')
+                self.start, self.start_line, position = self.offset, self.line, match.end()
+            elif self.state is None and token == '"':
+                self.state = token
+            elif self.state is None and token != '/':  # a comment starts
+                self._read(text[position:match.start()])
+                self.state, position = token, match.start()
+            elif self.state == '"':
+                if token == '"':
+                    self.state = None
+            elif self.state in ('//', '/*') and token != '*':
+                # the new line closing a line comment is kept, so that the lines of the proposition are preserved
+                end = match.start() if self.state == '//' else match.end()
+                self._skip(text[position:end])
+                self.state, position = None, end
+        if self.state in ('//', '/*'):
+            self._skip(text[position:])
+        else:
+            self._read(text[position:])
+        if text:
+            self.previous = text[-1]
+        return carry
+
+    def sentence(self) -> Sentence:
+        sentence = Sentence(''.join(self.parts))
+        sentence.start, sentence.end = self.start, self.offset
+        sentence.line = self.start_line if self.first_line is None else self.first_line
+        self.parts, self.first_line = [], None
+        return sentence
+
+    def _read(self, text: str):
+        self.parts.append(text)
+        if self.first_line is None and text.strip():
+            self.first_line = self.line + text[:len(text) - len(text.lstrip())].count('\n')
+        self._skip(text)
+
+    def _skip(self, text: str):
+        self.offset += len(text) if text.isascii() else len(text.encode())
+        self.line += text.count('\n')
+
+
+def preprocessing_grammar(config: dict) -> str | None:
     # grammar for identifying variable substitution proposition parts
     # that are the constructions supported by the where_token
     grammar = dedent(f'''\
@@ -155,7 +409,7 @@ def process_cnl_specification(cnl: CnlWizardCompiler, cnl_specification: str, co
                 %ignore WS
                 %import common.NUMBER
                 %import common.CNAME
-                LABEL: /[A-Z]+/
+                LABEL: /[A-Z][A-Z0-9]*/
                 ''')
     start_rules = []
     if config['signatures']:
@@ -174,8 +428,14 @@ def process_cnl_specification(cnl: CnlWizardCompiler, cnl_specification: str, co
         grammar += dedent('''\
                 proposition: any+ "," where_token
                 any: /.+?/ 
-                ?where_token.1: where_token_between | where_token_one_of | where_distinct | where_token "," where_token
-                where_token_between: "where" LABEL "is" [respectively] "between" NUMBER "and" NUMBER 
+                ?where_token.1: where_token_between | where_token_one_of | where_distinct | where_comparison | where_token "," where_token
+                where_token_between: "where" LABEL "is" [respectively] "between" bound "and" bound
+                where_comparison: "where" LABEL "is" comparison_operator bound
+                !comparison_operator: "equal to" | "different from" | "less than" | "greater than" | "less than or equal to" | "greater than or equal to" | "at most" | "at least"
+                bound: NUMBER -> bound_number
+                     | LABEL -> bound_variable
+                     | LABEL "+" NUMBER -> bound_sum
+                     | LABEL "-" NUMBER -> bound_difference
                 where_token_one_of: "where" LABEL "is" [respectively] "one" "of" (CNAME | NUMBER) (","? "and"? (CNAME | NUMBER))*
                 where_distinct: "where" LABEL (","? "and"? LABEL)+ "are distinct"
                 respectively: "respectively"
@@ -183,23 +443,101 @@ def process_cnl_specification(cnl: CnlWizardCompiler, cnl_specification: str, co
         start_rules.append('proposition')
     if not start_rules:
         'No need of pre-process. Everything is disabled'
-        return cnl_specification
+        return None
     grammar += f'start:  {" | ".join(start_rules)}'
-    lark = Lark(grammar, propagate_positions = True)
-    res = ''
-    for idx, proposition in enumerate(cnl_specification.split('.')):
-        try:
-            proposition = proposition.strip()
-            tree = lark.parse(proposition)
-            transf = ProcessCNLTransformer(cnl)
-            proposition = transf.transform(tree)
-            if proposition:
-                if transf.variable_substitution:
-                    res += substitute_variable(proposition, transf.variable_substitution) + '\n'
-        except UnexpectedEOF:
-            if proposition:
-                if proposition[-1].isnumeric():
-                    res += proposition + ' .\n'
-                else:
-                    res += proposition + '.\n'
-    return res.strip()
+    return grammar
+
+
+@lru_cache
+def preprocessing_parser(signatures: bool, var_substitution: bool):
+    """
+    Parser of the pre-processor for the given configuration, built once per process.
+    """
+    grammar = preprocessing_grammar({'signatures': signatures, 'var_substitution': var_substitution})
+    if grammar is None:
+        return None
+    from CNLWizard.cnl_wizard_compiler import CnlParser
+    # the any regex relies on the Earley dynamic lexer
+    return CnlParser(grammar, CnlParser.EARLEY, propagate_positions=True)
+
+
+# Necessary conditions for a proposition to be a definition or to contain variable substitutions:
+# the other propositions (usually the large majority) are recognized in linear time and never parsed.
+_DEFINITION_KEYWORDS = re.compile(r'\b(?:concept|identified by|has|list made of)\b')
+_DEFINITION_NAME = re.compile(r'(?:An? )?\s*[A-Za-z_]\w*')
+_WHERE = re.compile(r',\s*where')
+
+
+def needs_preprocessing(proposition: str, config: dict) -> bool:
+    if config['signatures'] and (_DEFINITION_KEYWORDS.search(proposition) or _DEFINITION_NAME.fullmatch(proposition)):
+        return True
+    return bool(config['var_substitution'] and _WHERE.search(proposition))
+
+
+def process_propositions(cnl: CnlWizardCompiler, propositions: Iterable[str], config: dict,
+                         templates: bool = False, symbolic: bool = False, facts: bool = False,
+                         data_dir: str | None = None) -> Iterator[str | PropositionTemplate | FactsDirective]:
+    """
+    Pre-process the propositions (e.g. the sentences of split_propositions) one at a time, yielding the processed text of each one
+    (nothing for the definitions, one line for each clone of the propositions with variable substitutions).
+    With templates, the propositions with variable substitutions are yielded as PropositionTemplate,
+    and with symbolic as SymbolicProposition whenever the substitution does not depend on the order of the clones.
+    With facts, the directives loading the facts from a file are yielded as FactsDirective,
+    whose path is relative to data_dir (default: the working folder).
+    """
+    lark = preprocessing_parser(config['signatures'], config['var_substitution'])
+    for proposition in propositions:
+        line = getattr(proposition, 'line', 1)
+        proposition = proposition.strip()
+        if not proposition:
+            continue
+        if facts:
+            match = FactsDirective.pattern(tuple(config['facts_directive'])).fullmatch(proposition)
+            if match:
+                path = os.path.join(data_dir or '', match.group(2))
+                yield FactsDirective(proposition, match.group(1), path, line)
+                continue
+        if lark is not None and needs_preprocessing(proposition, config):
+            try:
+                tree = lark.parse(proposition)
+                transf = ProcessCNLTransformer(cnl, line)
+                processed = transf.transform(tree)
+            except UnexpectedInput:
+                transf = None
+            except VisitError as error:
+                if isinstance(error.orig_exc, SubstitutionError):
+                    raise error.orig_exc from None
+                raise
+            # the where-clauses on variables that are not substituted (e.g. variables of the target language)
+            # are left to the grammar of the CNL
+            if transf is not None and not transf.unresolved:
+                check_expansion_budget(cnl, proposition, transf.variable_substitution, config)
+                if processed and transf.variable_substitution:
+                    if templates and symbolic and transf.variable_substitution.symbolic():
+                        yield SymbolicProposition(processed, transf.variable_substitution)
+                    elif templates:
+                        yield PropositionTemplate(processed, transf.variable_substitution)
+                    else:
+                        yield substitute_variable(processed, transf.variable_substitution)
+                continue
+        if proposition[-1].isnumeric():
+            yield proposition + ' .'
+        else:
+            yield proposition + '.'
+
+
+def check_expansion_budget(cnl: CnlWizardCompiler, proposition: str, substitution: Substitution, config: dict):
+    budget = config.get('expansion_budget')
+    if budget is None or substitution.size() <= budget:
+        return
+    message = f'The proposition "{proposition}" expands to up to {substitution.size()} clones, ' \
+              f'over the expansion budget of {budget}'
+    if config.get('expansion_budget_abort'):
+        raise SubstitutionError(message)
+    cnl.logger.warning(message)
+
+
+def process_cnl_specification(cnl: CnlWizardCompiler, cnl_specification: str, config: dict):
+    if preprocessing_grammar(config) is None:
+        return cnl_specification
+    return '\n'.join(process_propositions(cnl, split_propositions([cnl_specification]), config))
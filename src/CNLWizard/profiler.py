@@ -0,0 +1,135 @@
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+
+class RuleStats:
+    def __init__(self):
+        self.calls = 0
+        self.self_time = 0.0  # time spent in the function of the rule
+        self.cumulative = 0.0  # time spent compiling the subtrees of the rule, including its function
+        self.allocated = 0  # bytes allocated (net of the freed ones) by the function of the rule
+
+    def as_dict(self) -> dict:
+        return {'calls': self.calls, 'self': self.self_time, 'cumulative': self.cumulative,
+                'allocated': self.allocated}
+
+
+class RuleProfiler:
+    """
+    Profile of the functions called by the CNLTransformer for each rule of the grammar: number of calls,
+    self time (the function alone), cumulative time (the subtrees of the rule, including the functions of
+    the rules below it) and allocated bytes (traced by tracemalloc whenever it is running, see memory).
+    The self time of each function is also recorded under the path of the rules from the root of the parse tree,
+    written as collapsed stacks (see write_stacks), e.g. for flamegraph.pl.
+    The compiler only wraps the functions when a profiler is given, the compilation without it is unchanged.
+    """
+    SORT_KEYS = ('self', 'cumulative', 'calls', 'allocated')
+
+    def __init__(self, memory: bool = False):
+        self.memory = memory  # start tracemalloc while profiling, slowing down the functions
+        self.rules: dict[str, RuleStats] = defaultdict(RuleStats)
+        self.stacks: dict[str, float] = defaultdict(float)  # self time of the functions by path of rules
+        self._path: list[str] = []  # rules from the root to the running one
+        self._active: dict[str, int] = defaultdict(int)  # running rules, counted once in the recursive ones
+        self._tracing = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_path'] = []
+        state['_active'] = defaultdict(int)
+        state['_tracing'] = False
+        return state
+
+    def wrap(self, functions: dict) -> dict:
+        """
+        The functions calling the profiled ones.
+        """
+        return {name: self._wrap(name, function) if callable(function) else function
+                for name, function in functions.items()}
+
+    def _wrap(self, name: str, function: Callable) -> Callable:
+        def profiled(*args, **kwargs):
+            return self.call(name, function, args, kwargs)
+
+        profiled.impure = getattr(function, 'impure', False)
+        profiled.__wrapped__ = function
+        return profiled
+
+    def call(self, name: str, function: Callable, args: tuple, kwargs: dict):
+        path = self._path if self._path and self._path[-1] == name else self._path + [name]
+        tracing = tracemalloc.is_tracing()
+        memory = tracemalloc.get_traced_memory()[0] if tracing else 0
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            stats = self.rules[name]
+            stats.calls += 1
+            stats.self_time += elapsed
+            if tracing:
+                stats.allocated += tracemalloc.get_traced_memory()[0] - memory
+            if path is not self._path:
+                # called outside the parse tree (e.g. the root of the propositions, or inline)
+                stats.cumulative += elapsed
+            self.stacks[';'.join(path)] += elapsed
+
+    @contextmanager
+    def rule(self, name: str) -> Iterator[None]:
+        """
+        Context of the compilation of a subtree of the rule.
+        """
+        self._path.append(name)
+        self._active[name] += 1
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._path.pop()
+            self._active[name] -= 1
+            if not self._active[name]:
+                self.rules[name].cumulative += time.perf_counter() - start
+
+    @contextmanager
+    def profiling(self) -> Iterator["RuleProfiler"]:
+        """
+        Context of a compilation, tracing the memory if required.
+        """
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        try:
+            yield self
+        finally:
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+
+    def as_dict(self) -> dict:
+        return {name: stats.as_dict() for name, stats in self.rules.items()}
+
+    def report(self, sort: str = 'self', limit: int | None = None) -> str:
+        """
+        The rules sorted by sort (one of SORT_KEYS, descending), the first limit ones if any.
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f'Unknown sort key {sort}, expected one of {", ".join(self.SORT_KEYS)}')
+        rules = sorted(self.rules.items(), key=lambda item: item[1].as_dict()[sort], reverse=True)[:limit]
+        width = max([len('rule')] + [len(name) for name, _ in rules]) + 2
+        lines = [f'{"rule":<{width}}{"calls":>10}{"self (s)":>12}{"cumulative (s)":>16}{"allocated (KiB)":>17}']
+        for name, stats in rules:
+            allocated = f'{stats.allocated / 1024:.1f}' if self.memory or stats.allocated else '-'
+            lines.append(f'{name:<{width}}{stats.calls:>10}{stats.self_time:>12.4f}{stats.cumulative:>16.4f}'
+                         f'{allocated:>17}')
+        return '\n'.join(lines)
+
+    def write_stacks(self, path: str):
+        """
+        Write the collapsed stacks, i.e. a line for each path of rules with the self time in microseconds.
+        """
+        with open(path, 'w') as out:
+            for stack, elapsed in sorted(self.stacks.items()):
+                out.write(f'{stack} {max(1, round(elapsed * 1e6))}\n')
@@ -1,7 +1,8 @@
 import ast
-import importlib.util
+import hashlib
 import os
 import sys
+import types
 from collections import defaultdict
 from pathlib import Path
 from textwrap import indent
@@ -248,8 +249,9 @@ class YAMLReader:
 
 
 class pyReader:
-    def _get_functions_name_in(self, path: str) -> list[str]:
-        text = Path(path).read_text()
+    def _get_functions_name_in(self, path: str, text: str = None) -> list[str]:
+        if text is None:
+            text = Path(path).read_text()
         parsed_ast = ast.parse(text)
         functions = [n.name for n in parsed_ast.body if isinstance(n, ast.FunctionDef)]
         for line in text.splitlines():
@@ -257,21 +259,34 @@ class pyReader:
                 functions.append(line)
         return functions
 
-    def _import_module(self, path: str):
-        module_name = os.path.basename(path).split('.')[0]
-        spec = importlib.util.spec_from_file_location(module_name, path)
-        module = importlib.util.module_from_spec(spec)
-        sys.modules[module_name] = module
-        spec.loader.exec_module(module)
-
     def get_functions(self, file: str) -> dict[str, Callable]:
         if not os.path.exists(file):
             return {}
-        functions = self._get_functions_name_in(file)
-        self._import_module(file)
-        module_name = os.path.basename(file).split('.')[0]
-        module = sys.modules[module_name]
+        return pyModule(file).instantiate()
+
+
+class pyModule:
+    """
+    Python file containing the functions of a CNL.
+    The file is read and compiled once, while each instantiation executes it in a new module,
+    thus the module level state is not shared between different instances.
+    """
+
+    def __init__(self, path: str):
+        self.path = os.path.abspath(path)
+        text = Path(path).read_text()
+        self.functions = pyReader()._get_functions_name_in(path, text)
+        self.code = compile(text, self.path, 'exec')
+        # the module is registered with a name unique for its path, files with the same name do not collide
+        digest = hashlib.sha1(self.path.encode()).hexdigest()[:12]
+        self.module_name = f'{os.path.basename(path).split(".")[0]}_{digest}'
+
+    def instantiate(self) -> dict[str, Callable]:
+        module = types.ModuleType(self.module_name)
+        module.__file__ = self.path
+        sys.modules[self.module_name] = module
+        exec(self.code, module.__dict__)
         res = {}
-        for fn in functions:
+        for fn in self.functions:
             exec(f'res["{fn}"] = module.{fn}', locals())
         return res
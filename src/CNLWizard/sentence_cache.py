@@ -0,0 +1,126 @@
+import hashlib
+import marshal
+import os
+import pickle
+import sqlite3
+import sys
+import types
+
+
+class SentenceCache:
+    """
+    On-disk cache of the translations of the propositions, so that re-running the compilation
+    of a slightly modified CNL text only parses and transforms the new or changed propositions.
+    Entries are keyed by the grammar, the functions (with the files defining them and the libraries they use),
+    the declarations in scope and the normalized proposition.
+    The propositions calling impure functions (see impure), changing the declarations
+    or whose translation cannot be pickled are never cached.
+    """
+    DEFAULT_FILE = 'sentences.sqlite'
+    LIBRARIES = 'CNLWizard.libs'  # package of the libraries whose sources are part of the key
+    COMMIT_EVERY = 1000  # entries written in a single transaction
+
+    def __init__(self, cache_dir: str, file: str = DEFAULT_FILE):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, file)
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0  # propositions that cannot be cached
+        self._connection: sqlite3.Connection | None = None
+        self._pending = 0
+
+    def __getstate__(self):
+        # the connection is opened again by each process
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        return state
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS sentences (key TEXT PRIMARY KEY, value BLOB)')
+            self._connection.commit()
+        return self._connection
+
+    def namespace(self, grammar: str, functions: dict) -> str:
+        """
+        Digest of the grammar, of the code of the functions, of the files of their modules
+        (e.g. the functions file, with its constants and helpers) and of the libraries these modules use.
+        """
+        digest = hashlib.sha256(grammar.encode())
+        for path in sorted(self._sources(functions)):
+            digest.update(path.encode())
+            try:
+                with open(path, 'rb') as source:
+                    digest.update(source.read())
+            except OSError:
+                pass
+        for name in sorted(functions):
+            code = getattr(functions[name], '__code__', None)
+            digest.update(name.encode())
+            digest.update(marshal.dumps(code) if code is not None else repr(functions[name]).encode())
+        return digest.hexdigest()
+
+    def _sources(self, functions: dict) -> set[str]:
+        """
+        The files of the modules of the functions and of the libraries used by them (transitively).
+        """
+        sources = set()
+        pending = [function.__globals__ for function in functions.values() if hasattr(function, '__globals__')]
+        seen = set()
+        while pending:
+            namespace = pending.pop()
+            if id(namespace) in seen:
+                continue
+            seen.add(id(namespace))
+            if namespace.get('__file__'):
+                sources.add(namespace['__file__'])
+            for value in list(namespace.values()):
+                name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, '__module__', None)
+                if isinstance(name, str) and name.startswith(SentenceCache.LIBRARIES) and name in sys.modules:
+                    pending.append(sys.modules[name].__dict__)
+        return sources
+
+    def key(self, namespace: str, declarations: str, proposition: str) -> str:
+        content = '\0'.join([namespace, declarations, ' '.join(proposition.split())])
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key: str) -> list | None:
+        row = self._connect().execute('SELECT value FROM sentences WHERE key = ?', (key,)).fetchone()
+        try:
+            values = pickle.loads(row[0]) if row is not None else None
+        except Exception:
+            # the classes of the translation changed
+            values = None
+        if values is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return values
+
+    def put(self, key: str, values: list):
+        try:
+            value = pickle.dumps(values)
+        except Exception:
+            self.skipped += 1
+            return
+        self._connect().execute('INSERT OR REPLACE INTO sentences VALUES (?, ?)', (key, value))
+        self._pending += 1
+        if self._pending >= SentenceCache.COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self._pending:
+            self._connection.commit()
+            self._pending = 0
+
+    def skip(self):
+        self.skipped += 1
+
+    def clear(self):
+        self._connect().execute('DELETE FROM sentences')
+        self._connection.commit()
+
+    def report(self) -> str:
+        return f'sentence cache: {self.hits} hits, {self.misses} misses, {self.skipped} not cacheable'
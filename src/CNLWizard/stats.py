@@ -0,0 +1,118 @@
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak = 0  # bytes allocated over the memory at the start of the stage, the highest of the calls
+
+    def as_dict(self) -> dict:
+        return {'calls': self.calls, 'wall': self.wall, 'cpu': self.cpu, 'peak': self.peak}
+
+
+class CompilationStats:
+    """
+    Wall time, CPU time and memory peak (traced by tracemalloc) of the stages of the compilation,
+    e.g. preprocess, lark, parse, transform and output, and the sizes of the compilation:
+    input and output bytes, and the number of propositions before and after the expansion of the where-clauses.
+    A stage entered several times (e.g. proposition by proposition) sums the times of all the calls.
+    The stages can be nested, the peak of a stage includes the ones of its inner stages.
+    Tracing the memory slows down the compilation, it can be disabled with memory=False.
+    """
+    COUNTERS = ('input_bytes', 'propositions', 'expanded_propositions', 'output_bytes')
+
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.stages: dict[str, StageStats] = {}
+        self.counters = dict.fromkeys(self.COUNTERS, 0)
+        self._stack: list[list] = []  # running stages: start memory and the highest peak of their inner stages
+        self._tracing = False  # tracemalloc started by the stats
+
+    def __getstate__(self):
+        # sent to the worker processes without the running stages
+        state = self.__dict__.copy()
+        state['_stack'] = []
+        state['_tracing'] = False
+        return state
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        stats = self.stages.setdefault(name, StageStats())
+        memory = self._start_memory()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stats
+        finally:
+            stats.calls += 1
+            stats.wall += time.perf_counter() - wall
+            stats.cpu += time.process_time() - cpu
+            if memory is not None:
+                stats.peak = max(stats.peak, self._stop_memory() - memory)
+
+    def _start_memory(self) -> int | None:
+        if not self.memory:
+            return None
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            # the peak is reset for the inner stage, the outer one keeps the highest so far
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._stack.append([current, current])
+        return current
+
+    def _stop_memory(self) -> int:
+        _, highest = self._stack.pop()
+        peak = max(highest, tracemalloc.get_traced_memory()[1])
+        if self._stack:
+            self._stack[-1][1] = max(self._stack[-1][1], peak)
+        elif self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        return peak
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, stats: dict):
+        """
+        Add the stats of another compilation (see as_dict), e.g. the ones of the files compiled in batch mode.
+        """
+        for name, stage in stats['stages'].items():
+            current = self.stages.setdefault(name, StageStats())
+            current.calls += stage['calls']
+            current.wall += stage['wall']
+            current.cpu += stage['cpu']
+            current.peak = max(current.peak, stage['peak'])
+        for name, value in stats['counters'].items():
+            self.count(name, value)
+
+    def as_dict(self) -> dict:
+        return {'stages': {name: stage.as_dict() for name, stage in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def dump(self, path: str, files: dict[str, dict] | None = None):
+        """
+        Write the stats in json format, with the ones of each file compiled in batch mode (if any).
+        """
+        stats = self.as_dict()
+        if files is not None:
+            stats['files'] = files
+        with open(path, 'w') as out:
+            json.dump(stats, out, indent=2)
+
+    def report(self) -> str:
+        lines = [f'{"stage":<16}{"calls":>8}{"wall (s)":>12}{"cpu (s)":>12}{"peak (KiB)":>14}']
+        for name, stage in self.stages.items():
+            peak = f'{stage.peak / 1024:.1f}' if self.memory else '-'
+            lines.append(f'{name:<16}{stage.calls:>8}{stage.wall:>12.3f}{stage.cpu:>12.3f}{peak:>14}')
+        lines += [f'{name}: {value}' for name, value in self.counters.items()]
+        return '\n'.join(lines)
@@ -0,0 +1,315 @@
+from __future__ import annotations
+import itertools
+import operator
+from typing import Iterable, Iterator
+
+from CNLWizard.exception.exception import SubstitutionError
+
+try:
+    import numpy
+except ImportError:  # the clones are evaluated one at a time
+    numpy = None
+
+
+COMPARISONS = {
+    'equal to': operator.eq,
+    'different from': operator.ne,
+    'less than': operator.lt,
+    'greater than': operator.gt,
+    'less than or equal to': operator.le,
+    'greater than or equal to': operator.ge,
+    'at most': operator.le,
+    'at least': operator.ge,
+}
+
+
+class Bound:
+    """
+    Bound of a where-clause: a number, or a variable plus an offset (e.g. D2+13).
+    It is evaluated on a clone, or on the columns of a block of clones.
+    """
+
+    def __init__(self, variable: str | None = None, offset: int = 0):
+        self.variable = variable
+        self.offset = offset
+
+    def variables(self) -> set[str]:
+        return set() if self.variable is None else {self.variable}
+
+    def __call__(self, clone: dict):
+        if self.variable is None:
+            return self.offset
+        try:
+            return clone[self.variable] + self.offset
+        except TypeError:
+            raise SubstitutionError(f"Variable {self.variable} is not a number")
+
+    def __str__(self):
+        if self.variable is None:
+            return str(self.offset)
+        return f'{self.variable}{self.offset:+}' if self.offset else self.variable
+
+
+class Substitution:
+    """
+    Lazy substitution of the variables, i.e. the dicts with variable-value as a key-pair,
+    each dict is a new proposition clone.
+    The clones are generated on iteration (each iteration generates them again) as the product of the values
+    of the variables, the values of the respectively variables are zipped with the clones generated so far,
+    and the clones not satisfying the filters (distinct variables and comparisons) are discarded
+    as soon as their variables are bound, thus the invalid combinations are never generated.
+    With NumPy the clones are evaluated in blocks of columns, one for each variable.
+    """
+    BLOCK = 4096  # clones evaluated together
+
+    def __init__(self):
+        # the steps generating the clones: ('product' | 'respectively', variable, values),
+        # ('between', variable, low, high), ('distinct', variables) and ('compare', variable, comparison, bound)
+        self.steps: list[tuple] = []
+
+    def variables(self) -> set[str]:
+        return {step[1] for step in self.steps if step[0] in ('product', 'respectively', 'between')}
+
+    def product(self, variable: str, values: Iterable):
+        self._start()
+        self.steps.append(('product', variable, values))
+
+    def respectively(self, variable: str, values: Iterable, line: int):
+        if not self._start():
+            self.steps.append(('product', variable, values))
+            return
+        if len(values) != self._count():
+            raise SubstitutionError(f"Lists do not match for variable substitution in proposition {line}")
+        self.steps.append(('respectively', variable, values))
+
+    def between(self, variable: str, low: Bound, high: Bound):
+        """
+        The values from low to high, whose bounds depend on the values of other variables.
+        """
+        if not low.variables() and not high.variables():
+            self.product(variable, range(low.offset, high.offset + 1))
+            return
+        self._start()
+        self._numbers(low.variables() | high.variables())
+        self.steps.append(('between', variable, low, high))
+
+    def distinct(self, variables: list[str]):
+        if self._start():
+            self._filter(('distinct', variables), set(variables))
+
+    def compare(self, variable: str, comparison: str, bound: Bound):
+        if self._start():
+            if comparison in ('equal to', 'different from'):
+                # any value can be compared for equality, but the offset is added to a number
+                self._numbers(bound.variables() if bound.offset else set())
+            else:
+                self._numbers({variable} | bound.variables())
+            self._filter(('compare', variable, comparison, bound), {variable} | bound.variables())
+
+    def _numbers(self, variables: set[str]):
+        domains = self._domains()[1]
+        for variable in sorted(variables):
+            if variable not in domains:
+                raise SubstitutionError(f"Variable {variable} is not substituted")
+            if domains[variable] is None:
+                raise SubstitutionError(f"Variable {variable} is not a number")
+
+    def _filter(self, step: tuple, variables: set[str]):
+        for variable in variables - self.variables():
+            raise SubstitutionError(f"Variable {variable} is not substituted")
+        # the filter is moved after the last step binding its variables, without crossing the respectively steps
+        # that depend on the positions of the clones
+        position = len(self.steps)
+        while position and self.steps[position - 1][0] != 'respectively' \
+                and (self.steps[position - 1][0] in ('distinct', 'compare')
+                     or self.steps[position - 1][1] not in variables):
+            position -= 1
+        self.steps.insert(position, step)
+
+    def _start(self) -> bool:
+        # a new substitution starts whenever there are no clones
+        if self.steps and not self:
+            self.steps.clear()
+        return bool(self.steps)
+
+    def _count(self) -> int:
+        if all(step[0] in ('product', 'respectively') for step in self.steps):
+            return self.size()
+        if numpy is not None:
+            return sum(size for size, _ in self._blocks())
+        return sum(1 for _ in self)
+
+    def _domains(self) -> tuple[int, dict[str, tuple[int, int] | None]]:
+        # upper bound of the number of clones and minimum and maximum value of each variable (None if not a number)
+        size = 1 if self.steps else 0
+        domains = {}
+        for step in self.steps:
+            if step[0] in ('product', 'respectively'):
+                if step[0] == 'product':
+                    size *= len(step[2])
+                domains[step[1]] = _limits(step[2])
+            elif step[0] == 'between':
+                low = (domains[step[2].variable] or (0, 0)) if step[2].variable else (0, 0)
+                high = (domains[step[3].variable] or (0, 0)) if step[3].variable else (0, 0)
+                low, high = low[0] + step[2].offset, high[1] + step[3].offset
+                size *= max(0, high - low + 1)
+                domains[step[1]] = low, high
+        return size, domains
+
+    def size(self) -> int:
+        """
+        Upper bound of the number of clones, computed without generating them.
+        """
+        return self._domains()[0]
+
+    def symbolic(self) -> bool:
+        """
+        Whether the clones are described by the steps alone, i.e. by the domains of the variables and the filters,
+        without considering their order: the respectively steps depend on the positions of the clones,
+        and a variable bound twice takes only the values of the last step.
+        """
+        bound = [step[1] for step in self.steps if step[0] in ('product', 'respectively', 'between')]
+        return bool(bound) and 'respectively' not in (step[0] for step in self.steps) and \
+            len(bound) == len(set(bound))
+
+    def __iter__(self) -> Iterator[dict]:
+        if not self.steps:
+            return iter([])
+        if numpy is None:
+            return self._clones()
+        return self._columns_clones()
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+    def _clones(self) -> Iterator[dict]:
+        clones = iter([{}])
+        for step in self.steps:
+            clones = getattr(self, f'_{step[0]}')(clones, *step[1:])
+        return clones
+
+    @staticmethod
+    def _product(clones: Iterator[dict], variable: str, values: Iterable) -> Iterator[dict]:
+        for clone in clones:
+            for value in values:
+                yield clone | {variable: value}
+
+    @staticmethod
+    def _respectively(clones: Iterator[dict], variable: str, values: Iterable) -> Iterator[dict]:
+        for clone, value in zip(clones, values):
+            yield clone | {variable: value}
+
+    @staticmethod
+    def _between(clones: Iterator[dict], variable: str, low: Bound, high: Bound) -> Iterator[dict]:
+        for clone in clones:
+            for value in range(low(clone), high(clone) + 1):
+                yield clone | {variable: value}
+
+    @staticmethod
+    def _distinct(clones: Iterator[dict], variables: list[str]) -> Iterator[dict]:
+        for clone in clones:
+            values = [clone[variable] for variable in variables]
+            if len(set(values)) == len(values):
+                yield clone
+
+    @staticmethod
+    def _compare(clones: Iterator[dict], variable: str, comparison: str, bound: Bound) -> Iterator[dict]:
+        for clone in clones:
+            if COMPARISONS[comparison](clone[variable], bound(clone)):
+                yield clone
+
+    def _columns_clones(self) -> Iterator[dict]:
+        keys = list(dict.fromkeys(step[1] for step in self.steps
+                                  if step[0] in ('product', 'respectively', 'between')))
+        for _, columns in self._blocks():
+            for values in zip(*(columns[key].tolist() for key in keys)):
+                yield dict(zip(keys, values))
+
+    def _blocks(self) -> Iterator[tuple[int, dict]]:
+        # blocks of clones, i.e. their number and the column of the values of each variable
+        blocks = iter([(1, {})])
+        for step in self.steps:
+            blocks = getattr(self, f'_{step[0]}_block')(blocks, *step[1:])
+        return blocks
+
+    def _product_block(self, blocks: Iterator[tuple[int, dict]], variable: str, values: Iterable):
+        values = _column(values)
+        if not len(values):
+            return
+        rows = max(1, Substitution.BLOCK // len(values))
+        for size, columns in blocks:
+            for start in range(0, size, rows):
+                end = min(size, start + rows)
+                block = {key: numpy.repeat(column[start:end], len(values)) for key, column in columns.items()}
+                block[variable] = numpy.tile(values, end - start)
+                yield (end - start) * len(values), block
+
+    def _respectively_block(self, blocks: Iterator[tuple[int, dict]], variable: str, values: Iterable):
+        values = _column(values)
+        position = 0
+        for size, columns in blocks:
+            size = min(size, len(values) - position)
+            if size <= 0:
+                return
+            block = {key: column[:size] for key, column in columns.items()}
+            block[variable] = values[position:position + size]
+            position += size
+            yield size, block
+
+    def _between_block(self, blocks: Iterator[tuple[int, dict]], variable: str, low: Bound, high: Bound):
+        for size, columns in blocks:
+            lows = numpy.broadcast_to(numpy.asarray(low(columns), dtype=numpy.int64), size)
+            highs = numpy.broadcast_to(numpy.asarray(high(columns), dtype=numpy.int64), size)
+            counts = numpy.maximum(highs - lows + 1, 0)
+            ends = numpy.cumsum(counts)
+            start = 0
+            while start < size:
+                # the clones of the rows from start to end fill a block (at least one row)
+                first = ends[start - 1] if start else 0
+                end = max(start + 1, int(numpy.searchsorted(ends, first + Substitution.BLOCK, side='right')))
+                rows = numpy.repeat(numpy.arange(start, end), counts[start:end])
+                block = {key: column[rows] for key, column in columns.items()}
+                block[variable] = lows[rows] + numpy.arange(len(rows)) - (ends[rows] - counts[rows] - first)
+                if len(rows):
+                    yield len(rows), block
+                start = end
+
+    def _distinct_block(self, blocks: Iterator[tuple[int, dict]], variables: list[str]):
+        for size, columns in blocks:
+            selected = numpy.ones(size, dtype=bool)
+            for first, second in itertools.combinations(variables, 2):
+                selected &= numpy.asarray(columns[first] != columns[second], dtype=bool)
+            yield from _select(size, columns, selected)
+
+    def _compare_block(self, blocks: Iterator[tuple[int, dict]], variable: str, comparison: str, bound: Bound):
+        for size, columns in blocks:
+            selected = numpy.asarray(COMPARISONS[comparison](columns[variable], bound(columns)), dtype=bool)
+            yield from _select(size, columns, numpy.broadcast_to(selected, size))
+
+
+def _limits(values: Iterable) -> tuple[int, int] | None:
+    if isinstance(values, range):
+        return (values[0], values[-1]) if values else (0, -1)
+    values = list(values)
+    if values and all(isinstance(value, int) for value in values):
+        return min(values), max(values)
+    return None
+
+
+def _column(values: Iterable):
+    if isinstance(values, range):
+        return numpy.arange(values.start, values.stop, values.step, dtype=numpy.int64)
+    values = list(values)
+    if all(type(value) is int and -2 ** 63 <= value < 2 ** 63 for value in values):
+        return numpy.array(values, dtype=numpy.int64)
+    column = numpy.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _select(size: int, columns: dict, selected) -> Iterator[tuple[int, dict]]:
+    count = int(selected.sum())
+    if count == size:
+        yield size, columns
+    elif count:
+        yield count, {key: column[selected] for key, column in columns.items()}
@@ -0,0 +1,208 @@
+from __future__ import annotations
+import bisect
+import itertools
+from typing import TYPE_CHECKING, Callable
+
+from lark import Tree, Token, UnexpectedInput
+
+from CNLWizard.process_cnl import PropositionTemplate, SymbolicProposition, Variable
+
+if TYPE_CHECKING:
+    from CNLWizard.cnl_wizard_compiler import CnlParser
+
+
+class _NotInstantiable(Exception):
+    pass
+
+
+class TemplateExpansion:
+    """
+    Parse tree of pre-processed propositions.
+    The clones of a template whose values match the same terminals are parsed only once,
+    the trees of the other ones are copies of the parsed one with the values replaced in the tokens.
+    """
+
+    def __init__(self, lark: CnlParser, propositions: list[str | PropositionTemplate]):
+        self.lark = lark
+        self.sentences: list[str] = []
+        self.offsets: list[int] = []
+        self._length = 0
+        self._shapes: dict[str, frozenset] = {}
+        self.parsed = 0  # number of clones parsed
+        self._start = None  # root of the trees of the symbolic propositions
+        # for each proposition (or clone) the index of its sentence,
+        # or the index of the sentence of the parsed clone, its values, the template and the values of the clone,
+        # or the tree of a symbolic proposition
+        self.plan: list[int | tuple[int, dict, PropositionTemplate, dict] | Tree] = []
+        symbolic = self._symbolic([proposition for proposition in propositions
+                                   if isinstance(proposition, SymbolicProposition)])
+        for proposition in propositions:
+            if not isinstance(proposition, PropositionTemplate):
+                self.plan.append(self._add(proposition))
+                continue
+            if id(proposition) in symbolic:
+                self.plan.append(symbolic[id(proposition)])
+                continue
+            parsed = {}
+            for values in proposition:
+                text = proposition.clone(values)
+                if not proposition.instantiable(values):
+                    self.plan.append(self._add(text))
+                    continue
+                shape = self._shape(values, text)
+                if shape not in parsed:
+                    parsed[shape] = self._add(text), values
+                    self.plan.append(parsed[shape][0])
+                    self.parsed += 1
+                else:
+                    self.plan.append((*parsed[shape], proposition, values))
+
+    def _symbolic(self, propositions: list[SymbolicProposition]) -> dict[int, Tree]:
+        """
+        The tree of each symbolic proposition (by id) whose text with the variables is accepted by the grammar,
+        it is the substitution and the tree of the proposition. The rejected ones are expanded.
+        """
+        if not propositions:
+            return {}
+        texts = [proposition.text for proposition in propositions]
+        try:
+            tree = self.lark.parse('\n'.join(texts))
+            children = self._locate(tree, list(itertools.accumulate((len(text) + 1 for text in texts[:-1]),
+                                                                    initial=0)), len(texts))
+        except UnexpectedInput:
+            children = None
+        if children is None:
+            if len(propositions) == 1:
+                return {}
+            return {key: value for proposition in propositions for key, value in self._symbolic([proposition]).items()}
+        self._start = tree.data
+        return {id(proposition): Tree('symbolic_substitution', [proposition.variables, child], child.meta)
+                for proposition, child in zip(propositions, children) if isinstance(child, Tree)}
+
+    def _add(self, sentence: str) -> int:
+        self.sentences.append(sentence)
+        self.offsets.append(self._length)
+        self._length += len(sentence) + 1
+        return len(self.sentences) - 1
+
+    def _shape(self, values: dict, text: str) -> tuple:
+        shape = []
+        for value in map(str, values.values()):
+            if value not in self._shapes:
+                self._shapes[value] = frozenset(name for name, terminal in self.lark.terminals.items()
+                                                if terminal.fullmatch(value))
+            shape.append(self._shapes[value])
+        # a space is added before the dot of the clones ending with a number
+        return tuple(shape), text.endswith(' .')
+
+    def parse(self) -> Tree | None:
+        """
+        The tree of the propositions, None if the parsed sentences cannot be matched with the propositions.
+        """
+        if self.sentences:
+            tree = self.lark.parse('\n'.join(self.sentences))
+            children = self._locate(tree, self.offsets, len(self.sentences))
+        else:  # only symbolic propositions
+            tree, children = Tree(self._start, []), []
+        if children is None:
+            return None
+        res = []
+        pending = []  # clones that cannot be instantiated, they are parsed from the text
+        for step in self.plan:
+            if isinstance(step, int):
+                res.append(children[step])
+                continue
+            if isinstance(step, Tree):
+                res.append(step)
+                continue
+            sentence, parsed, template, values = step
+            try:
+                res.append(children[sentence] and self._instantiate(children[sentence], self.offsets[sentence],
+                                                                     template, parsed, values))
+            except _NotInstantiable:
+                pending.append(len(res))
+                res.append(template.clone(values))
+        if pending:
+            texts = [res[idx] for idx in pending]
+            offsets = list(itertools.accumulate((len(text) + 1 for text in texts[:-1]), initial=0))
+            parsed = self._locate(self.lark.parse('\n'.join(texts)), offsets, len(texts))
+            if parsed is None:
+                return None
+            for idx, child in zip(pending, parsed):
+                res[idx] = child
+        return Tree(tree.data, [child for child in res if child is not None], tree.meta)
+
+    def _locate(self, tree: Tree, offsets: list[int], size: int) -> list | None:
+        """
+        The child of the root parsed from each sentence (None for the sentences without propositions, e.g. comments).
+        """
+        res = [None] * size
+        last = -1
+        for idx, child in enumerate(tree.children):
+            if child is None:  # placeholder of an optional symbol of the root, e.g. [rule]
+                return None
+            positions = [child.start_pos] if isinstance(child, Token) else \
+                [token.start_pos for token in child.scan_values(lambda v: isinstance(v, Token))]
+            if positions:
+                sentence = bisect.bisect_right(offsets, min(positions)) - 1
+                if bisect.bisect_right(offsets, max(positions)) - 1 != sentence:
+                    return None
+            elif len(tree.children) == size:
+                sentence = idx
+            else:
+                return None
+            if sentence <= last:
+                return None
+            res[sentence] = child
+            last = sentence
+        return res
+
+    def _instantiate(self, tree: Tree, offset: int, template: PropositionTemplate, parsed: dict, values: dict) -> Tree:
+        spans = []
+        start = offset
+        for segment in template.segments:
+            text = str(parsed[segment]) if isinstance(segment, Variable) else segment
+            spans.append((start, start + len(text), segment))
+            start += len(text)
+
+        def value(token: Token) -> str:
+            start, end = token.start_pos, token.start_pos + len(token.value)
+            res = []
+            replaced = False
+            for span_start, span_end, segment in spans:
+                if span_end <= start or span_start >= end:
+                    continue
+                if not isinstance(segment, Variable):
+                    res.append(segment[max(start, span_start) - span_start:min(end, span_end) - span_start])
+                elif start <= span_start and span_end <= end:
+                    res.append(str(values[segment]))
+                    replaced = True
+                else:
+                    # the token splits the value
+                    raise _NotInstantiable()
+            if not replaced:
+                return token.value
+            if end > spans[-1][1]:
+                res.append(token.value[spans[-1][1] - start:])
+            res = ''.join(res)
+            if token.type not in self.lark.terminals or not self.lark.terminals[token.type].fullmatch(res):
+                raise _NotInstantiable()
+            return res
+
+        return self._copy(tree, value)
+
+    def _copy(self, tree: Tree, value: Callable[[Token], str]) -> Tree:
+        # only the subtrees containing replaced values are copied
+        children = []
+        changed = False
+        for child in tree.children:
+            if isinstance(child, Tree):
+                new = self._copy(child, value)
+            elif isinstance(child, Token):
+                new_value = value(child)
+                new = child if new_value == child.value else Token.new_borrow_pos(child.type, new_value, child)
+            else:
+                new = child
+            changed = changed or new is not child
+            children.append(new)
+        return Tree(tree.data, children, tree.meta) if changed else tree
@@ -112,7 +112,7 @@ class LarkGrammarWriter(RuleVisitor):
 class PythonFunctionWriter(RuleVisitor):
     def __init__(self, imported_fn: dict = None):
         self._implemented_fn = set()
-        self._import_libs = ['from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler']
+        self._import_libs = ['from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, context']
         self._imported_fn = imported_fn
 
     def __create_unique_args(self, args: list[str]) -> list[str]:
@@ -179,7 +179,7 @@ class PythonFunctionWriter(RuleVisitor):
             py_fn += dedent(f'''\
                     def {r.name}({', '.join(self.__create_unique_args(r.get_rule_function_args()))}):
                         try:
-                            entity = CnlWizardCompiler.signatures[string]
+                            entity = context().signatures[string]
                             for name, value in attribute:
                                 entity.fields[name] = value
                             return entity
@@ -194,10 +194,10 @@ class PythonFunctionWriter(RuleVisitor):
         if r.name not in self._implemented_fn:
             py_fn += dedent('''\
                             def list_index_element(idx, list_name):
-                                return self.cnl.lists[list_name][idx]
+                                return context().lists[list_name][idx]
                     
                             def list_contains(list_name, elem):
-                                return elem in self.cnl.lists[list_name]\n\n\n''')
+                                return elem in context().lists[list_name]\n\n\n''')
         if r.concat is not None and f'{r.name}_concat' not in self._implemented_fn:
             py_fn += self.__concat_rule(r)
         return py_fn
@@ -1,4 +1,4 @@
-from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, context
 
 
 def start(arithmetic):
@@ -18,7 +18,7 @@ def constraint(arithmetic):
 
 def entity(string, attribute):
     try:
-        entity = CnlWizardCompiler.signatures[string]
+        entity = context().signatures[string]
         for name, value in attribute:
             entity.fields[name] = value
         return entity
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from CNLWizard.cnl_wizard_compiler import CompilationContext, CnlWizardCompiler
+from CNLWizard.exception.exception import SubstitutionError
+from CNLWizard.libs.asp import Atom, Constraint, Fact, Signature, OPERATORS, domains, symbolic_substitution, facts
+from CNLWizard.process_cnl import FactsDirective
+from CNLWizard.substitution import COMPARISONS, Substitution, Bound
+
+
+class TestSymbolicSubstitution(unittest.TestCase):
+
+    def _substitution(self) -> Substitution:
+        substitution = Substitution()
+        substitution.product('X', range(1, 4))
+        substitution.product('Y', ['a', 'b', 7])
+        substitution.between('Z', Bound('X'), Bound('X', 13))
+        substitution.distinct(['X', 'Z'])
+        substitution.compare('X', 'at most', Bound('Z', -1))
+        return substitution
+
+    def test_domains(self):
+        with CompilationContext():
+            CnlWizardCompiler.constants['a'] = 1
+            self.assertEqual(list(map(str, domains(self._substitution()))),
+                             ['X=1..3', 'Y=(a;"b";7)', 'Z=X..X+13', 'X<=Z-1', 'X!=Z'])
+        # each comparison of the where-clauses has an ASP operator
+        self.assertLessEqual(set(COMPARISONS.values()), OPERATORS.keys())
+
+    def test_rules(self):
+        substitution = Substitution()
+        substitution.product('X', range(1, 4))
+        with CompilationContext():
+            node = Atom(Signature('node', {'id': 'X'}))
+            self.assertEqual(str(symbolic_substitution(substitution, Fact(node))), 'node(X) :- X=1..3.')
+            self.assertEqual(str(symbolic_substitution(substitution, Constraint([node]))), ':- node(X), X=1..3.')
+            self.assertEqual(symbolic_substitution(substitution, 'edge(X,1..2).'), 'edge(X,1..2) :- X=1..3.')
+            self.assertEqual(symbolic_substitution(substitution, 'a(X) :- b(X).'), 'a(X) :- b(X), X=1..3.')
+            self.assertIsNone(symbolic_substitution(substitution))
+            self.assertRaises(SubstitutionError, symbolic_substitution, substitution, 'a(X). b(X).')
+
+
+class TestFacts(unittest.TestCase):
+
+    def test_facts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'employees.tsv')
+            with open(path, 'w') as file:
+                file.write('name\tsalary\n1\t2000\nb\t\n')
+            directive = FactsDirective('There are employees from "employees.tsv"', 'employees', path)
+            with CompilationContext():
+                CnlWizardCompiler.signatures['employee'] = 'employee', ['name', 'salary', 'team'], ['name'], None
+                self.assertEqual(list(map(str, facts(directive.name, directive.rows()))),
+                                 ['employee(1,2000,_).', 'employee("b",_,_).'])
+                self.assertRaises(ValueError, list, facts('employees', [{'age': '1'}]))
+                # the plurals of the declared signatures
+                CnlWizardCompiler.signatures['box'] = 'box', ['id'], ['id'], None
+                CnlWizardCompiler.signatures['class'] = 'class', ['id'], ['id'], None
+                CnlWizardCompiler.signatures['category'] = 'category', ['id'], ['id'], None
+                self.assertEqual([str(fact) for name in ['boxes', 'classes', 'categories', 'Box']
+                                  for fact in facts(name, [{'id': '1'}])],
+                                 ['box(1).', 'class(1).', 'category(1).', 'box(1).'])
+                self.assertRaises(ValueError, list, facts('nodes', [{'id': '1'}]))
@@ -1,6 +1,6 @@
 import unittest
 
-from CNLWizard.cnl import CompiledRule
+from CNLWizard.cnl import CompiledRule, Grammar, GrammarConfigRule, SupportRule
 
 
 class TestCnl(unittest.TestCase):
@@ -32,4 +32,34 @@ class TestCnl(unittest.TestCase):
         rule = CompiledRule('test', ['("this is" "a") test'])
         self.assertEqual(rule.get_symbols(), ['"this is"', '"a"', 'test'])
         rule = CompiledRule('test', ['("this is" | "This is") "a" test'])
-        self.assertEqual(rule.get_symbols(), ['"this is"', '"This is"', '"a"', 'test'])
\ No newline at end of file
+        self.assertEqual(rule.get_symbols(), ['"this is"', '"This is"', '"a"', 'test'])
+        rule = CompiledRule('test', ['first', '[second]'])
+        self.assertEqual(rule.get_symbols(), ['first', 'second'])
+
+    def test_syntax_changes(self):
+        rule = SupportRule('test', ['CNAME'])
+        self.assertEqual(rule.get_non_terminal_symbols(), ['CNAME'])
+        rule.syntax[0] = '"a" attr'
+        self.assertEqual(rule.get_non_terminal_symbols(), ['attr'])
+        rule.concat = '"and" other'
+        self.assertEqual(rule.get_dependencies(), {'attr', 'other'})
+
+    def test_get_rules(self):
+        grammar = Grammar()
+        grammar['_all']['%import common.CNAME'] = GrammarConfigRule('%import common.CNAME', [])
+        for rule in [CompiledRule('start', ['proposition+']), CompiledRule('proposition', ['"a" NAME entity']),
+                     SupportRule('NAME', ['CNAME']), CompiledRule('entity', ['CNAME']),
+                     CompiledRule('unused', ['"b" entity unreachable']), CompiledRule('unreachable', ['CNAME'])]:
+            grammar['_all'][rule.name] = rule
+        grammar['lang']['entity'] = CompiledRule('entity', ['"c"'])
+        rules = grammar.get_rules('lang')
+        self.assertEqual([rule.name for rule in rules], ['start', '%import common.CNAME', 'proposition', 'NAME',
+                                                         'entity'])
+        # the rules with the same name are merged in a copy
+        self.assertEqual(rules[-1].syntax, ['CNAME', '"c"'])
+        self.assertEqual(grammar['_all']['entity'].syntax, ['CNAME'])
+        self.assertIs(grammar.get_rules('lang')[-1], rules[-1])
+        grammar['_all']['proposition'].syntax.append('unused')
+        self.assertEqual([rule.name for rule in grammar.get_rules('lang')][-2:], ['unused', 'unreachable'])
+        del grammar['lang']['entity']
+        self.assertIs(grammar.get_rules('lang')[-3], grammar['_all']['entity'])
@@ -0,0 +1,534 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from lark.exceptions import GrammarError
+
+from CNLWizard.cnl_wizard import cnl_text_files
+from CNLWizard.cnl_wizard_compiler import CnlParser, CnlWizardCompiler, CompilationContext, ContextObject, Signatures, \
+    VariableAllocator, create_var, Signature, CNLTransformer
+from CNLWizard.exception.exception import NotStreamableError
+from CNLWizard.fact_path import FactPath
+from CNLWizard.parser_cache import ParserCache
+from CNLWizard.prelude import Prelude
+from CNLWizard.template_expansion import TemplateExpansion
+from CNLWizard.process_cnl import PropositionTemplate, FactsDirective
+from CNLWizard.reader import pyReader
+
+LALR_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: "There is a" CNAME
+%import common.CNAME
+%import common.WS
+%ignore WS
+'''
+
+# entity and verb both reduce a single CNAME on the same lookahead
+CONFLICT_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: entity | verb
+entity: CNAME
+verb: CNAME
+%import common.CNAME
+%import common.WS
+%ignore WS
+'''
+
+# the attributes can be grouped in several ways, LALR would always shift the comma
+SHIFT_REDUCE_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: "node" attribute
+attribute: CNAME | attribute "," attribute
+%import common.CNAME
+%import common.WS
+%ignore WS
+'''
+
+# "node" is always lexed as keyword by the contextual lexer, hence LALR rejects "node edge"
+LEXER_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: "node" NUMBER | CNAME "edge"
+%import common.CNAME
+%import common.NUMBER
+%import common.WS
+%ignore WS
+'''
+
+TEMPLATE_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: "There is a" CNAME "with id" (NUMBER | CNAME)+ ("and" CNAME)?
+%import common.CNAME
+%import common.NUMBER
+%import common.WS
+%ignore WS
+'''
+
+# the facts with size are parsed by the size rule by the full parser
+FACT_GRAMMAR = '''\
+start: (proposition ".")+
+proposition: there_is_clause | size | edge
+there_is_clause: "There is a" CNAME attribute*
+attribute: "with" CNAME (NUMBER | ESCAPED_STRING)
+size: "There is a" CNAME "with size" NUMBER
+edge: "There is an edge from" CNAME
+%import common.CNAME
+%import common.NUMBER
+%import common.ESCAPED_STRING
+%import common.WS
+%ignore WS
+'''
+
+# the translation of each proposition is the list of its values
+FUNCTIONS = {'start': lambda *propositions: list(propositions), 'proposition': lambda *args: ' '.join(args),
+             'graph': lambda arg: None}
+
+# the propositions are named after the LALR_GRAMMAR, the ones starting with var have a fresh variable,
+# and the constant one defines a constant
+VARIABLES_PY = '''\
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, create_var
+
+
+def start(*propositions):
+    return " ".join(propositions)
+
+
+def proposition(name):
+    if name == "constant":
+        CnlWizardCompiler.constants[name] = True
+    return f"{name}({create_var()})" if name.startswith("var") else name
+
+
+def graph(*args):
+    return None
+'''
+
+
+def write(folder: str, name: str, text: str) -> str:
+    path = os.path.join(folder, name)
+    with open(path, 'w') as file:
+        file.write(text)
+    return path
+
+
+def compile_text(lark: CnlParser, functions: dict, text: str, **kwargs):
+    with CompilationContext():
+        return CnlWizardCompiler(**kwargs).compile_text(lark, functions, text)
+
+
+class TestCnlParser(unittest.TestCase):
+
+    def test_lalr(self):
+        parser = CnlParser(LALR_GRAMMAR)
+        self.assertEqual(parser.parser, CnlParser.LALR)
+        self.assertFalse(parser.conflicts)
+        self.assertEqual(parser.parse('There is a node.').data, 'start')
+
+    def test_fallback_on_conflicts(self):
+        parser = CnlParser(CONFLICT_GRAMMAR)
+        self.assertEqual(parser.parser, CnlParser.EARLEY)
+        self.assertTrue(any('Reduce/Reduce' in conflict for conflict in parser.conflicts))
+        self.assertIn('entity', parser.report())
+        self.assertEqual(parser.parse('node.').data, 'start')
+
+    def test_fallback_on_shift_reduce_conflicts(self):
+        with self.assertLogs('CnlParser', 'WARNING') as logs:
+            parser = CnlParser(SHIFT_REDUCE_GRAMMAR)
+        self.assertEqual(parser.parser, CnlParser.EARLEY)
+        self.assertIn('Shift/Reduce conflict for terminal COMMA', logs.output[0])
+        self.assertIn('* <attribute : attribute COMMA attribute>', parser.report())
+        # the forced LALR mode resolves them as shift, as Lark does
+        self.assertEqual(CnlParser(SHIFT_REDUCE_GRAMMAR, CnlParser.LALR).parser, CnlParser.LALR)
+        self.assertFalse(CnlParser(LALR_GRAMMAR).conflicts)
+
+    def test_fallback_on_rejected_input(self):
+        parser = CnlParser(LEXER_GRAMMAR)
+        self.assertEqual(parser.parser, CnlParser.LALR)
+        with self.assertLogs('CnlParser', 'WARNING') as logs:
+            self.assertEqual(parser.parse('node edge.').data, 'start')
+            # Earley is used from the first rejected input onwards
+            self.assertEqual(parser.parser, CnlParser.EARLEY)
+            self.assertEqual(parser.parse('node edge. node 1 .').data, 'start')
+        self.assertEqual(len(logs.output), 1)
+
+    def test_quiet(self):
+        with self.assertLogs('CnlParser', 'INFO') as logs:
+            CnlParser(CONFLICT_GRAMMAR, quiet=True)
+        self.assertTrue(logs.output[0].startswith('INFO'))
+
+    def test_parse_propositions(self):
+        values = [1, 2, 'a', 'b', 'x y', 'z w', 'Y']
+        propositions = ['There is a edge with id 1 .',
+                        PropositionTemplate('There is a node with id X and Y',
+                                            [{'X': value, 'Y': 'c'} for value in values]),
+                        'There is a arc with id a.']
+        for mode in [CnlParser.LALR, CnlParser.EARLEY]:
+            parser = CnlParser(TEMPLATE_GRAMMAR, mode)
+            self.assertEqual(parser.parse_propositions(propositions),
+                             parser.parse('\n'.join(map(str, propositions))))
+        # numbers and names are parsed once, the values with a space (split in two tokens)
+        # and the one containing a variable are parsed from the text
+        self.assertEqual(TemplateExpansion(CnlParser(TEMPLATE_GRAMMAR), propositions).parsed, 3)
+
+    def test_fact_fast_path(self):
+        functions = FUNCTIONS | {'proposition': lambda arg: arg,
+                                 'there_is_clause': lambda name, *attributes: ' '.join([name, *attributes]),
+                                 'attribute': lambda name, value: f'{name}={value}',
+                                 'size': lambda name, size: f'{name} size {size}', 'edge': lambda name: f'edge {name}'}
+        text = 'There is a node with id 1 . There is a node with id 2 with label "a.b". There is a node with id 3 . ' \
+               'There is an edge from a. There is a box with size 3 . There is a box with size 4 . There is a node.'
+        for mode in [CnlParser.AUTO, CnlParser.EARLEY]:
+            res = compile_text(CnlParser(FACT_GRAMMAR, mode), functions, text)
+            self.assertEqual(res, compile_text(CnlParser(FACT_GRAMMAR, mode, fast_path=False), functions, text))
+            self.assertEqual(res[:4], ['node id=1', 'node id=2 label="a.b"', 'node id=3', 'edge a'])
+        # the edge is left to the full parser, and so are the boxes whenever the full parser chooses the size rule
+        facts = FactPath(CnlParser(FACT_GRAMMAR, CnlParser.LALR))
+        self.assertEqual(facts.prefixes, ('There is a',))
+        self.assertIsNone(facts.parse('There is an edge from a.'))
+        self.assertIsNone(facts.parse('There is a box with size 3 .'))
+
+    def test_transform(self):
+        functions = FUNCTIONS | {'proposition': lambda name: (type(name), name), 'graph': lambda arg: 'graph'}
+        text = 'There is a node. There is a edge.'
+        expected = [(str, 'node'), (str, 'edge'), 'graph']
+        for grammar in [LALR_GRAMMAR, CONFLICT_GRAMMAR.replace('entity | verb', '"There is a" CNAME')]:
+            parser = CnlParser(grammar)
+            self.assertEqual(parser.transform(text, CNLTransformer(functions)), expected)
+            self.assertEqual(CNLTransformer(functions).transform(parser.parse(text)), expected)
+        # discarded children are not passed to the functions
+        functions['proposition'] = lambda name: None if name == 'edge' else name
+        self.assertEqual(CnlParser(LALR_GRAMMAR).transform(text, CNLTransformer(functions)), ['node', 'graph'])
+
+    def test_forced_mode(self):
+        self.assertRaises(GrammarError, CnlParser, CONFLICT_GRAMMAR, CnlParser.LALR)
+        self.assertEqual(CnlParser(LALR_GRAMMAR, CnlParser.EARLEY).parser, CnlParser.EARLEY)
+        self.assertRaises(ValueError, CnlParser, LALR_GRAMMAR, 'cyk')
+
+
+class TestCnlWizardCompiler(unittest.TestCase):
+
+    def _batch_files(self, tmp: str) -> tuple[str, str, list[str]]:
+        py_file = write(tmp, 'functions.py', '''\
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler
+
+
+def start(*propositions):
+    CnlWizardCompiler.constants.update({p: True for p in propositions})
+    return " ".join(CnlWizardCompiler.constants)
+
+
+def proposition(name):
+    if name == "error":
+        raise ValueError(name)
+    return name
+
+
+def graph(*args):
+    return None
+''')
+        texts = ['There is a node.', 'There is a edge.', 'There is', 'There is a error.']
+        cnl_files = [write(tmp, f'{idx}.cnl', text) for idx, text in enumerate(texts)]
+        return write(tmp, 'grammar.lark', LALR_GRAMMAR), py_file, cnl_files
+
+    def _check_batch(self, tmp: str, results: list):
+        self.assertEqual([result.out_file for result in results],
+                         [os.path.join(tmp, '0.out'), os.path.join(tmp, '1.out'), None, None])
+        with open(results[0].out_file) as out:
+            self.assertEqual(out.read().strip(), 'node')
+        with open(results[1].out_file) as out:
+            # constants do not leak from the previous compilation
+            self.assertEqual(out.read().strip(), 'edge')
+        # the text is not parsed, no result is written
+        self.assertIn('Unexpected', results[2].error)
+        self.assertFalse(os.path.exists(os.path.join(tmp, '2.out')))
+        self.assertIn('ValueError', results[3].error)
+
+    def test_compile_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            grammar_file, py_file, cnl_files = self._batch_files(tmp)
+            self._check_batch(tmp, CnlWizardCompiler().compile_batch(grammar_file, py_file, cnl_files))
+            CnlWizardCompiler.reset()
+
+    def test_compile_batch_jobs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            grammar_file, py_file, cnl_files = self._batch_files(tmp)
+            self._check_batch(tmp, CnlWizardCompiler().compile_batch(grammar_file, py_file, cnl_files, jobs=2))
+
+    def test_compile_batch_inline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            grammar_file, py_file, cnl_files = self._batch_files(tmp)
+            self._check_batch(tmp, CnlWizardCompiler(inline=True).compile_batch(grammar_file, py_file, cnl_files))
+            CnlWizardCompiler.reset()
+
+    def test_compile_batch_out_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            grammar_file, py_file, cnl_files = self._batch_files(tmp)
+            results = CnlWizardCompiler().compile_batch(grammar_file, py_file, cnl_files[:1])
+            # the results of the previous compilations are not cnl texts
+            files = cnl_text_files([tmp, os.path.join(tmp, '*')])
+            self.assertNotIn(results[0].out_file, files)
+            self.assertEqual([file for file in files if file.endswith('.cnl')], cnl_files + cnl_files)
+            # the result of 0.out would overwrite it
+            results = CnlWizardCompiler().compile_batch(grammar_file, py_file, [results[0].out_file, cnl_files[1]])
+            self.assertIn('is a cnl text file', results[0].error)
+            self.assertIsNone(results[1].error)
+            with open(results[1].out_file) as out:
+                self.assertEqual(out.read().strip(), 'edge')
+            CnlWizardCompiler.reset()
+
+    def test_compile_keeps_config(self):
+        with tempfile.TemporaryDirectory() as tmp, CompilationContext():
+            grammar_file, py_file, cnl_files = self._batch_files(tmp)
+            CnlWizardCompiler.config['var_substitution'] = False
+            res = CnlWizardCompiler().compile(grammar_file, py_file, cnl_files[0])
+            self.assertEqual(res, 'node')
+            # the compilation runs in a new context with the same configuration
+            self.assertEqual(CnlWizardCompiler.constants, {'node': True})
+            self.assertFalse(CnlWizardCompiler.config['var_substitution'])
+
+    def test_inline(self):
+        lark = CnlParser(LEXER_GRAMMAR)
+        with CompilationContext():
+            # the text rejected by LALR while compiling inline is not compiled again
+            compiler = CnlWizardCompiler(inline=True)
+            self.assertEqual(compiler.compile_text(lark, FUNCTIONS, 'node 1. node edge.'), '')
+            self.assertIn('UnexpectedToken', compiler.parse_error)
+        # the following texts are parsed by Earley and compiled after parsing
+        self.assertEqual(lark.parser, CnlParser.EARLEY)
+        self.assertEqual(compile_text(lark, FUNCTIONS, 'node 1 . node edge.', inline=True), ['1', 'node'])
+
+    def test_stream(self):
+        functions = {'start': lambda *propositions: ''.join(f'{p}\n' for p in propositions),
+                     'proposition': lambda name: None if name == 'skip' else f'{name}.',
+                     'graph': lambda arg: 'graph.'}
+        text = 'There is a node. There is a skip. There is a edge. There is.'
+        lark = CnlParser(LALR_GRAMMAR)
+        with CompilationContext():
+            res = list(CnlWizardCompiler().stream_text(lark, functions, [text[:20], text[20:]]))
+        self.assertEqual(res, ['node.\n', 'edge.\n', 'graph.\n'])
+        self.assertEqual(compile_text(lark, functions, text[:-10]), ''.join(res))
+
+    def test_stream_not_concatenating(self):
+        def proposition(name):
+            if name.startswith('constant'):
+                CnlWizardCompiler.constants[name] = True
+                return None
+            return f'{name}.'
+
+        # the constants defined so far are printed before the propositions
+        functions = {'start': lambda *propositions: ''.join(f'#const {c}.\n' for c in CnlWizardCompiler.constants)
+                                                    + ''.join(f'{p}\n' for p in propositions),
+                     'proposition': proposition, 'graph': lambda arg: None}
+        lark = CnlParser(LALR_GRAMMAR)
+        with CompilationContext():
+            stream = CnlWizardCompiler().stream_text(lark, functions, ['There is a constant. There is a node.'])
+            self.assertRaises(NotStreamableError, list, stream)
+        with CompilationContext(), self.assertLogs('CnlWizardCompiler', 'WARNING') as logs:
+            res = list(CnlWizardCompiler().stream_text(lark, functions, ['There is a node. There is a constant2. '
+                                                                         'There is a edge.']))
+            self.assertEqual(res, ['node.\n', '#const constant2.\nedge.\n'])
+        self.assertIn("adds '#const constant2.'", logs.output[0])
+
+    def test_compile_parallel(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            py_file = write(tmp, 'functions.py', VARIABLES_PY)
+            lark = CnlParser(LALR_GRAMMAR)
+            text = ' '.join(f'There is a {name}.' for name in ['node', 'var', 'edge', 'arc', 'var'] * 4)
+            for text in [text, text + ' There is a constant.']:
+                expected = compile_text(lark, pyReader().get_functions(py_file), text)
+                with CompilationContext():
+                    # the fresh variables are the same of the sequential compilation, the constant definition
+                    # is compiled sequentially
+                    res = CnlWizardCompiler().compile_parallel(lark, py_file, pyReader().get_functions(py_file),
+                                                               text, 2)
+                    self.assertEqual(res, expected)
+                    self.assertIn('var(V8)', res)
+                    self.assertEqual(CnlWizardCompiler.constants, {'constant': True} if 'constant' in text else {})
+
+    def test_compile_parallel_module_state(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            grammar_file = write(tmp, 'grammar.lark', LALR_GRAMMAR)
+            # the nodes are collected in the module and rendered by the start function
+            py_file = write(tmp, 'functions.py', '''\
+from CNLWizard.cnl_wizard_compiler import impure
+
+NODES = []
+
+
+def start(*propositions):
+    return " ".join(p for p in propositions if p) + " " + ",".join(NODES)
+
+
+@impure
+def proposition(name):
+    if name.startswith("node"):
+        NODES.append(name)
+        return None
+    return name
+
+
+def graph(*args):
+    return None
+''')
+            cnl_file = write(tmp, 'text.cnl',
+                             ' '.join(f'There is a {name}{idx}.' for idx in range(4) for name in ['node', 'edge']))
+            expected = CnlWizardCompiler().compile(grammar_file, py_file, cnl_file)
+            self.assertEqual(expected, 'edge0 edge1 edge2 edge3 node0,node1,node2,node3')
+            self.assertEqual(CnlWizardCompiler().compile(grammar_file, py_file, cnl_file, jobs=2), expected)
+            CnlWizardCompiler.reset()
+
+    def test_prelude(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            py_file = write(tmp, 'functions.py', VARIABLES_PY)
+            prelude = write(tmp, 'prelude.cnl', 'There is a constant. There is a var.')
+            lark = CnlParser(LALR_GRAMMAR)
+            text = 'There is a node. There is a var.'
+            expected = compile_text(lark, pyReader().get_functions(py_file), f'There is a constant. There is a var. '
+                                                                             f'{text}')
+            self.assertEqual(expected, 'constant var(V1) node var(V2)')
+            for _ in range(2):
+                # compiled the first time, then loaded from the cache
+                compiler = CnlWizardCompiler(cache=ParserCache(tmp), prelude=prelude)
+                with CompilationContext():
+                    compiler.load_prelude(lark, py_file, lambda: pyReader().get_functions(py_file))
+                    self.assertEqual(CnlWizardCompiler.constants, {})
+                self.assertEqual(len([file for file in os.listdir(tmp) if file.endswith(Prelude.EXT)]), 1)
+                for _ in range(2):
+                    with CompilationContext():
+                        self.assertEqual(compiler.compile_text(lark, pyReader().get_functions(py_file), text),
+                                         expected)
+                        self.assertEqual(CnlWizardCompiler.constants, {'constant': True})
+                with CompilationContext():
+                    self.assertEqual(list(compiler.stream_text(lark, pyReader().get_functions(py_file), [text])),
+                                     ['constant var(V1)', 'node', 'var(V2)'])
+
+    def test_facts_directive(self):
+        functions = FUNCTIONS | {'facts': lambda name, rows: (f'{name}({row["id"]})' for row in rows)}
+        with tempfile.TemporaryDirectory() as tmp:
+            write(tmp, 'nodes.csv', 'id\n1\n2\n')
+            lark = CnlParser(LALR_GRAMMAR)
+            text = 'There is a node. There are nodes from "nodes.csv". There is a edge.'
+            compiler = CnlWizardCompiler()
+            compiler.data_dir = tmp
+            with CompilationContext():
+                self.assertEqual(compiler.compile_text(lark, functions, text),
+                                 ['node', 'nodes(1)', 'nodes(2)', 'edge'])
+                self.assertEqual(list(compiler.stream_text(lark, functions, [text])),
+                                 ["['node']", "['nodes(1)']", "['nodes(2)']", "['edge']"])
+            # the keywords of the directive depend on the language
+            with CompilationContext():
+                CnlWizardCompiler.config['facts_directive'] = FactsDirective.KEYWORDS['it']
+                self.assertEqual(compiler.compile_text(lark, functions, text.replace('There are nodes from',
+                                                                                     'ci sono nodes da')),
+                                 ['node', 'nodes(1)', 'nodes(2)', 'edge'])
+            # without the facts function the directive is parsed by the grammar
+            del functions['facts']
+            with CompilationContext(), self.assertLogs(compiler.logger, 'ERROR'):
+                self.assertEqual(compiler.compile_text(lark, functions, text), '')
+
+    def test_symbolic_substitution(self):
+        functions = FUNCTIONS | {'symbolic_substitution': lambda substitution, proposition=None:
+                                 (sorted(substitution.variables()), proposition)}
+        text = 'There is a node with id X, where X is between 1 and 2. ' \
+               'There is a edge with id X and Y, where X is one of 1, 2, where Y is respectively one of a, b.'
+        expanded = ['node 1', 'node 2', 'edge 1 a', 'edge 2 b']
+        lark = CnlParser(TEMPLATE_GRAMMAR)
+        self.assertEqual(compile_text(lark, functions, text), [(['X'], 'node X'), 'edge 1 a', 'edge 2 b'])
+        with CompilationContext():
+            self.assertEqual(list(CnlWizardCompiler().stream_text(lark, functions, [text])),
+                             ["[(['X'], 'node X')]", "['edge 1 a', 'edge 2 b']"])
+        # the propositions with the variables rejected by the grammar are expanded
+        self.assertEqual(compile_text(CnlParser(TEMPLATE_GRAMMAR.replace('(NUMBER | CNAME)+', 'NUMBER')), functions,
+                                      text.split('. ')[0]), expanded[:2])
+        self.assertEqual(compile_text(lark, FUNCTIONS, text), expanded)
+
+
+class TestCompilationContext(unittest.TestCase):
+
+    def test_compiler_attributes(self):
+        with CompilationContext() as ctx:
+            CnlWizardCompiler.constants['n'] = 1
+            CnlWizardCompiler.signatures = Signatures()
+            self.assertIs(CnlWizardCompiler.signatures, ctx.signatures)
+            self.assertIs(CnlWizardCompiler().lists, ctx.lists)
+            self.assertEqual(ctx.constants, {'n': 1})
+        self.assertNotIn('n', CnlWizardCompiler.constants)
+
+    def test_context_object(self):
+        values = ContextObject('test.values', list)
+        with CompilationContext():
+            values.append(1)
+            self.assertEqual(len(values), 1)
+            with CompilationContext():
+                self.assertFalse(values)
+            self.assertIn(1, values)
+
+    def test_threads(self):
+        def compile_in_thread(name):
+            with CompilationContext() as ctx:
+                CnlWizardCompiler.signatures[name] = name, ['id'], ['id'], None
+                barrier.wait()
+                return list(ctx.signatures.signatures)
+
+        barrier = threading.Barrier(2)
+        with ThreadPoolExecutor(2) as executor:
+            self.assertEqual(list(executor.map(compile_in_thread, ['node', 'edge'])), [['node'], ['edge']])
+
+
+class TestVariableAllocator(unittest.TestCase):
+
+    def test_fresh_variables(self):
+        variables = VariableAllocator()
+        variables.reserve('There is a node with id equal to V2, with label equal to V21.')
+        self.assertEqual([variables() for _ in range(3)], ['V1', 'V3', 'V4'])
+        variables.reset()
+        self.assertEqual(variables(), 'V1')
+        variables.reset(10)
+        self.assertEqual(variables(), 'V11')
+
+    def test_create_var(self):
+        with CompilationContext():
+            self.assertEqual([create_var(), create_var()], ['V1', 'V2'])
+        with CompilationContext():
+            self.assertEqual(create_var(), 'V1')
+
+
+class TestSignatures(unittest.TestCase):
+
+    def test_instances(self):
+        signatures = Signatures()
+        signatures['node'] = 'node', ['id', 'color'], ['id'], ('node', '1', '5')
+        node = signatures['node']
+        node.fields['id'] = '1'
+        node.keys.append('color')
+        node.negation = 'not '
+        other = signatures['node']
+        self.assertEqual(str(node), 'node(1,_)')
+        self.assertEqual(str(other), 'node(_,_)')
+        self.assertEqual(other.keys, ['id'])
+        self.assertFalse(hasattr(other, 'negation'))
+        self.assertEqual((other.type, other.lb, other.ub), ('node', 1, 5))
+
+    def test_custom_signature_type(self):
+        class CustomSignature(Signature):
+            def __init__(self, name: str, fields: dict):
+                super().__init__(name, fields)
+                self.labels = []
+
+        class DuckSignature:
+            def __init__(self, name: str, fields: dict):
+                self.name = name
+                self.fields = fields
+
+        for signature_type in [CustomSignature, DuckSignature]:
+            signatures = Signatures(signature_type)
+            signatures['node'] = 'node', ['id'], ['id'], None
+            node = signatures['node']
+            node.fields['id'] = '1'
+            self.assertIsInstance(node, signature_type)
+            self.assertEqual(signatures['node'].fields, {'id': '_'})
+        signatures = Signatures(CustomSignature)
+        signatures['node'] = 'node', ['id'], ['id'], None
+        signatures['node'].labels.append('label')
+        self.assertEqual(signatures['node'].labels, [])
@@ -1,4 +1,5 @@
 import os
+import tempfile
 import unittest
 
 from CNLWizard.cnl_wizard_generator import CnlWizardGenerator
@@ -13,32 +14,27 @@ class TestCNLWizardGenerator(unittest.TestCase):
             expected_lang1 = file.read()
         with open(os.path.join(base_path, 'res', 'expected_lang2.py'), 'r') as file:
             lang2 = file.read()
-        cnl_wizard = CnlWizardGenerator(os.path.join(base_path, 'res',
-                                                     'cnlwizard_generator_test.yaml'),
-                                        [os.path.join(base_path, 'import')],
-                                        os.path.join(base_path, 'res'), 'en')
-        self.maxDiff = None
-        cnl_wizard.generate()
-        # Add arithmetic function to lang1 file
-        # It has no non-terminal symbols, but it is written in lower case.
-        # Instead, TERMINAL rule, as it is upper case, it is not added
-        with open(os.path.join(base_path, 'res', 'py_lang1.py'), 'r') as file:
-            generated_py_lang1_content = file.read()
-        with open(os.path.join(base_path, 'res', 'py_lang1.py'), 'w') as file:
-            file.write('')  # restore file
-        with open(os.path.join(base_path, 'res', 'py_lang2.py'), 'r') as file:
-            generated_py_lang2_content = file.read()
-        with open(os.path.join(base_path, 'res', 'py_lang2.py'), 'w') as file:
-            file.write('')  # restore file
+        with tempfile.TemporaryDirectory() as out_dir:
+            # the generated files are written in a temporary folder, thus the resources are never modified
+            cnl_wizard = CnlWizardGenerator(os.path.join(base_path, 'res', 'cnlwizard_generator_test.yaml'),
+                                            [os.path.join(base_path, 'import')], out_dir, 'en')
+            self.maxDiff = None
+            cnl_wizard.generate()
+            # Add arithmetic function to lang1 file
+            # It has no non-terminal symbols, but it is written in lower case.
+            # Instead, TERMINAL rule, as it is upper case, it is not added
+            with open(os.path.join(out_dir, 'py_lang1.py'), 'r') as file:
+                generated_py_lang1_content = file.read()
+            with open(os.path.join(out_dir, 'py_lang2.py'), 'r') as file:
+                generated_py_lang2_content = file.read()
+            with open(os.path.join(out_dir, 'grammar_lang1.lark'), 'r') as file:
+                grammar = file.read()
 
         self.assertEqual(generated_py_lang1_content.strip(), expected_lang1.strip())
         self.assertEqual(generated_py_lang2_content.strip(), lang2.strip())
-        with open(os.path.join(base_path, 'res', 'grammar_lang1.lark'), 'r') as file:
-            # as there is an instance of entity called entity, we do not have to add
-            # a composite rule in lark
-            grammar = file.read()
-            self.assertTrue('entity: ("a" | "an")? string attribute | entity' not in grammar)
-            self.assertTrue('there_is_clause: ("it is" | "There") "is" entity' in grammar)
-            # dummy is unused, thus it is not added
-            self.assertTrue('dummy' not in file.read())
-
+        # as there is an instance of entity called entity, we do not have to add
+        # a composite rule in lark
+        self.assertTrue('entity: ("a" | "an")? string attribute | entity' not in grammar)
+        self.assertTrue('there_is_clause: ("it is" | "There") "is" entity' in grammar)
+        # dummy is unused, thus it is not added
+        self.assertTrue('dummy' not in grammar)
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from CNLWizard.grammar_profiler import GrammarProfiler
+
+# a word can be an entity or an attribute, the sum is ambiguous
+GRAMMAR = '''\
+start: (proposition ".")+
+proposition: "There is a" entity ("with" attribute)? | "The sum is" sum | "It is" color
+entity: CNAME
+attribute: CNAME
+?sum: NUMBER | sum "+" sum -> plus
+_color: "red" | "blue"
+color: _color
+unused: "never"
+%import common.CNAME
+%import common.NUMBER
+%import common.WS
+%ignore WS
+'''
+
+
+class TestGrammarProfiler(unittest.TestCase):
+
+    def test_matches(self):
+        profiler = GrammarProfiler(GRAMMAR)
+        profiler.profile_text('There is a node with id. There is a node with X, where X is one of id, name.\n'
+                              'It is red.')
+        # a single clone of the proposition with the where-clause
+        self.assertEqual(len(profiler.propositions), 3)
+        matches = profiler.matches()
+        self.assertEqual(matches['proposition'], 3)
+        self.assertEqual(matches['entity'], 2)
+        self.assertEqual(matches['attribute'], 2)
+        # inlined rules are counted
+        self.assertEqual(matches['_color'], 1)
+        self.assertEqual(profiler.unused(), ['sum', 'unused'])
+        self.assertEqual(profiler.ambiguous(), [])
+        self.assertEqual(profiler.propositions[1].text, 'There is a node with id.')
+
+    def test_ambiguous(self):
+        profiler = GrammarProfiler(GRAMMAR)
+        profiler.profile_text('The sum is 1 + 2. The sum is 1 + 2 + 3.')
+        ambiguous = profiler.ambiguous()
+        self.assertEqual([proposition.line for proposition in ambiguous], [1])
+        self.assertEqual(ambiguous[0].ambiguities, [['plus', 'plus']])
+        self.assertIn('_ambig: plus | plus', profiler.report())
+
+    def test_rejected_and_outliers(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'text.cnl')
+            with open(path, 'w') as file:
+                file.write('There is a node.\nIt is green.')
+            profiler = GrammarProfiler(GRAMMAR)
+            profiler.profile_file(path)
+        self.assertEqual([(proposition.file, proposition.line) for proposition in profiler.rejected()], [(path, 2)])
+        profiler.propositions[0].time = 1.0
+        profiler.profile_text(' '.join(['There is a node.'] * 4))
+        for proposition in profiler.propositions[1:]:
+            proposition.time = 0.01
+        self.assertEqual(profiler.outliers(), [profiler.propositions[0]])
+        self.assertEqual(profiler.outliers(factor=200), [])
@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from lark import Lark
+
+from CNLWizard.grammar_pruner import GrammarPruner
+
+GRAMMAR = '''\
+start: (proposition ".")+
+// the propositions
+proposition: "There is a" entity [with_clause] | "The sum is" sum | "It is" color
+entity: CNAME ("of" owner)?
+owner: CNAME
+with_clause: "with" attribute
+attribute: CNAME
+?sum: NUMBER | sum "+" sum -> plus
+color: "red" | "blue" | SHADE "green"
+SHADE: "dark" | "light"
+unused: "never"
+%import common.CNAME
+%import common.NUMBER
+%import common.WS
+%ignore WS
+'''
+
+
+class TestGrammarPruner(unittest.TestCase):
+
+    def test_prune(self):
+        pruner = GrammarPruner(GRAMMAR)
+        pruner.profile_text('There is a node. It is red.')
+        self.assertEqual(pruner.used()['proposition'], [0, 2])
+        self.assertEqual(pruner.used()['sum'], [])
+        pruned = pruner.prune()
+        self.assertEqual(pruned, '''\
+start: (proposition ".")+
+// the propositions
+proposition: "There is a" entity [with_clause] | "It is" color
+entity: CNAME
+with_clause: /(?!)./
+color: "red"
+%import common.CNAME
+%import common.WS
+%ignore WS
+''')
+        self.assertEqual(Lark(pruned).parse('There is a node. It is red.'),
+                         Lark(GRAMMAR).parse('There is a node. It is red.'))
+        self.assertIn('rules: 9 -> 4', pruner.report(pruned))
+
+    def test_terminals(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'text.cnl')
+            with open(path, 'w') as file:
+                file.write('There is a node of Bob with id. The sum is 1 + 2. It is dark green.\nIt is yellow.')
+            pruner = GrammarPruner(GRAMMAR)
+            pruner.profile_file(path)
+        pruned = pruner.prune()
+        self.assertIn('entity: CNAME ("of" owner)?\n', pruned)
+        self.assertIn('?sum: NUMBER | sum "+" sum -> plus\n', pruned)
+        self.assertIn('color: SHADE "green"\nSHADE: "dark" | "light"\n', pruned)
+        self.assertIn('%import common.NUMBER\n', pruned)
+        self.assertNotIn('unused', pruned)
+        self.assertIn(f'rejected {path}:2: It is yellow.', pruner.report(pruned))
+
+    def test_verify(self):
+        pruner = GrammarPruner(GRAMMAR)
+        pruner.profile_text('There is a node. There is a node with id.')
+        pruner.verify(pruner.prune())
+        # without the placeholder of [with_clause]
+        with self.assertRaises(ValueError):
+            pruner.verify(GRAMMAR.replace('"There is a" entity [with_clause]', '"There is a" entity with_clause?'))
+
+    def test_templates(self):
+        with self.assertRaises(ValueError):
+            GrammarPruner(GRAMMAR + '_separated{x, sep}: x (sep x)*\n')
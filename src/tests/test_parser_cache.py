@@ -0,0 +1,91 @@
+import os
+import tempfile
+import unittest
+
+from lark import Lark
+
+from CNLWizard.cnl_wizard_compiler import CnlParser
+from CNLWizard.parser_cache import ParserCache
+from tests.test_compiler import LALR_GRAMMAR, CONFLICT_GRAMMAR, SHIFT_REDUCE_GRAMMAR
+
+
+class TestParserCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ParserCache(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_load(self):
+        options = {'parser': 'lalr'}
+        self.assertIsNone(self.cache.load(LALR_GRAMMAR, options))
+        self.cache.save(LALR_GRAMMAR, options, Lark(LALR_GRAMMAR, **options))
+        parser = self.cache.load(LALR_GRAMMAR, options)
+        self.assertEqual(parser.parse('There is a node.').data, 'start')
+        # different options are different entries
+        self.assertIsNone(self.cache.load(LALR_GRAMMAR, options | {'propagate_positions': True}))
+
+    def test_conflicts(self):
+        self.assertIsNone(self.cache.load_conflicts(CONFLICT_GRAMMAR, {}))
+        self.cache.save_conflicts(CONFLICT_GRAMMAR, {}, ['conflict'])
+        self.assertEqual(self.cache.load_conflicts(CONFLICT_GRAMMAR, {}), ['conflict'])
+
+    def test_corrupted_entry(self):
+        options = {'parser': 'lalr'}
+        self.cache.save(LALR_GRAMMAR, options, Lark(LALR_GRAMMAR, **options))
+        with open(os.path.join(self.tmp.name, self.cache.key(LALR_GRAMMAR, options) + ParserCache.PARSER_EXT), 'wb') as entry:
+            entry.write(b'corrupted')
+        self.assertIsNone(self.cache.load(LALR_GRAMMAR, options))
+        self.assertFalse(self.cache.entries())
+
+    def test_eviction(self):
+        options = {'parser': 'lalr'}
+        self.cache.save(LALR_GRAMMAR, options, Lark(LALR_GRAMMAR, **options))
+        entry_size = self.cache.size()
+        self.cache.max_size = entry_size
+        first = self.cache.entries()[0].path
+        os.utime(first, (0, 0))  # least recently used
+        self.cache.save(LALR_GRAMMAR + '\n', options, Lark(LALR_GRAMMAR, **options))
+        self.assertEqual(len(self.cache.entries()), 1)
+        self.assertFalse(os.path.exists(first))
+
+    def test_eviction_of_other_entries(self):
+        options = {'parser': 'lalr'}
+        self.cache.save(LALR_GRAMMAR, options, Lark(LALR_GRAMMAR, **options))
+        parser_size = self.cache.size()
+        for mtime, name in enumerate(['sentences.sqlite', 'sentences.sqlite-wal', 'text.prelude']):
+            with open(os.path.join(self.cache.cache_dir, name), 'wb') as file:
+                file.write(b'0' * 100)
+            os.utime(file.name, (mtime, mtime))
+        self.assertEqual(self.cache.size(), parser_size + 300)
+        self.cache.max_size = parser_size + 150
+        self.cache.evict()
+        # the database and its files are evicted together
+        self.assertEqual(sorted(os.listdir(self.cache.cache_dir)),
+                         [self.cache.key(LALR_GRAMMAR, options) + '.lark', 'text.prelude'])
+
+    def test_cnl_parser(self):
+        parser = CnlParser(LALR_GRAMMAR, cache=self.cache)
+        self.assertFalse(parser.from_cache)
+        parser = CnlParser(LALR_GRAMMAR, cache=self.cache)
+        self.assertTrue(parser.from_cache)
+        self.assertEqual(parser.parser, CnlParser.LALR)
+        self.assertEqual(parser.parse('There is a node.').data, 'start')
+        CnlParser(CONFLICT_GRAMMAR, cache=self.cache)
+        parser = CnlParser(CONFLICT_GRAMMAR, cache=self.cache)
+        self.assertTrue(parser.from_cache)
+        self.assertEqual(parser.parser, CnlParser.EARLEY)
+        self.assertTrue(parser.conflicts)
+
+    def test_shift_reduce_conflicts(self):
+        CnlParser(SHIFT_REDUCE_GRAMMAR, cache=self.cache)
+        parser = CnlParser(SHIFT_REDUCE_GRAMMAR, cache=self.cache)
+        self.assertTrue(parser.from_cache)
+        self.assertEqual(parser.parser, CnlParser.EARLEY)
+        self.assertTrue(parser.conflicts)
+        # the parser is stored with its conflicts for the forced LALR mode
+        parser = CnlParser(SHIFT_REDUCE_GRAMMAR, CnlParser.LALR, cache=self.cache)
+        self.assertTrue(parser.from_cache)
+        self.assertEqual(parser.parser, CnlParser.LALR)
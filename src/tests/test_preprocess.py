@@ -2,7 +2,9 @@
 import unittest
 
 from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, Signatures
-from CNLWizard.process_cnl import process_cnl_specification
+from CNLWizard.exception.exception import SubstitutionError
+from CNLWizard.process_cnl import process_cnl_specification, split_propositions, process_propositions, \
+    needs_preprocessing, preprocessing_parser
 
 
 class TestPreprocess(unittest.TestCase):
@@ -17,3 +19,57 @@ class TestPreprocess(unittest.TestCase):
         cnl.config['signatures'] = False
         res = process_cnl_specification(cnl, 'A node is identified by an id.', cnl.config)
         self.assertEqual(res, 'A node is identified by an id.')
+
+    def test_split_propositions(self):
+        chunks = ['A node is identified', ' by an id. There is', ' a node with id 1.\n', 'There is a node', '']
+        self.assertEqual(list(split_propositions(chunks)), ''.join(chunks).split('.'))
+        # dots in strings, comments and decimal numbers, the comments are removed
+        text = 'There is a node with label "a.b".\n// There is a node.\nThere is a weight 1.5 /* . */ and ü.'
+        sentences = list(split_propositions([text]))
+        self.assertEqual(sentences, ['There is a node with label "a.b"', '\n\nThere is a weight 1.5  and ü', ''])
+        self.assertEqual([(sentence.start, sentence.end, sentence.line) for sentence in sentences],
+                         [(0, 32, 1), (33, 90, 3), (91, 91, 3)])
+        self.assertEqual(text.encode()[33:90].decode(), text[33:89])
+        # the same sentences whatever the chunks
+        self.assertEqual([(sentence, sentence.start, sentence.line) for sentence in split_propositions(text)],
+                         [(sentence, sentence.start, sentence.line) for sentence in sentences])
+
+    def test_process_propositions(self):
+        cnl = CnlWizardCompiler()
+        cnl.config = {'signatures': True, 'var_substitution': True}
+        propositions = ['A node is identified by an id', ' There is a node with id X, where X is between 1 and 2', '']
+        self.assertEqual(list(process_propositions(cnl, propositions, cnl.config)),
+                         ['There is a node with id 1 .\nThere is a node with id 2 .'])
+        CnlWizardCompiler.signatures = Signatures()
+
+    def test_needs_preprocessing(self):
+        config = {'signatures': True, 'var_substitution': True}
+        self.assertTrue(needs_preprocessing('A node is identified by an id', config))
+        self.assertTrue(needs_preprocessing('A colour is a list made of red, green', config))
+        self.assertTrue(needs_preprocessing('An edge', config))
+        self.assertTrue(needs_preprocessing('There is a node with id X, where X is one of 1, 2', config))
+        self.assertFalse(needs_preprocessing('There is a node with id equal to 1', config))
+        # the keywords are words, not parts of other words (e.g. chases, concepts)
+        self.assertFalse(needs_preprocessing('Every cat chases the mice', config))
+        self.assertFalse(needs_preprocessing('There is a node with id X, where X is one of 1, 2',
+                                             config | {'var_substitution': False}))
+        self.assertIs(preprocessing_parser(True, True), preprocessing_parser(True, True))
+        self.assertIsNone(preprocessing_parser(False, False))
+
+    def test_signatures_only(self):
+        cnl = CnlWizardCompiler()
+        cnl.config = {'signatures': True, 'var_substitution': False}
+        res = process_cnl_specification(cnl, 'A node has an id. There is a node that has id 1.', cnl.config)
+        self.assertEqual(res, 'There is a node that has id 1 .')
+        CnlWizardCompiler.signatures = Signatures()
+
+    def test_expansion_budget(self):
+        cnl = CnlWizardCompiler()
+        config = {'signatures': True, 'var_substitution': True, 'expansion_budget': 5}
+        propositions = ['There is a node with id X, where X is between 1 and 6']
+        with self.assertLogs(cnl.logger, 'WARNING'):
+            self.assertEqual(len(list(process_propositions(cnl, propositions, config, templates=True))), 1)
+        config['expansion_budget_abort'] = True
+        self.assertRaises(SubstitutionError, list, process_propositions(cnl, propositions, config))
+        config['expansion_budget'] = 6
+        self.assertEqual(process_cnl_specification(cnl, propositions[0], config).count('\n'), 5)
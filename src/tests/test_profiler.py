@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+
+from CNLWizard.cnl_wizard_compiler import CnlParser, CnlWizardCompiler, CompilationContext, impure
+from CNLWizard.profiler import RuleProfiler
+from tests.test_compiler import TEMPLATE_GRAMMAR
+
+
+@impure
+def proposition(*args):
+    return ' '.join(args)
+
+
+FUNCTIONS = {'start': lambda *propositions: ' '.join(propositions), 'proposition': proposition,
+             'graph': lambda arg: None}
+TEXT = 'There is a node with id X, where X is between 1 and 3. There is a edge with id 1 and b.'
+
+
+class TestRuleProfiler(unittest.TestCase):
+
+    def test_compile_text(self):
+        profiler = RuleProfiler(memory=True)
+        compiler = CnlWizardCompiler(profiler=profiler)
+        with CompilationContext(), profiler.profiling():
+            res = compiler.compile_text(CnlParser(TEMPLATE_GRAMMAR), FUNCTIONS, TEXT)
+        self.assertEqual(res, 'node 1 node 2 node 3 edge 1 b')
+        self.assertEqual(profiler.rules['proposition'].calls, 4)
+        self.assertEqual(profiler.rules['start'].calls, 1)
+        # the root includes the propositions
+        self.assertGreaterEqual(profiler.rules['start'].cumulative, profiler.rules['proposition'].cumulative)
+        self.assertGreaterEqual(profiler.rules['proposition'].cumulative, profiler.rules['proposition'].self_time)
+        self.assertEqual(set(profiler.stacks), {'start', 'start;proposition', 'start;graph'})
+        with CompilationContext():
+            self.assertEqual(CnlWizardCompiler().compile_text(CnlParser(TEMPLATE_GRAMMAR), FUNCTIONS, TEXT), res)
+
+    def test_wrap(self):
+        profiler = RuleProfiler()
+        functions = profiler.wrap(FUNCTIONS)
+        self.assertTrue(functions['proposition'].impure)
+        self.assertFalse(functions['start'].impure)
+        self.assertEqual(functions['start']('a', 'b'), 'a b')
+        # called outside the parse tree
+        self.assertEqual(profiler.rules['start'].calls, 1)
+        self.assertEqual(profiler.rules['start'].cumulative, profiler.rules['start'].self_time)
+
+    def test_report(self):
+        profiler = RuleProfiler()
+        functions = profiler.wrap(FUNCTIONS)
+        for _ in range(2):
+            functions['proposition']('a')
+        functions['start']('a')
+        lines = profiler.report('calls').splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['rule', 'proposition', 'start'])
+        self.assertEqual(len(profiler.report(limit=1).splitlines()), 2)
+        with self.assertRaises(ValueError):
+            profiler.report('name')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stacks.txt')
+            profiler.write_stacks(path)
+            with open(path) as file:
+                stacks = [line.rsplit(' ', 1) for line in file.read().splitlines()]
+        self.assertEqual([stack for stack, _ in stacks], ['proposition', 'start'])
+        self.assertTrue(all(int(value) > 0 for _, value in stacks))
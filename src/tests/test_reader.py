@@ -1,7 +1,8 @@
 import os.path
+import tempfile
 import unittest
 
-from CNLWizard.reader import YAMLReader, pyReader
+from CNLWizard.reader import YAMLReader, pyReader, pyModule
 
 
 class TestReader(unittest.TestCase):
@@ -28,4 +29,22 @@ class TestReader(unittest.TestCase):
         reader = pyReader()
         self.assertEqual({'arith', 'Operation', 'constraint', 'Proposition'},
                          set(reader._get_functions_name_in(os.path.join(os.path.dirname(os.path.abspath(__file__)),
-                             'res', 'functions.py'))))
\ No newline at end of file
+                             'res', 'functions.py'))))
+
+    def test_py_module(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for lang in ['lang1', 'lang2']:
+                os.mkdir(os.path.join(tmp, lang))
+                with open(os.path.join(tmp, lang, 'functions.py'), 'w') as file:
+                    file.write(f'state = []\n\n\ndef fn():\n    state.append(1)\n    return "{lang}", len(state)\n')
+            lang1 = pyModule(os.path.join(tmp, 'lang1', 'functions.py'))
+            lang2 = pyModule(os.path.join(tmp, 'lang2', 'functions.py'))
+            # files with the same name do not collide
+            self.assertNotEqual(lang1.module_name, lang2.module_name)
+            self.assertEqual(lang1.instantiate()['fn'](), ('lang1', 1))
+            self.assertEqual(lang2.instantiate()['fn'](), ('lang2', 1))
+            # each instance has its own state
+            functions = lang1.instantiate()
+            functions['fn']()
+            self.assertEqual(functions['fn'](), ('lang1', 2))
+            self.assertEqual(lang1.instantiate()['fn'](), ('lang1', 1))
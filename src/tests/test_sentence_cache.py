@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+
+from CNLWizard.cnl_wizard_compiler import CnlParser, CnlWizardCompiler, CompilationContext, impure
+from CNLWizard.reader import pyModule
+from CNLWizard.sentence_cache import SentenceCache
+from tests.test_compiler import LALR_GRAMMAR
+
+calls = []
+
+
+def start(*propositions):
+    return ' '.join(propositions)
+
+
+def proposition(name):
+    calls.append(name)
+    return name
+
+
+@impure
+def impure_proposition(name):
+    calls.append(name)
+    return name
+
+
+def declaring_proposition(name):
+    calls.append(name)
+    CnlWizardCompiler.constants[name] = True
+    return name
+
+
+class TestSentenceCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = SentenceCache(self.tmp.name)
+        self.lark = CnlParser(LALR_GRAMMAR)
+        calls.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _compile(self, functions: dict, text: str):
+        with CompilationContext():
+            return CnlWizardCompiler(sentence_cache=self.cache).compile_text(self.lark, functions, text)
+
+    def test_hits(self):
+        functions = {'start': start, 'proposition': proposition, 'graph': lambda arg: None}
+        self.assertEqual(self._compile(functions, 'There is a node. There is a edge.'), 'node edge')
+        self.assertEqual(calls, ['node', 'edge'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 2))
+        # only the changed proposition is compiled
+        self.assertEqual(self._compile(functions, '  There is a node.\nThere is a arc.'), 'node arc')
+        self.assertEqual(calls, ['node', 'edge', 'arc'])
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 3))
+        self.assertIn('1 hits, 3 misses', self.cache.report())
+
+    def test_not_cacheable(self):
+        for function in [impure_proposition, declaring_proposition, lambda name: lambda: name]:
+            functions = {'start': lambda *propositions: len(propositions), 'proposition': function,
+                         'graph': lambda arg: None}
+            for _ in range(2):
+                self.assertEqual(self._compile(functions, 'There is a node.'), 1)
+        self.assertEqual(calls, ['node'] * 4)
+        self.assertEqual((self.cache.hits, self.cache.skipped), (0, 6))
+
+    def test_declarations(self):
+        functions = {'start': start, 'proposition': proposition, 'graph': lambda arg: None}
+        self._compile(functions, 'There is a node.')
+        with CompilationContext():
+            CnlWizardCompiler.signatures['node'] = 'node', ['id'], ['id'], None
+            CnlWizardCompiler(sentence_cache=self.cache).compile_text(self.lark, functions, 'There is a node.')
+        self.assertEqual(calls, ['node', 'node'])
+
+    def test_namespace(self):
+        py_file = os.path.join(self.tmp.name, 'functions.py')
+
+        def namespace(suffix: str) -> str:
+            with open(py_file, 'w') as file:
+                file.write('from CNLWizard.libs import asp\n\n'
+                           f'SUFFIX = {suffix!r}\n\n\n'
+                           'def proposition(name):\n'
+                           '    return name + SUFFIX\n')
+            return self.cache.namespace(LALR_GRAMMAR, pyModule(py_file).instantiate())
+
+        # the constants of the functions file are part of the key
+        self.assertEqual(namespace('!'), namespace('!'))
+        self.assertNotEqual(namespace('!'), namespace('?'))
+        functions = pyModule(py_file).instantiate()
+        self.assertIn(os.path.abspath(py_file), self.cache._sources(functions))
+        # the imported libraries as well
+        self.assertIn('asp.py', {os.path.basename(source) for source in self.cache._sources(functions)})
+
+    def test_heuristic_example(self):
+        # the heuristics without priority fill a graph rendered at the end, they are compiled at each run
+        example = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'examples', 'heuristic')
+        cnl_file = os.path.join(self.tmp.name, 'heuristics.cnl')
+        with open(cnl_file, 'w') as file:
+            file.write('A node is identified by id.\n'
+                       'There is a node with id equal to 1.\n'
+                       'it is preferred that a node with id equal to 1 is false.\n'
+                       'it is preferred that a node with id equal to 2 is true.\n'
+                       'it is preferred that a node with id equal to 3 is true, with priority equal to 10.\n')
+        results = []
+        for _ in range(2):
+            results.append(CnlWizardCompiler(sentence_cache=self.cache).compile(
+                os.path.join(example, 'grammar_asp.lark'), os.path.join(example, 'implemented_py_asp.py'), cnl_file))
+            CnlWizardCompiler.reset()
+        self.assertEqual(results[0], results[1])
+        self.assertIn('#heuristic node(1). [-1, sign]', results[1])
+        self.assertIn('#heuristic node(2). [1, sign]', results[1])
+        self.assertGreater(self.cache.hits, 0)
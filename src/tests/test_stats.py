@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+from CNLWizard.cnl_wizard_compiler import CnlParser, CnlWizardCompiler, CompilationContext
+from CNLWizard.stats import CompilationStats
+from tests.test_compiler import TEMPLATE_GRAMMAR
+
+FUNCTIONS = {'start': lambda *propositions: ' '.join(propositions), 'proposition': lambda *args: ' '.join(args),
+             'graph': lambda arg: None}
+TEXT = 'There is a node with id X, where X is between 1 and 3. There is a edge with id 1 and b.'
+
+
+class TestCompilationStats(unittest.TestCase):
+
+    def test_stages(self):
+        stats = CompilationStats()
+        for _ in range(2):
+            with stats.stage('outer'):
+                with stats.stage('inner'):
+                    data = [0] * 100000
+                del data
+        self.assertEqual(list(stats.stages), ['outer', 'inner'])
+        self.assertEqual(stats.stages['outer'].calls, 2)
+        self.assertGreaterEqual(stats.stages['outer'].wall, stats.stages['inner'].wall)
+        # the peak of the inner stage is included in the outer one
+        self.assertGreater(stats.stages['inner'].peak, 100000 * 8)
+        self.assertGreaterEqual(stats.stages['outer'].peak, stats.stages['inner'].peak)
+        stats = CompilationStats(memory=False)
+        with stats.stage('outer'):
+            pass
+        self.assertEqual(stats.stages['outer'].peak, 0)
+
+    def test_merge(self):
+        stats = CompilationStats(memory=False)
+        with stats.stage('parse'):
+            stats.count('propositions', 2)
+        merged = CompilationStats(memory=False)
+        merged.merge(stats.as_dict())
+        merged.merge(stats.as_dict())
+        self.assertEqual(merged.stages['parse'].calls, 2)
+        self.assertEqual(merged.counters['propositions'], 4)
+
+    def test_compile_text(self):
+        stats = CompilationStats()
+        compiler = CnlWizardCompiler(stats=stats)
+        with CompilationContext():
+            res = compiler.render(compiler.compile_text(CnlParser(TEMPLATE_GRAMMAR), FUNCTIONS, TEXT))
+        self.assertEqual(res, 'node 1 node 2 node 3 edge 1 b')
+        self.assertEqual(list(stats.stages), ['preprocess', 'parse', 'transform', 'output'])
+        self.assertEqual(stats.counters, {'input_bytes': len(TEXT.encode()), 'propositions': 2, 'expanded_propositions': 4,
+                                          'output_bytes': len(res)})
+        with CompilationContext():
+            self.assertEqual(CnlWizardCompiler().render(
+                CnlWizardCompiler().compile_text(CnlParser(TEMPLATE_GRAMMAR), FUNCTIONS, TEXT)), res)
+
+    def test_stream_text(self):
+        stats = CompilationStats(memory=False)
+        compiler = CnlWizardCompiler(stats=stats)
+        with CompilationContext():
+            res = list(compiler.stream_text(CnlParser(TEMPLATE_GRAMMAR), FUNCTIONS, [TEXT]))
+        self.assertEqual(stats.counters['propositions'], 2)
+        self.assertEqual(stats.stages['output'].calls, len(res))
+        self.assertEqual(stats.counters['expanded_propositions'], 4)
+
+    def test_dump(self):
+        stats = CompilationStats(memory=False)
+        with stats.stage('parse'):
+            pass
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'stats.json')
+            stats.dump(path, {'text.cnl': stats.as_dict()})
+            with open(path) as file:
+                dumped = json.load(file)
+        self.assertEqual(dumped['stages']['parse']['calls'], 1)
+        self.assertEqual(dumped['files']['text.cnl']['counters'], stats.counters)
@@ -0,0 +1,118 @@
+import unittest
+from unittest import mock
+
+from CNLWizard import substitution as substitution_module
+from CNLWizard.cnl_wizard_compiler import CnlWizardCompiler, CompilationContext
+from CNLWizard.exception.exception import SubstitutionError
+from CNLWizard.process_cnl import process_cnl_specification
+from CNLWizard.substitution import Substitution, Bound
+
+
+class TestSubstitution(unittest.TestCase):
+
+    def _check(self, substitution: Substitution) -> list[dict]:
+        # NumPy and the pure python evaluation generate the same clones
+        clones = list(substitution)
+        with mock.patch.object(substitution_module, 'numpy', None):
+            self.assertEqual(list(substitution), clones)
+        self.assertTrue(all(type(value) is int for clone in clones for value in clone.values()
+                            if not isinstance(value, str)))
+        return clones
+
+    def test_product(self):
+        substitution = Substitution()
+        self.assertFalse(substitution)
+        substitution.product('X', range(1, 4))
+        substitution.product('Y', range(1, 4))
+        substitution.product('Z', ['a', 'b'])
+        substitution.distinct(['X', 'Y'])
+        # the filter is applied before generating the values of Z
+        self.assertEqual(substitution.steps[2], ('distinct', ['X', 'Y']))
+        self.assertEqual(substitution.size(), 18)
+        clones = self._check(substitution)
+        self.assertEqual(len(clones), 12)
+        self.assertEqual(clones[:2], [{'X': 1, 'Y': 2, 'Z': 'a'}, {'X': 1, 'Y': 2, 'Z': 'b'}])
+        # the respectively values are zipped with the clones generated so far
+        substitution.respectively('W', range(12), 1)
+        self.assertEqual([clone['W'] for clone in self._check(substitution)], list(range(12)))
+        self.assertRaises(SubstitutionError, substitution.respectively, 'V', range(18), 1)
+        self.assertRaises(SubstitutionError, substitution.distinct, ['X', 'V'])
+
+    def test_filters(self):
+        substitution = Substitution()
+        substitution.product('D2', range(1, 366))
+        substitution.between('D', Bound('D2'), Bound('D2', 13))
+        substitution.compare('D2', 'less than', Bound(offset=353))
+        self.assertEqual(substitution.steps[1][0], 'compare')
+        self.assertEqual(substitution.size(), 365 * 378)
+        clones = self._check(substitution)
+        self.assertEqual(len(clones), 352 * 14)
+        self.assertEqual(clones[-1], {'D2': 352, 'D': 365})
+        substitution.compare('D', 'different from', Bound('D2', 1))
+        self.assertEqual(len(self._check(substitution)), 352 * 13)
+
+    def test_symbolic(self):
+        substitution = Substitution()
+        self.assertFalse(substitution.symbolic())
+        substitution.product('X', range(1, 4))
+        substitution.between('Y', Bound('X'), Bound('X', 2))
+        substitution.distinct(['X', 'Y'])
+        self.assertTrue(substitution.symbolic())
+        # the clones of the respectively steps and of the variables bound twice depend on the order of the steps
+        substitution.product('X', range(1, 3))
+        self.assertFalse(substitution.symbolic())
+        substitution = Substitution()
+        substitution.product('X', range(1, 4))
+        substitution.respectively('Y', ['a', 'b', 'c'], 1)
+        self.assertFalse(substitution.symbolic())
+
+    def test_empty_ranges(self):
+        substitution = Substitution()
+        substitution.product('X', range(1, 10))
+        substitution.between('Y', Bound(offset=5), Bound('X'))
+        self.assertEqual([(clone['X'], clone['Y']) for clone in self._check(substitution)],
+                         [(x, y) for x in range(1, 10) for y in range(5, x + 1)])
+        substitution = Substitution()
+        substitution.product('X', ['a', 'b'])
+        self.assertRaises(SubstitutionError, substitution.between, 'Y', Bound('X'), Bound(offset=3))
+        self.assertRaises(SubstitutionError, substitution.between, 'Y', Bound('Z'), Bound(offset=3))
+
+    def test_comparisons(self):
+        substitution = Substitution()
+        substitution.product('X', ['a', 'b'])
+        substitution.product('Y', range(3))
+        substitution.compare('X', 'equal to', Bound('Y'))
+        self.assertFalse(substitution)
+        substitution.product('X', ['a', 'b'])
+        substitution.product('Y', range(3))
+        self.assertRaises(SubstitutionError, substitution.compare, 'X', 'less than', Bound(offset=3))
+        self.assertRaises(SubstitutionError, substitution.compare, 'Y', 'greater than', Bound('X'))
+        self.assertRaises(SubstitutionError, substitution.compare, 'Y', 'equal to', Bound('X', 1))
+        with CompilationContext():
+            cnl = CnlWizardCompiler()
+            text = 'There is a day with id X, where X is one of a, b, where X is less than 3.'
+            self.assertRaises(SubstitutionError, process_cnl_specification, cnl, text, cnl.config)
+
+    def test_blocks(self):
+        with mock.patch.object(Substitution, 'BLOCK', 7):
+            substitution = Substitution()
+            substitution.product('X', range(5))
+            substitution.between('Y', Bound('X', -3), Bound('X', 3))
+            substitution.product('Z', range(3))
+            substitution.respectively('W', range(5 * 7 * 3), 1)
+            substitution.distinct(['X', 'Y', 'Z'])
+            expected = [(x, y, z) for x in range(5) for y in range(x - 3, x + 4) for z in range(3)]
+            self.assertEqual([(clone['X'], clone['Y'], clone['Z'], clone['W']) for clone in self._check(substitution)],
+                             [(*clone, w) for w, clone in enumerate(expected) if len(set(clone)) == 3])
+
+    def test_where_clauses(self):
+        text = 'There is a day with id D and D2, where D2 is between 1 and 365, where D is between D2 and D2+13, ' \
+               'where D2 is less than 353, where D is greater than or equal to 360.'
+        with CompilationContext():
+            cnl = CnlWizardCompiler()
+            clones = process_cnl_specification(cnl, text, cnl.config).splitlines()
+            self.assertEqual(len(clones), sum(1 for d2 in range(1, 353) for d in range(d2, d2 + 14) if d >= 360))
+            self.assertEqual(clones[0], 'There is a day with id 360 and 347 .')
+            # the where-clauses on variables that are not substituted are left in the proposition
+            text = 'There is a day with id D, whenever there is a day with id D2, where D is between D2 and D2+13.'
+            self.assertEqual(process_cnl_specification(cnl, text, cnl.config), text[:-1] + ' .')